@@ -1,7 +1,9 @@
 from django.contrib import admin
 from django.utils.safestring import mark_safe
+from simple_history.admin import SimpleHistoryAdmin
+from .images import variant_urls
 from .models import (
-    Category, Client, Attribute, ClientAttribute, 
+    Category, Client, Attribute, ClientAttribute, AttributeMeasurement,
     Tag, WorkSession, SessionComment
 )
 
@@ -62,7 +64,7 @@ class WorkSessionInline(admin.TabularInline):
     ordering = ('-date',)
 
 @admin.register(Client)
-class ClientAdmin(admin.ModelAdmin):
+class ClientAdmin(SimpleHistoryAdmin):
     # Добавил gender и birth_date в список
     list_display = ('name', 'gender', 'birth_date', 'avatar_preview', 'coach', 'is_active', 'created_at')
     list_filter = ('is_active', 'gender', 'categories', 'tags', 'coach')
@@ -84,12 +86,24 @@ class ClientAdmin(admin.ModelAdmin):
 
     def avatar_preview(self, obj):
         if obj.photo:
-            return mark_safe(f'<img src="{obj.photo.url}" style="border-radius: 50%; width: 40px; height: 40px; object-fit: cover;" />')
+            # Миниатюра вместо полноразмерного оригинала, пока она не готова - оригинал
+            variants = variant_urls(obj, 'photo')
+            url = variants['thumb']['webp'] if variants else obj.photo.url
+            return mark_safe(f'<img src="{url}" style="border-radius: 50%; width: 40px; height: 40px; object-fit: cover;" />')
         return "-"
     avatar_preview.short_description = "Фото"
 
+@admin.register(AttributeMeasurement)
+class AttributeMeasurementAdmin(admin.ModelAdmin):
+    list_display = ('client', 'attribute', 'value', 'measured_at')
+    list_filter = ('attribute',)
+    search_fields = ('client__name',)
+    date_hierarchy = 'measured_at'
+    autocomplete_fields = ['client']
+    list_select_related = ('client', 'attribute')
+
 @admin.register(WorkSession)
-class WorkSessionAdmin(admin.ModelAdmin):
+class WorkSessionAdmin(SimpleHistoryAdmin):
     list_display = ('title', 'client', 'date', 'status')
     list_filter = ('status', 'date', 'client__coach')
     search_fields = ('title', 'description', 'client__name')
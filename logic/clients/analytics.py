@@ -0,0 +1,232 @@
+"""
+Аналитика посещаемости: выполнение плана, серии, скользящие 4 недели, сравнение по программам.
+Всё считается по недельной сводке ClientWeeklyStats (десятки строк на клиента),
+а не по сессиям. Сводка обновляется дельтами из сигналов WorkSession.
+
+Термины:
+- done (выполнено) = completed + review;
+- due (должно было быть) = done + missed; planned и cancelled в процент не входят;
+- adherence = done / due;
+- серия - подряд идущие недели с выполненными сессиями и без пропусков.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Case, Count, F, Q, Sum, Value, When
+from django.db.models.functions import TruncWeek
+from django.utils import timezone
+
+from .models import ClientWeeklyStats, WorkSession
+
+STATUSES = [code for code, _ in WorkSession.STATUS_CHOICES]
+ROLLING_WEEKS = 4
+REBUILD_BATCH = 1000
+# Сколько недель клиентов обновляем одним UPDATE (ограничение на число параметров запроса)
+DELTA_BATCH = 200
+
+
+def week_of(value):
+    """Понедельник недели, в которую попадает datetime (в текущей таймзоне)."""
+    day = timezone.localdate(value)
+    return day - timedelta(days=day.weekday())
+
+
+def rate(done, due):
+    return round(done / due, 4) if due else None
+
+
+# === Инкрементальное обновление ===
+
+def session_state(session):
+    return (session.client_id, week_of(session.date), session.status)
+
+
+def apply_deltas(deltas):
+    """
+    deltas: {(client_id, week, status): +-n}. Всегда два запроса на пачку, сколько бы ни было недель:
+    INSERT недостающих строк (ON CONFLICT DO NOTHING) и один UPDATE со сдвигом через CASE.
+    Сдвиг (status = status + n) атомарен, параллельные сохранения друг друга не затирают.
+    """
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    keys = list({(client_id, week) for client_id, week, _ in deltas})
+    for offset in range(0, len(keys), DELTA_BATCH):
+        batch = keys[offset:offset + DELTA_BATCH]
+        ClientWeeklyStats.objects.bulk_create(
+            [ClientWeeklyStats(client_id=client_id, week=week) for client_id, week in batch],
+            ignore_conflicts=True,
+        )
+
+        increments = {}
+        for status in STATUSES:
+            whens = [
+                When(client_id=client_id, week=week, then=Value(deltas[client_id, week, status]))
+                for client_id, week in batch if (client_id, week, status) in deltas
+            ]
+            if whens:
+                increments[status] = F(status) + Case(*whens, default=Value(0))
+        rows = ClientWeeklyStats.objects.filter(
+            client_id__in={client_id for client_id, _ in batch}, week__in={week for _, week in batch}
+        )
+        rows.update(**increments)
+        if any(delta < 0 for delta in deltas.values()):
+            # Неделя опустела (сессию перенесли/удалили) - строку убираем, как и при пересборке
+            rows.filter(**{status: 0 for status in STATUSES}).delete()
+
+
+def session_changed(old_state, new_state):
+    """Сессия создана (old_state=None), удалена (new_state=None) или поменяла статус/дату/клиента."""
+    if old_state == new_state:
+        return
+    deltas = defaultdict(int)
+    if old_state:
+        deltas[old_state] -= 1
+    if new_state:
+        deltas[new_state] += 1
+    apply_deltas(deltas)
+
+
+def sessions_created(sessions):
+    """Для bulk_create (сигналы не срабатывают): одна дельта на неделю клиента."""
+    deltas = defaultdict(int)
+    for session in sessions:
+        deltas[session_state(session)] += 1
+    apply_deltas(deltas)
+
+
+# === Полная пересборка ===
+
+def rebuild(client_ids=None):
+    """Пересчитывает сводку из сессий одним GROUP BY (клиент, неделя). Возвращает число строк."""
+    sessions = WorkSession.objects.all()
+    stats = ClientWeeklyStats.objects.all()
+    if client_ids is not None:
+        sessions = sessions.filter(client_id__in=client_ids)
+        stats = stats.filter(client_id__in=client_ids)
+
+    rows = sessions.annotate(week_start=TruncWeek('date')).values('client_id', 'week_start').annotate(
+        **{status: Count('pk', filter=Q(status=status)) for status in STATUSES}
+    ).order_by()
+
+    with transaction.atomic():
+        stats.delete()
+        created = ClientWeeklyStats.objects.bulk_create(
+            (
+                ClientWeeklyStats(
+                    client_id=row['client_id'],
+                    week=timezone.localdate(row['week_start']),
+                    **{status: row[status] for status in STATUSES},
+                )
+                for row in rows.iterator()
+            ),
+            batch_size=REBUILD_BATCH,
+        )
+    return len(created)
+
+
+# === Чтение ===
+
+def done_expr():
+    return F('completed') + F('review')
+
+
+def empty_summary(client_id):
+    return {
+        'client': client_id, 'done': 0, 'missed': 0, 'cancelled': 0, 'upcoming': 0,
+        'adherence': None, 'rolling_4w': None,
+    }
+
+
+def client_summaries(client_ids, today=None):
+    """
+    {client_id: {...}} для списка клиентов: итоги и скользящие 4 недели - один агрегирующий запрос.
+    Клиенты без сессий тоже в ответе (с нулями).
+    """
+    current_week = week_of(today or timezone.now())
+    window = Q(week__gt=current_week - timedelta(weeks=ROLLING_WEEKS), week__lte=current_week)
+    rows = ClientWeeklyStats.objects.filter(client_id__in=client_ids).values('client_id').annotate(
+        done=Sum(done_expr()),
+        missed_total=Sum('missed'),
+        cancelled_total=Sum('cancelled'),
+        # Запланированное на будущее - отдельно, прошлые planned считаем "не отмеченными"
+        upcoming=Sum('planned', filter=Q(week__gte=current_week)),
+        rolling_done=Sum(done_expr(), filter=window),
+        rolling_missed=Sum('missed', filter=window),
+    ).order_by()
+
+    result = {client_id: empty_summary(client_id) for client_id in client_ids}
+    for row in rows:
+        done, missed = row['done'] or 0, row['missed_total'] or 0
+        rolling_done, rolling_missed = row['rolling_done'] or 0, row['rolling_missed'] or 0
+        result[row['client_id']] = {
+            'client': row['client_id'],
+            'done': done,
+            'missed': missed,
+            'cancelled': row['cancelled_total'] or 0,
+            'upcoming': row['upcoming'] or 0,
+            'adherence': rate(done, done + missed),
+            'rolling_4w': rate(rolling_done, rolling_done + rolling_missed),
+        }
+    return result
+
+
+def streaks(weeks, current_week):
+    """
+    (текущая серия, лучшая серия) в неделях. weeks - [(week, done, missed)] по возрастанию.
+    Текущая неделя без отметок серию не рвет: считаем от прошлой.
+    """
+    good = {week for week, done, missed in weeks if done and not missed}
+    longest = run = 0
+    previous = None
+    for week in sorted(good):
+        run = run + 1 if previous and week - previous == timedelta(weeks=1) else 1
+        longest = max(longest, run)
+        previous = week
+
+    current = 0
+    week = current_week if current_week in good else current_week - timedelta(weeks=1)
+    while week in good:
+        current += 1
+        week -= timedelta(weeks=1)
+    return current, longest
+
+
+def client_detail(client_id, today=None):
+    """Сводка клиента + понедельная динамика и серии."""
+    current_week = week_of(today or timezone.now())
+    summary = client_summaries([client_id], today)[client_id]
+    weeks = list(
+        ClientWeeklyStats.objects.filter(client_id=client_id, week__lte=current_week)
+        .annotate(done=done_expr()).order_by('week').values_list('week', 'done', 'missed')
+    )
+    summary['current_streak'], summary['longest_streak'] = streaks(weeks, current_week)
+    summary['weeks'] = [
+        {'week': week, 'done': done, 'missed': missed, 'adherence': rate(done, done + missed)}
+        for week, done, missed in weeks
+    ]
+    return summary
+
+
+def category_comparison(client_ids, today=None):
+    """Выполнение по программам (Category) среди клиентов тренера: за всё время и за 4 недели."""
+    current_week = week_of(today or timezone.now())
+    window = Q(week__gt=current_week - timedelta(weeks=ROLLING_WEEKS), week__lte=current_week)
+    stats = ClientWeeklyStats.objects.filter(client_id__in=client_ids, client__categories__isnull=False)
+    rows = stats.values('client__categories__slug', 'client__categories__name').annotate(
+        clients=Count('client', distinct=True),
+        done=Sum(done_expr()),
+        missed_total=Sum('missed'),
+        rolling_done=Sum(done_expr(), filter=window),
+        rolling_missed=Sum('missed', filter=window),
+    ).order_by('client__categories__name')
+
+    return [
+        {
+            'category': row['client__categories__slug'],
+            'name': row['client__categories__name'],
+            'clients': row['clients'],
+            'adherence': rate(row['done'] or 0, (row['done'] or 0) + (row['missed_total'] or 0)),
+            'rolling_4w': rate(row['rolling_done'] or 0, (row['rolling_done'] or 0) + (row['rolling_missed'] or 0)),
+        }
+        for row in rows
+    ]
@@ -0,0 +1,489 @@
+"""
+Синтетические данные и сценарии замеров для команды `manage.py benchmark`.
+Сидеры используются и в тестах (clients/tests.py), чтобы цифры были сопоставимы.
+"""
+import re
+import statistics
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import Q
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .models import (
+    Client, Category, Tag, Attribute, ClientAttribute, AttributeMeasurement, WorkSession, SessionComment
+)
+
+User = get_user_model()
+
+BATCH_SIZE = 1000
+
+
+def make_coach(username='bench_coach'):
+    return User.objects.create_user(username=username, email=f'{username}@bench.local', password='bench', is_coach=True)
+
+
+def seed_reference_data():
+    """Минимальные справочники: 3 категории, 3 тега, 3 числовых атрибута."""
+    categories = [Category.objects.get_or_create(slug=f'bench-cat-{i}', defaults={'name': f'Категория {i}'})[0] for i in range(3)]
+    tags = [Tag.objects.get_or_create(slug=f'bench-tag-{i}', defaults={'name': f'Тег {i}'})[0] for i in range(3)]
+    attributes = [
+        Attribute.objects.get_or_create(slug=f'bench-attr-{i}', defaults={'name': f'Атрибут {i}', 'attr_type': 'number'})[0]
+        for i in range(3)
+    ]
+    return categories, tags, attributes
+
+
+def seed_clients(coach, count, with_users=True):
+    """
+    Создает `count` клиентов тренера со всеми связями, которые рисует ClientSerializer
+    (аккаунт, категории, теги, атрибуты). Всё через bulk_create.
+    """
+    categories, tags, attributes = seed_reference_data()
+    prefix = f'{coach.username}-{Client.objects.filter(coach=coach).count()}'
+
+    users = [None] * count
+    if with_users:
+        users = User.objects.bulk_create(
+            [User(username=f'{prefix}-{i}', email=f'{prefix}-{i}@bench.local') for i in range(count)],
+            batch_size=BATCH_SIZE,
+        )
+
+    clients = Client.objects.bulk_create(
+        [Client(coach=coach, user=users[i], name=f'Клиент {i}') for i in range(count)],
+        batch_size=BATCH_SIZE,
+    )
+
+    Client.categories.through.objects.bulk_create(
+        [Client.categories.through(client_id=c.pk, category_id=categories[i % len(categories)].pk) for i, c in enumerate(clients)],
+        batch_size=BATCH_SIZE,
+    )
+    Client.tags.through.objects.bulk_create(
+        [Client.tags.through(client_id=c.pk, tag_id=t.pk) for c in clients for t in tags[:2]],
+        batch_size=BATCH_SIZE,
+    )
+    # bulk_create минует save(), поэтому типизированное значение проставляем сами
+    ClientAttribute.objects.bulk_create(
+        [
+            ClientAttribute(client=c, attribute=a, value=str(60 + i % 40), value_num=60 + i % 40)
+            for i, c in enumerate(clients) for a in attributes
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    return clients
+
+
+def seed_sessions(clients, per_client, comments_per_session=0, start=None, step=timedelta(days=1)):
+    """
+    По `per_client` сессий на каждого клиента, начиная со `start` с шагом `step`,
+    и по `comments_per_session` сообщений тренера в каждой.
+    """
+    start = start or timezone.now() - step * per_client
+    statuses = [code for code, _ in WorkSession.STATUS_CHOICES]
+    sessions = WorkSession.objects.bulk_create(
+        [
+            WorkSession(client=c, title=f'Тренировка {i}', date=start + step * i, status=statuses[i % len(statuses)])
+            for c in clients for i in range(per_client)
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    if comments_per_session:
+        coaches = {c.pk: c.coach_id for c in clients}
+        SessionComment.objects.bulk_create(
+            [
+                SessionComment(session=s, author_id=coaches[s.client_id], text=f'Сообщение {j} ' * 20)
+                for s in sessions for j in range(comments_per_session)
+            ],
+            batch_size=BATCH_SIZE,
+        )
+    return sessions
+
+
+def seed_measurements(clients, attribute, days, start=None):
+    """Ежедневные замеры атрибута за `days` дней для каждого клиента."""
+    start = start or timezone.now() - timedelta(days=days)
+    return AttributeMeasurement.objects.bulk_create(
+        [
+            AttributeMeasurement(client=c, attribute=attribute, value=80 + (i % 30) / 10, measured_at=start + timedelta(days=i))
+            for c in clients for i in range(days)
+        ],
+        batch_size=BATCH_SIZE,
+    )
+
+
+def measure(func, repeat=5):
+    """Гоняет func() `repeat` раз. Возвращает (медиана в мс, кол-во SQL-запросов за один прогон)."""
+    timings = []
+    queries = 0
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as ctx:
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1000)
+        queries = len(ctx.captured_queries)
+    return statistics.median(timings), queries
+
+
+def api_client_for(user):
+    client = APIClient()
+    client.force_authenticate(user=user)
+    return client
+
+
+# === Сценарии ===
+# Каждый сценарий получает размер датасета и число повторов и возвращает dict с метриками.
+
+def bench_clients_list(size, repeat):
+    """GET /api/clients/clients/ для тренера с `size` клиентами."""
+    coach = make_coach()
+    seed_clients(coach, size)
+    api = api_client_for(coach)
+
+    def run():
+        response = api.get('/api/clients/clients/')
+        assert response.status_code == 200, response.status_code
+
+    ms, queries = measure(run, repeat)
+    return {'ms': ms, 'queries': queries}
+
+
+def bench_sessions_list(size, repeat):
+    """Первая страница GET /api/clients/sessions/: `size` сессий по 20 комментариев, размер ответа в КБ."""
+    coach = make_coach()
+    clients = seed_clients(coach, 10)
+    seed_sessions(clients, size // 10, comments_per_session=20)
+    api = api_client_for(coach)
+    payload = {}
+
+    def run():
+        response = api.get('/api/clients/sessions/')
+        assert response.status_code == 200, response.status_code
+        payload['kb'] = len(response.content) / 1024
+
+    ms, queries = measure(run, repeat)
+    return {'ms': ms, 'queries': queries, 'kb': payload['kb']}
+
+
+def bench_sessions_range(size, repeat):
+    """
+    Неделя календаря тренера (10 клиентов) на фоне `size` сессий в базе:
+    по 1000 ежедневных сессий на клиента, остальные клиенты - у другого тренера.
+    """
+    per_client = 1000
+    coach = make_coach()
+    other = make_coach('bench_noise')
+    start = timezone.now() - timedelta(days=per_client)
+
+    mine = seed_clients(coach, 10, with_users=False)
+    seed_sessions(mine, per_client, start=start)
+    noise_clients = max(size // per_client - len(mine), 0)
+    for offset in range(0, noise_clients, 100):
+        # Порциями, чтобы не держать миллион объектов в памяти
+        chunk = seed_clients(other, min(100, noise_clients - offset), with_users=False)
+        seed_sessions(chunk, per_client, start=start)
+
+    week_start = (start + timedelta(days=per_client // 2)).date()
+    params = {
+        'date_from': week_start.isoformat(),
+        'date_to': (week_start + timedelta(days=6)).isoformat(),
+        'page_size': 200,
+    }
+    api = api_client_for(coach)
+    found = {}
+
+    def run():
+        response = api.get('/api/clients/sessions/', params)
+        assert response.status_code == 200, response.status_code
+        found['rows'] = len(response.data['results'])
+
+    ms, queries = measure(run, repeat)
+    return {'ms': ms, 'queries': queries, 'rows': found['rows'], 'total': WorkSession.objects.count()}
+
+
+def full_scans(plan):
+    """Сколько полных проходов по таблицам в плане (Postgres: Seq Scan, SQLite: SCAN без индекса)."""
+    return len(re.findall(r'Seq Scan|\bSCAN\b(?!.*INDEX).*$', plan, flags=re.MULTILINE))
+
+
+def bench_comments_scoping(size, repeat):
+    """
+    EXPLAIN и время выборки комментариев клиента: старый OR по JOIN-ам против client_id IN (...).
+    В базе `size` сессий (по 2 комментария), у тренера 10 клиентов из size // 100.
+    """
+    from .scoping import ClientScope
+
+    coach = make_coach()
+    other = make_coach('bench_noise')
+    mine = seed_clients(coach, 10, with_users=False)
+    noise = seed_clients(other, max(size // 100 - 10, 0), with_users=False)
+    seed_sessions(mine + noise, 100, comments_per_session=2)
+
+    old = SessionComment.objects.filter(Q(session__client__coach=coach) | Q(session__client__user=coach)).distinct()
+    new = ClientScope(coach).filter(SessionComment.objects.all(), 'session__client')
+
+    # .all() - свежий queryset на каждый прогон, иначе сработает кеш результатов
+    old_ms, _ = measure(lambda: list(old.all()), repeat)
+    new_ms, _ = measure(lambda: list(new.all()), repeat)
+    return {
+        'old_ms': old_ms,
+        'new_ms': new_ms,
+        'old_full_scans': full_scans(old.explain()),
+        'new_full_scans': full_scans(new.explain()),
+    }
+
+
+def bench_sessions_bulk(size, repeat):
+    """POST /api/clients/sessions/bulk/ со списком из `size` сессий на 10 клиентов (уведомления - после коммита, вне замера)."""
+    coach = make_coach()
+    clients = seed_clients(coach, 10, with_users=False)
+    start = timezone.now()
+    payload = {
+        'sessions': [
+            {'client': clients[i % len(clients)].pk, 'title': f'Тренировка {i}', 'date': (start + timedelta(hours=i)).isoformat()}
+            for i in range(size)
+        ]
+    }
+    api = api_client_for(coach)
+
+    def run():
+        response = api.post('/api/clients/sessions/bulk/', payload, format='json')
+        assert response.status_code == 201, response.data
+
+    ms, queries = measure(run, repeat)
+    return {'ms': ms, 'queries': queries}
+
+
+def bench_clients_attribute_filter(size, repeat):
+    """
+    ClientFilter по числовому атрибуту (attributes[...]__lt) с сортировкой по другому атрибуту
+    на `size` клиентах одного тренера: COUNT и первая страница из 50 id.
+    """
+    from django.http import QueryDict
+    from .filters import ClientFilter
+
+    coach = make_coach()
+    for offset in range(0, size, 10000):
+        seed_clients(coach, min(10000, size - offset), with_users=False)
+
+    data = QueryDict('attributes[bench-attr-0]__lt=70&attributes[bench-attr-1]__gte=62&attributes_order=-bench-attr-2')
+    found = {}
+
+    def run():
+        queryset = ClientFilter(data=data, queryset=Client.objects.filter(coach=coach)).qs
+        found['rows'] = queryset.count()
+        list(queryset.values_list('pk', flat=True)[:50])
+
+    ms, queries = measure(run, repeat)
+    return {'ms': ms, 'queries': queries, 'rows': found['rows']}
+
+
+def bench_measurement_series(size, repeat):
+    """Серия для графика за `size` дней ежедневных замеров (bucket=auto) на фоне 50 других клиентов."""
+    coach = make_coach()
+    attribute = seed_reference_data()[2][0]
+    target, *others = seed_clients(coach, 51, with_users=False)
+    seed_measurements([target], attribute, size)
+    seed_measurements(others, attribute, min(size, 365))
+
+    api = api_client_for(coach)
+    found = {}
+
+    def run():
+        response = api.get('/api/clients/measurements/series/', {'client': target.pk, 'attribute': attribute.pk})
+        assert response.status_code == 200, response.data
+        found['points'] = len(response.data['points'])
+
+    ms, queries = measure(run, repeat)
+    return {'ms': ms, 'queries': queries, 'points': found['points']}
+
+
+def bench_coach_dashboard(size, repeat):
+    """GET /api/clients/dashboard/ для тренера с 1000 клиентами и `size` сессиями: без кеша и из кеша."""
+    from django.core.cache import cache
+
+    coach = make_coach()
+    clients = seed_clients(coach, 1000, with_users=False)
+    per_client = size // len(clients)
+    # Половина истории в прошлом, половина запланирована вперед
+    seed_sessions(clients, per_client, start=timezone.now() - timedelta(days=per_client // 2))
+    api = api_client_for(coach)
+
+    def run():
+        response = api.get('/api/clients/dashboard/')
+        assert response.status_code == 200, response.data
+
+    def cold():
+        cache.clear()
+        run()
+
+    cold_ms, cold_queries = measure(cold, repeat)
+    warm_ms, warm_queries = measure(run, repeat)
+    return {'cold_ms': cold_ms, 'cold_queries': cold_queries, 'warm_ms': warm_ms, 'warm_queries': warm_queries}
+
+
+SEARCH_WORDS = [
+    'присед', 'жим', 'становая', 'тяга', 'выпады', 'планка', 'бег', 'растяжка', 'кардио', 'спина',
+    'ноги', 'плечи', 'пресс', 'разминка', 'заминка', 'интервалы', 'гантели', 'штанга', 'колено', 'пульс',
+]
+
+
+def bench_search(size, repeat):
+    """
+    Только Postgres. Поиск по сессиям на фоне `size` сессий в базе (10% - у тренера):
+    старый ILIKE '%...%' по title/description против tsvector + GIN (clients/search.py).
+    """
+    from .scoping import ClientScope
+    from .search import search_sessions
+
+    coach = make_coach()
+    other = make_coach('bench_noise')
+    mine = seed_clients(coach, 100, with_users=False)
+    noise = seed_clients(other, 900, with_users=False)
+    start = timezone.now()
+    for offset in range(0, size, 100000):
+        chunk = min(100000, size - offset)
+        WorkSession.objects.bulk_create(
+            [
+                WorkSession(
+                    client=(mine if i % 10 == 0 else noise)[i % 100 if i % 10 == 0 else i % 900],
+                    title=f'{SEARCH_WORDS[i % 20].capitalize()} {i}',
+                    description=' '.join(SEARCH_WORDS[(i * 7 + k) % 20] for k in range(12)),
+                    date=start - timedelta(minutes=offset + i),
+                )
+                for i in range(chunk)
+            ],
+            batch_size=BATCH_SIZE,
+        )
+
+    scope = ClientScope(coach)
+    text = 'гантели пульс'
+    old = scope.filter(WorkSession.objects.all()).filter(
+        Q(title__icontains='гантели') | Q(description__icontains='гантели'),
+        Q(title__icontains='пульс') | Q(description__icontains='пульс'),
+    ).order_by('-date')[:20]
+
+    old_ms, _ = measure(lambda: list(old.all()), repeat)
+    new_ms, _ = measure(lambda: search_sessions(scope, text, 20), repeat)
+    return {'ilike_ms': old_ms, 'fts_ms': new_ms, 'total': WorkSession.objects.count()}
+
+
+def bench_export(size, repeat):
+    """
+    Выгрузка ndjson тренера с 100 клиентами и `size` сессиями (по сообщению в каждой):
+    время и пик памяти Python (tracemalloc) - пик не должен расти с size.
+    На SQLite iterator() читает без серверного курсора, показательны замеры на Postgres.
+    """
+    import tracemalloc
+    from .export import export_chunks
+
+    coach = make_coach()
+    clients = seed_clients(coach, 100, with_users=False)
+    seed_sessions(clients, size // len(clients), comments_per_session=1)
+    if connection.vendor == 'postgresql':
+        # Свежие строки в открытой транзакции: без статистики планировщик курсора выбирает вложенные циклы
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def run():
+        return sum(len(chunk) for chunk in export_chunks(coach, 'ndjson'))
+
+    export_ms, queries = measure(run, repeat)
+    tracemalloc.start()
+    exported = run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'export_ms': export_ms, 'queries': queries, 'mb': round(exported / 2 ** 20, 1), 'peak_mb': round(peak / 2 ** 20, 1)}
+
+
+# Допустимая цена истории изменений: во сколько раз запись с историей медленнее записи без нее
+HISTORY_OVERHEAD_BUDGET = {'save': 2.0, 'bulk': 1.5}
+
+
+def bench_history_overhead(size, repeat):
+    """
+    Цена истории (clients/history.py): `size` одиночных save() сессий и POST sessions/bulk/
+    из `size` сессий - с историей и без (SIMPLE_HISTORY_ENABLED=False). *_ratio - во сколько раз медленнее,
+    *_ok - укладывается ли в HISTORY_OVERHEAD_BUDGET.
+    """
+    from django.test import override_settings
+
+    coach = make_coach()
+    clients = seed_clients(coach, 10, with_users=False)
+    sessions = seed_sessions(clients, max(size // len(clients), 1))
+    api = api_client_for(coach)
+    start = timezone.now()
+    payload = {
+        'sessions': [
+            {'client': clients[i % len(clients)].pk, 'title': f'Тренировка {i}', 'date': (start + timedelta(hours=i)).isoformat()}
+            for i in range(size)
+        ]
+    }
+
+    def save_each():
+        for session in sessions:
+            session.client_feedback = f'Отзыв {time.perf_counter()}'
+            session.save()
+
+    def post_bulk():
+        response = api.post('/api/clients/sessions/bulk/', payload, format='json')
+        assert response.status_code == 201, response.data
+
+    result = {}
+    for name, func in (('bulk', post_bulk), ('save', save_each)):
+        with override_settings(SIMPLE_HISTORY_ENABLED=False):
+            plain_ms, _ = measure(func, repeat)
+        history_ms, queries = measure(func, repeat)
+        ratio = history_ms / plain_ms
+        result.update({
+            f'{name}_ms': plain_ms, f'{name}_history_ms': history_ms, f'{name}_history_queries': queries,
+            f'{name}_ratio': round(ratio, 2), f'{name}_ok': ratio <= HISTORY_OVERHEAD_BUDGET[name],
+        })
+    return result
+
+
+def bench_auth(size, repeat):
+    """
+    GET /api/notifications/unread_count/ (счетчики из кеша) `size` раз: access-токен с claims
+    (users/authentication.py, без запроса пользователя) против токена без них (SELECT users_user на запрос).
+    """
+    from rest_framework_simplejwt.tokens import AccessToken
+    from users.serializers import CustomTokenObtainPairSerializer
+
+    coach = make_coach()
+    tokens = {
+        'claims': str(CustomTokenObtainPairSerializer.get_token(coach).access_token),
+        'db': str(AccessToken.for_user(coach)),
+    }
+    result = {}
+    for name, token in tokens.items():
+        api = APIClient()
+        api.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        api.get('/api/notifications/unread_count/')
+
+        def run():
+            for _ in range(size):
+                assert api.get('/api/notifications/unread_count/').status_code == 200
+
+        ms, queries = measure(run, repeat)
+        result.update({f'{name}_ms': ms, f'{name}_queries': queries})
+    return result
+
+
+SCENARIOS = {
+    'clients-list': (bench_clients_list, [10, 100, 1000]),
+    'sessions-list': (bench_sessions_list, [100, 1000, 10000]),
+    'sessions-range': (bench_sessions_range, [100000, 1000000]),
+    'comments-scoping': (bench_comments_scoping, [10000, 100000]),
+    'sessions-bulk': (bench_sessions_bulk, [100, 500, 1000]),
+    'clients-attribute-filter': (bench_clients_attribute_filter, [10000, 100000]),
+    'measurement-series': (bench_measurement_series, [365, 1825, 3650]),
+    'coach-dashboard': (bench_coach_dashboard, [10000, 100000]),
+    'search': (bench_search, [100000, 1000000]),
+    'export': (bench_export, [10000, 100000]),
+    'history-overhead': (bench_history_overhead, [100, 1000]),
+    'auth': (bench_auth, [100, 1000]),
+}
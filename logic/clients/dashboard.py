@@ -0,0 +1,86 @@
+"""
+Сводка для главной кабинета тренера: одна ручка вместо нескольких списков.
+Всё считается условной агрегацией (COUNT ... FILTER) - фиксированное число запросов
+при любом числе клиентов и сессий, результат кешируется на DASHBOARD_TTL.
+"""
+from datetime import datetime, time, timedelta
+
+from django.core.cache import cache
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.utils import timezone
+
+from .models import Client, WorkSession
+
+DASHBOARD_TTL = 60
+DASHBOARD_KEY = 'dashboard:{}:{}'
+# Сколько "забытых" клиентов показываем списком (всего их - в clients.inactive)
+INACTIVE_LIST_LIMIT = 10
+
+
+def week_bounds(now=None):
+    """[понедельник 00:00, следующий понедельник 00:00) в текущей таймзоне."""
+    today = timezone.localdate(now)
+    monday = today - timedelta(days=today.weekday())
+    start = timezone.make_aware(datetime.combine(monday, time.min))
+    return start, start + timedelta(days=7)
+
+
+def compute_dashboard(coach, inactive_days):
+    # Импорт здесь: notifications зависит от clients, а не наоборот
+    from notifications import counters
+
+    now = timezone.now()
+    week_start, week_end = week_bounds(now)
+    cutoff = now - timedelta(days=inactive_days)
+
+    # Последняя прошедшая сессия клиента - обратный проход по индексу (client, date)
+    last_session = Subquery(
+        WorkSession.objects.filter(client=OuterRef('pk'), date__lte=now).order_by('-date').values('date')[:1]
+    )
+    coach_clients = Client.objects.filter(coach=coach).annotate(last_session=last_session)
+    stale = Q(is_active=True) & (Q(last_session__lt=cutoff) | Q(last_session__isnull=True))
+
+    clients = coach_clients.aggregate(
+        total=Count('pk'),
+        active=Count('pk', filter=Q(is_active=True)),
+        inactive=Count('pk', filter=stale),
+    )
+
+    in_week = Q(date__gte=week_start, date__lt=week_end)
+    # Сужаем выборку до недели и ждущих проверки: остальную историю не читаем
+    sessions = WorkSession.objects.filter(client__coach=coach).filter(in_week | Q(status='completed')).aggregate(
+        planned=Count('pk', filter=in_week & Q(status='planned')),
+        completed=Count('pk', filter=in_week & Q(status__in=['completed', 'review'])),
+        missed=Count('pk', filter=in_week & Q(status='missed')),
+        # Клиент отметил выполнение, тренер еще не перевел в 'review' (Проверено)
+        awaiting_review=Count('pk', filter=Q(status='completed')),
+    )
+
+    # Сначала те, у кого сессий не было вовсе, потом - давно не тренировавшиеся
+    inactive_clients = coach_clients.filter(stale).order_by(F('last_session').asc(nulls_first=True), 'pk').values(
+        'id', 'name', 'last_session'
+    )[:INACTIVE_LIST_LIMIT]
+
+    return {
+        'clients': clients,
+        'week': {
+            'start': week_start,
+            'end': week_end,
+            'planned': sessions['planned'],
+            'completed': sessions['completed'],
+            'missed': sessions['missed'],
+        },
+        'awaiting_review': sessions['awaiting_review'],
+        'unread_comments': counters.unread_comments(coach),
+        'inactive_days': inactive_days,
+        'inactive_clients': list(inactive_clients),
+    }
+
+
+def get_dashboard(coach, inactive_days):
+    key = DASHBOARD_KEY.format(coach.pk, inactive_days)
+    data = cache.get(key)
+    if data is None:
+        data = compute_dashboard(coach, inactive_days)
+        cache.set(key, data, DASHBOARD_TTL)
+    return data
@@ -0,0 +1,193 @@
+"""
+Выгрузка данных тренера: клиенты, параметры, сессии, сообщения (только клиенты, где он - тренер).
+Строки читаются серверными курсорами Postgres (iterator(chunk_size=EXPORT_CHUNK)) и уходят в ответ
+по мере чтения, кусками по OUTPUT_CHUNK - память не растет с числом сессий.
+
+Форматы:
+- ndjson - все разделы одним потоком, у каждой записи поле section;
+- csv - один раздел;
+- zip - csv всех разделов и (attachments=True) файлы вложений в attachments/<путь в storage>.
+"""
+import csv
+import json
+import zipfile
+from datetime import date, datetime
+
+from django.contrib.postgres.expressions import ArraySubquery
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, OuterRef
+
+from .models import Client, ClientAttribute, SessionComment, WorkSession
+from .serving import protected_storage, streaming_content
+
+EXPORT_CHUNK = 2000
+OUTPUT_CHUNK = 64 * 1024
+FILE_BLOCK = 1024 * 1024
+FORMATS = {
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'zip': ('application/zip', 'zip'),
+}
+
+
+def export_clients(coach):
+    categories = Client.categories.through.objects.filter(client_id=OuterRef('pk')).values('category_id')
+    tags = Client.tags.through.objects.filter(client_id=OuterRef('pk')).values('tag_id')
+    return Client.objects.filter(coach=coach).values(
+        'id', 'name', 'gender', 'birth_date', 'is_active', 'created_at',
+        email=F('user__email'), category_slugs=ArraySubquery(categories), tag_slugs=ArraySubquery(tags),
+    )
+
+
+def export_attributes(coach):
+    return ClientAttribute.objects.filter(client__coach=coach).values('id', 'client_id', 'attribute', 'value')
+
+
+def export_sessions(coach):
+    return WorkSession.objects.filter(client__coach=coach).values(
+        'id', 'client_id', 'title', 'description', 'client_feedback', 'date', 'status', 'attachment',
+        'created_at', 'updated_at',
+    )
+
+
+def export_comments(coach):
+    return SessionComment.objects.filter(session__client__coach=coach).values(
+        'id', 'session_id', 'author_id', 'text', 'attachment', 'created_at', 'is_read',
+    )
+
+
+SECTIONS = {
+    'clients': export_clients,
+    'client_attributes': export_attributes,
+    'sessions': export_sessions,
+    'comments': export_comments,
+}
+# Разделы, у строк которых есть файл attachment
+ATTACHMENT_SECTIONS = ('sessions', 'comments')
+
+
+def section_rows(coach, section):
+    """Строки раздела по id, серверным курсором."""
+    return SECTIONS[section](coach).order_by('pk').iterator(chunk_size=EXPORT_CHUNK)
+
+
+def section_columns(coach, section):
+    query = SECTIONS[section](coach).query
+    return [*query.values_select, *query.annotation_select]
+
+
+# === Кодирование ===
+
+def csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, list):
+        return ';'.join(str(item) for item in value)
+    return value
+
+
+class LineWriter:
+    """csv.writer пишет сюда, writerow() возвращает готовую строку."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(coach, section):
+    writer = csv.writer(LineWriter())
+    columns = section_columns(coach, section)
+    yield writer.writerow(columns)
+    for row in section_rows(coach, section):
+        yield writer.writerow([csv_value(row[column]) for column in columns])
+
+
+def ndjson_lines(coach):
+    for section in SECTIONS:
+        for row in section_rows(coach, section):
+            yield json.dumps({'section': section, **row}, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+
+def buffered(lines):
+    """Строки -> куски байт по ~OUTPUT_CHUNK: меньше мелких записей в сокет."""
+    parts, size = [], 0
+    for line in lines:
+        data = line.encode()
+        parts.append(data)
+        size += len(data)
+        if size >= OUTPUT_CHUNK:
+            yield b''.join(parts)
+            parts, size = [], 0
+    if parts:
+        yield b''.join(parts)
+
+
+class ZipStream:
+    """Приемник для ZipFile без seek/tell: zipfile пишет дескрипторы после данных, записанное забираем в ответ."""
+
+    def __init__(self):
+        self.parts = []
+        self.size = 0
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.parts)
+        self.parts, self.size = [], 0
+        return data
+
+
+def attachment_files(coach):
+    for section in ATTACHMENT_SECTIONS:
+        names = SECTIONS[section](coach).exclude(attachment='').exclude(attachment__isnull=True)
+        yield from names.order_by('pk').values_list('attachment', flat=True).iterator(chunk_size=EXPORT_CHUNK)
+
+
+def zip_chunks(coach, attachments=False):
+    stream = ZipStream()
+    with zipfile.ZipFile(stream, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for section in SECTIONS:
+            # Размер заранее неизвестен - сразу zip64, чтобы не упасть на больших выгрузках
+            with archive.open(f'{section}.csv', 'w', force_zip64=True) as entry:
+                for line in csv_lines(coach, section):
+                    entry.write(line.encode())
+                    if stream.size >= OUTPUT_CHUNK:
+                        yield stream.drain()
+            yield stream.drain()
+
+        missing = []
+        if attachments:
+            for name in attachment_files(coach):
+                try:
+                    source = protected_storage.open(name, 'rb')
+                except FileNotFoundError:
+                    missing.append(name)
+                    continue
+                with source:
+                    info = zipfile.ZipInfo(f'attachments/{name}', date_time=datetime.now().timetuple()[:6])
+                    # Видео и фото уже сжаты - кладем как есть
+                    info.compress_type = zipfile.ZIP_STORED
+                    info.file_size = source.size
+                    with archive.open(info, 'w') as entry:
+                        while block := source.read(FILE_BLOCK):
+                            entry.write(block)
+                            yield stream.drain()
+        if missing:
+            archive.writestr('missing_attachments.txt', '\n'.join(missing))
+    yield stream.drain()
+
+
+def export_chunks(coach, output, section=None, attachments=False):
+    """Итератор кусков байт выгрузки в формате output (см. FORMATS)."""
+    if output == 'zip':
+        return zip_chunks(coach, attachments)
+    if output == 'csv':
+        return buffered(csv_lines(coach, section))
+    return buffered(ndjson_lines(coach))
@@ -1,61 +1,134 @@
+import re
+from datetime import datetime, time, timedelta
+
 import django_filters
-from django.db.models import Q # <--- ОБЯЗАТЕЛЬНЫЙ ИМПОРТ
-from .models import Pet
+from django.db.models import Q, F, Exists, OuterRef, Subquery # <--- ОБЯЗАТЕЛЬНЫЙ ИМПОРТ
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from .models import Client, Attribute, ClientAttribute, WorkSession
+
+
+class WorkSessionFilter(django_filters.FilterSet):
+    """
+    Фильтр календаря: ?date_from=2025-01-06&date_to=2025-01-12 (обе границы включительно).
+    Границы превращаются в полуинтервал [начало date_from, начало date_to + 1 день) по колонке date,
+    без приведения к DATE (__date), иначе индекс (client, date) не используется.
+    """
+    date_from = django_filters.DateFilter(method='filter_date_from', label="С даты (включительно)")
+    date_to = django_filters.DateFilter(method='filter_date_to', label="По дату (включительно)")
+
+    class Meta:
+        model = WorkSession
+        fields = ['status', 'client', 'date']
+
+    @staticmethod
+    def start_of_day(value):
+        return timezone.make_aware(datetime.combine(value, time.min))
 
-class PetFilter(django_filters.FilterSet):
-    """Фильтр для питомцев с поддержкой EAV-атрибутов"""
+    def filter_date_from(self, queryset, name, value):
+        return queryset.filter(date__gte=self.start_of_day(value))
+
+    def filter_date_to(self, queryset, name, value):
+        return queryset.filter(date__lt=self.start_of_day(value + timedelta(days=1)))
+
+
+class ClientFilter(django_filters.FilterSet):
+    """
+    Фильтр для клиентов с поддержкой EAV-атрибутов:
+    - attributes[weight]=80              - равенство (для text: вхождение, можно списком через запятую);
+    - attributes[weight]__lt=80          - сравнения __lt/__lte/__gt/__gte для number и date;
+    - attributes_order=-squat            - сортировка по атрибуту (пустые значения в конце).
+    Числа, даты и bool сравниваются по типизированным колонкам ClientAttribute (value_num и т.д.)
+    через EXISTS-подзапрос - индекс (attribute, value_num) работает, DISTINCT не нужен.
+    """
     
     categories__slug = django_filters.CharFilter(method='filter_by_categories')
     tags__slug = django_filters.CharFilter(method='filter_by_tags')
     
-    # Фильтр для поиска по названию/кличке (добавил label для ясности в API)
-    name = django_filters.CharFilter(lookup_expr='icontains', label="Поиск по кличке")
+    # Фильтр для поиска по имени (добавил label для ясности в API)
+    name = django_filters.CharFilter(lookup_expr='icontains', label="Поиск по имени")
+
+    ATTRIBUTE_PARAM = re.compile(r'^attributes\[(?P<slug>[-\w]+)\](?:__(?P<lookup>lt|lte|gt|gte))?$')
 
     def filter_by_categories(self, queryset, name, value):
-        """Фильтрация по множественным видам/категориям"""
-        category_slugs = self.request.GET.getlist('categories__slug')
+        """Фильтрация по множественным категориям"""
+        category_slugs = self.data.getlist('categories__slug')
         if category_slugs:
             return queryset.filter(categories__slug__in=category_slugs).distinct()
         return queryset
 
     def filter_by_tags(self, queryset, name, value):
         """Фильтрация по множественным меткам"""
-        tag_slugs = self.request.GET.getlist('tags__slug')
+        tag_slugs = self.data.getlist('tags__slug')
         if tag_slugs:
             return queryset.filter(tags__slug__in=tag_slugs).distinct()
         return queryset
 
     def filter_queryset(self, queryset):
-        """Основной метод фильтрации с поддержкой JSON-атрибутов"""
+        """Основной метод фильтрации с поддержкой EAV-атрибутов"""
         queryset = super().filter_queryset(queryset)
-        
-        # Обработка атрибутов из параметров запроса: attributes[breed]=corgi,husky
-        for key, values in self.request.GET.items():
-            if key.startswith('attributes[') and key.endswith(']'):
-                # Вытаскиваем слаг атрибута, например 'breed'
-                attr_slug = key[key.find('[')+1:key.find(']')]
-                
-                if values:
-                    # Разбиваем строку "corgi,husky" на список
-                    values_list = values.split(',')
-                    
-                    # Создаем сложный запрос через Q-объекты
-                    # Логика: (Value ILIKE 'val1') OR (Value ILIKE 'val2') ...
-                    value_query = Q()
-                    for v in values_list:
-                        # v.strip() убирает лишние пробелы, если они были
-                        # icontains = ищет вхождение без учета регистра
-                        value_query |= Q(attributes__value__icontains=v.strip())
-                    
-                    # Применяем фильтр:
-                    # 1. Фильтруем по конкретному атрибуту (например, Порода)
-                    # 2. И по значению (наша конструкция OR)
-                    queryset = queryset.filter(
-                        attributes__attribute__slug=attr_slug
-                    ).filter(value_query).distinct()
-        
+
+        conditions = []
+        for key, value in self.data.items():
+            match = self.ATTRIBUTE_PARAM.match(key)
+            if match and value:
+                conditions.append((match['slug'], match['lookup'], value))
+
+        order = self.data.get('attributes_order', '')
+        order_slug = order.lstrip('-')
+
+        # Типы всех упомянутых атрибутов - одним запросом
+        slugs = {slug for slug, _, _ in conditions} | ({order_slug} if order_slug else set())
+        types = dict(Attribute.objects.filter(slug__in=slugs).values_list('slug', 'attr_type')) if slugs else {}
+
+        for slug, lookup, value in conditions:
+            if slug not in types:
+                # Несуществующий атрибут не может совпасть
+                return queryset.none()
+            values = ClientAttribute.objects.filter(
+                client=OuterRef('pk'), attribute_id=slug
+            ).filter(self.attribute_value_q(slug, types[slug], lookup, value))
+            queryset = queryset.filter(Exists(values))
+
+        if order_slug in types and types[order_slug] in ClientAttribute.TYPED_COLUMNS:
+            column = ClientAttribute.TYPED_COLUMNS[types[order_slug]]
+            sort_value = Subquery(
+                ClientAttribute.objects.filter(client=OuterRef('pk'), attribute_id=order_slug).values(column)[:1]
+            )
+            expression = F('attribute_sort_value')
+            queryset = queryset.annotate(attribute_sort_value=sort_value).order_by(
+                expression.desc(nulls_last=True) if order.startswith('-') else expression.asc(nulls_last=True),
+                '-created_at',
+            )
+
         return queryset
 
+    @staticmethod
+    def attribute_value_q(slug, attr_type, lookup, raw):
+        column = ClientAttribute.TYPED_COLUMNS.get(attr_type)
+
+        if column is None:
+            if lookup:
+                raise ValidationError({f'attributes[{slug}]': "Сравнения доступны только для чисел и дат."})
+            # Текст: (Value ILIKE 'val1') OR (Value ILIKE 'val2') ...
+            value_query = Q()
+            for v in raw.split(','):
+                value_query |= Q(value__icontains=v.strip())
+            return value_query
+
+        if lookup and attr_type == 'boolean':
+            raise ValidationError({f'attributes[{slug}]': "Сравнения доступны только для чисел и дат."})
+
+        parsed = [ClientAttribute.parse_typed(attr_type, v) for v in raw.split(',')]
+        if any(p is None for p in parsed):
+            raise ValidationError({f'attributes[{slug}]': f"Некорректное значение: {raw}"})
+
+        if lookup:
+            if len(parsed) > 1:
+                raise ValidationError({f'attributes[{slug}]': "Для сравнения нужно одно значение."})
+            return Q(**{f'{column}__{lookup}': parsed[0]})
+        return Q(**{f'{column}__in': parsed})
+
     class Meta:
-        model = Pet
-        fields = ['categories__slug', 'tags__slug', 'is_active', 'is_public']
\ No newline at end of file
+        model = Client
+        fields = ['categories', 'tags', 'categories__slug', 'tags__slug', 'is_active']
@@ -0,0 +1,129 @@
+"""
+История изменений клиентов, сессий и параметров (django-simple-history, см. history_records в models.py).
+Одиночные save()/delete() пишутся сигналами simple_history, массовые вставки - bulk_history()
+одним INSERT ... SELECT на пачку. Здесь же - диффы для API и чистка старой истории пачками.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Exists, IntegerField, OuterRef, Q, Value
+from django.db.models.fields.files import FieldFile
+from django.utils import timezone
+
+from .models import Client, ClientAttribute, WorkSession
+
+HISTORY_MODELS = [Client, WorkSession, ClientAttribute]
+HISTORY_PAGE_SIZE = 50
+HISTORY_MAX_PAGE_SIZE = 200
+PRUNE_CHUNK = 5000
+
+
+def bulk_history(model, objs, user=None):
+    """
+    История для bulk_create (сигналов нет): записи '+' одним INSERT ... SELECT из только что
+    вставленных строк. Значения не ходят через Python - в разы дешевле bulk_history_create,
+    который готовит каждую колонку каждой строки как обычный bulk_create.
+    """
+    if not objs or not getattr(settings, 'SIMPLE_HISTORY_ENABLED', True):
+        return
+    history = model.history.model
+    fields = [field.attname for field in history.tracked_fields]
+    quote = connection.ops.quote_name
+    extra = {
+        'history_date': Value(timezone.now()),
+        'history_change_reason': Value(''),
+        'history_type': Value('+'),
+        'history_user_id': Value(user.pk if user else None, output_field=IntegerField()),
+    }
+    # SELECT: сначала поля модели, затем extra - в том же порядке, что и колонки ниже
+    rows = model._default_manager.filter(pk__in=[obj.pk for obj in objs]).order_by().values(*fields, **extra)
+    sql, params = rows.query.sql_with_params()
+    columns = ', '.join(quote(column) for column in [*(field.column for field in history.tracked_fields), *extra])
+    with connection.cursor() as cursor:
+        cursor.execute(f'INSERT INTO {quote(history._meta.db_table)} ({columns}) {sql}', params)
+
+
+# === Диффы ===
+
+def history_value(value):
+    # Файл в истории - это путь в storage
+    if isinstance(value, FieldFile):
+        return value.name or None
+    return value
+
+
+def tracked_fields(record):
+    # Только редактируемые поля (как в diff_against): без id, created_at и т.п.
+    return [field for field in record.tracked_fields if field.editable and not field.primary_key]
+
+
+def record_changes(record, previous):
+    """[{field, old, new}] записи относительно предыдущей версии. FK - по id, без запросов к связанным таблицам."""
+    if record.history_type == '-':
+        return []
+    changes = []
+    for field in tracked_fields(record):
+        new = history_value(getattr(record, field.attname))
+        old = history_value(getattr(previous, field.attname)) if previous is not None else None
+        if previous is None and new in (None, ''):
+            continue
+        if previous is None or old != new:
+            changes.append({'field': field.name, 'old': old, 'new': new})
+    return changes
+
+
+def object_history(instance, limit=HISTORY_PAGE_SIZE, before=None):
+    """
+    Записи истории объекта, новые сверху, с изменениями относительно предыдущей версии.
+    Один запрос: берем limit + 1 запись - лишняя нужна для диффа последней на странице.
+    before - history_id, с которого продолжать (пагинация). Возвращает (записи, has_more).
+    """
+    records = instance.history.select_related('history_user').order_by('-history_id')
+    if before is not None:
+        records = records.filter(history_id__lt=before)
+    page = list(records[:limit + 1])
+
+    entries = []
+    for index, record in enumerate(page[:limit]):
+        previous = page[index + 1] if index + 1 < len(page) else None
+        entries.append({
+            'history_id': record.history_id,
+            'date': record.history_date,
+            'type': record.get_history_type_display(),
+            'user': record.history_user_id,
+            'user_name': record.history_user.username if record.history_user else None,
+            'reason': record.history_change_reason,
+            'changes': record_changes(record, previous),
+        })
+    return entries, len(page) > limit
+
+
+# === Чистка ===
+
+def prunable(model, cutoff):
+    """
+    Записи старше cutoff, без которых можно обойтись: у объекта есть версия новее
+    (последнюю оставляем как основу для диффов) или объект удален.
+    """
+    newer = model.history.filter(id=OuterRef('id'), history_id__gt=OuterRef('history_id'))
+    return model.history.filter(history_date__lt=cutoff).filter(Q(Exists(newer)) | Q(history_type='-'))
+
+
+def prune_history(days, chunk=PRUNE_CHUNK, models=HISTORY_MODELS):
+    """
+    Удаляет историю старше days дней пачками по chunk строк - каждая пачка в своей короткой
+    транзакции, без долгих блокировок и огромного DELETE. Возвращает {модель: удалено}.
+    """
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted = {}
+    for model in models:
+        total = 0
+        while True:
+            ids = list(prunable(model, cutoff).order_by('history_id').values_list('history_id', flat=True)[:chunk])
+            if not ids:
+                break
+            with transaction.atomic():
+                total += model.history.filter(history_id__in=ids).delete()[0]
+        deleted[model._meta.label] = total
+    return deleted
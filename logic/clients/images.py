@@ -0,0 +1,110 @@
+"""
+Уменьшенные копии картинок: фото клиентов, аватары, иконки справочников.
+Оригинал не трогаем. Варианты пишутся рядом с ним (<папка>/variants/) фоновой задачей
+после сохранения, а их пути - в JSON-поле модели <поле>_variants:
+    {"source": "clients/avatars/a.jpg", "thumb": {"webp": "...", "jpeg": "..."}, ...}
+"""
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+# Имя варианта -> (сторона в px, обрезать до квадрата)
+PHOTO_VARIANTS = {'thumb': (96, True), 'small': (320, True), 'medium': (1024, False)}
+ICON_VARIANTS = {'thumb': (64, False)}
+
+# Для каких полей нарезаем варианты (ключ - model._meta.label_lower)
+IMAGE_FIELDS = {
+    'clients.client': {'photo': PHOTO_VARIANTS},
+    'users.user': {'avatar': PHOTO_VARIANTS},
+    'clients.category': {'icon': ICON_VARIANTS},
+    'clients.tag': {'icon': ICON_VARIANTS},
+    'clients.attribute': {'icon': ICON_VARIANTS},
+}
+
+# WebP - основной формат. JPEG (или PNG, если есть прозрачность) - для клиентов без WebP
+SAVE_OPTIONS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+    'jpeg': {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True},
+    'png': {'format': 'PNG', 'optimize': True},
+}
+
+
+def variants_attr(field_name):
+    return f'{field_name}_variants'
+
+
+def needs_variants(instance, field_name):
+    """Варианты нарезаны не для текущего файла (новая загрузка или файл удален)."""
+    current = getattr(instance, field_name).name or ''
+    return getattr(instance, variants_attr(field_name)).get('source', '') != current
+
+
+def render_variants(field_file, variants):
+    """
+    Нарезает варианты файла и сохраняет их в то же хранилище.
+    Возвращает {вариант: {формат: имя файла}}; для не-картинок (SVG и т.п.) - пустой dict.
+    """
+    try:
+        field_file.open('rb')
+        with Image.open(field_file) as image:
+            # Поворот по EXIF: иначе фото с телефона окажутся лежащими на боку
+            source = ImageOps.exif_transpose(image)
+            source.load()
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError):
+        return {}
+    finally:
+        field_file.close()
+
+    has_alpha = source.mode in ('RGBA', 'LA') or 'transparency' in source.info
+    source = source.convert('RGBA' if has_alpha else 'RGB')
+    formats = ('webp', 'png' if has_alpha else 'jpeg')
+
+    directory, filename = os.path.split(field_file.name)
+    stem = os.path.splitext(filename)[0]
+    result = {}
+    for name, (size, crop) in variants.items():
+        if crop:
+            # Не увеличиваем: квадрат не больше меньшей стороны оригинала
+            side = min(size, *source.size)
+            resized = ImageOps.fit(source, (side, side), Image.Resampling.LANCZOS)
+        else:
+            resized = source.copy()
+            resized.thumbnail((size, size), Image.Resampling.LANCZOS)
+
+        result[name] = {}
+        for fmt in formats:
+            buffer = BytesIO()
+            resized.save(buffer, **SAVE_OPTIONS[fmt])
+            path = os.path.join(directory, 'variants', f'{stem}_{name}.{fmt}')
+            result[name][fmt] = field_file.storage.save(path, ContentFile(buffer.getvalue()))
+    return result
+
+
+def delete_variants(storage, variants):
+    for name, files in variants.items():
+        if name == 'source':
+            continue
+        for path in files.values():
+            storage.delete(path)
+
+
+def variant_urls(instance, field_name, request=None):
+    """
+    {вариант: {формат: url}} для сериализаторов. None, пока варианты текущего файла не готовы -
+    тогда клиент показывает оригинал.
+    """
+    field_file = getattr(instance, field_name)
+    if not field_file or needs_variants(instance, field_name):
+        return None
+
+    def url(path):
+        url = field_file.storage.url(path)
+        return request.build_absolute_uri(url) if request is not None else url
+
+    return {
+        name: {fmt: url(path) for fmt, path in files.items()}
+        for name, files in getattr(instance, variants_attr(field_name)).items()
+        if name != 'source'
+    } or None
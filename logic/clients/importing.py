@@ -0,0 +1,224 @@
+"""
+Массовый импорт клиентов тренера из CSV/XLSX (переезд из таблиц).
+Файл читается построчно и обрабатывается пачками по IMPORT_BATCH строк: email проверяются
+одним запросом на пачку, пользователи, клиенты, связи с программами/тегами и параметры
+создаются через bulk_create. Пароли и письма-приглашения - в фоновой задаче
+clients.tasks.send_client_invites после коммита, запрос импорта их не ждет.
+
+Колонки (первая строка): name, email - обязательные; gender (M/F/O), birth_date,
+categories, tags (слаги через запятую или ';'); колонки со слагами атрибутов - значения параметров.
+"""
+import csv
+import io
+import os
+from datetime import date, datetime
+from functools import partial
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from .history import bulk_history
+from .models import Attribute, AttributeMeasurement, Category, Client, ClientAttribute, Tag
+from .serializers import ClientImportRowSerializer
+from .tasks import send_client_invites
+
+User = get_user_model()
+
+IMPORT_BATCH = 500
+REQUIRED_COLUMNS = {'name', 'email'}
+BASE_COLUMNS = REQUIRED_COLUMNS | {'gender', 'birth_date', 'categories', 'tags'}
+CSV_DELIMITERS = ',;\t'
+
+
+class ImportFileError(Exception):
+    pass
+
+
+# === Чтение файла ===
+
+def cell_text(value):
+    """Значение ячейки XLSX -> строка, как если бы таблицу сохранили в CSV."""
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        value = value.date()
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def read_csv(file):
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    try:
+        sample = text.read(4096)
+        text.seek(0)
+    except UnicodeDecodeError:
+        raise ImportFileError("CSV должен быть в кодировке UTF-8.")
+    try:
+        # Excel с русской локалью сохраняет CSV через ';'
+        dialect = csv.Sniffer().sniff(sample, delimiters=CSV_DELIMITERS)
+    except csv.Error:
+        dialect = csv.excel
+    for row in csv.reader(text, dialect):
+        yield [value.strip() for value in row]
+
+
+def read_xlsx(file):
+    from openpyxl import load_workbook
+
+    try:
+        workbook = load_workbook(file, read_only=True, data_only=True)
+    except Exception:
+        raise ImportFileError("Не удалось открыть XLSX.")
+    try:
+        for row in workbook.active.iter_rows(values_only=True):
+            yield [cell_text(value) for value in row]
+    finally:
+        workbook.close()
+
+
+READERS = {'.csv': read_csv, '.xlsx': read_xlsx}
+
+
+def read_rows(filename, file):
+    """(колонки, итератор (номер строки в файле, {колонка: значение})). Пустые строки пропускаются."""
+    reader = READERS.get(os.path.splitext(filename)[1].lower())
+    if reader is None:
+        raise ImportFileError("Поддерживаются файлы .csv и .xlsx.")
+    lines = reader(file)
+    header = next(lines, None)
+    if not header:
+        raise ImportFileError("Файл пуст.")
+    columns = [column.strip().lower() for column in header]
+    missing = REQUIRED_COLUMNS - set(columns)
+    if missing:
+        raise ImportFileError(f"Нет обязательных колонок: {', '.join(sorted(missing))}.")
+
+    def rows():
+        for number, values in enumerate(lines, start=2):
+            if any(values):
+                # Пустые ячейки = значение не задано (для необязательных полей - значение по умолчанию)
+                yield number, {column: value for column, value in zip(columns, values) if column and value}
+
+    return columns, rows()
+
+
+# === Импорт ===
+
+def import_clients(coach, filename, file, batch_size=IMPORT_BATCH):
+    """
+    Создает клиентов тренера из файла. Каждая пачка - своя транзакция: ошибка в строке
+    не отменяет остальные, строки с ошибками попадают в отчет.
+    Отчет: {"created", "errors": [{"row", "email", "errors"}], "ignored_columns"}.
+    """
+    columns, rows = read_rows(filename, file)
+    attributes = {attribute.slug: attribute for attribute in Attribute.objects.filter(slug__in=columns)}
+    context = {
+        'categories': set(Category.objects.values_list('slug', flat=True)),
+        'tags': set(Tag.objects.values_list('slug', flat=True)),
+        'attributes': attributes,
+    }
+    report = {
+        'created': 0,
+        'errors': [],
+        'ignored_columns': [column for column in columns if column and column not in BASE_COLUMNS | set(attributes)],
+    }
+    seen_emails = set()
+    try:
+        while batch := list(islice(rows, batch_size)):
+            import_batch(coach, batch, context, seen_emails, report)
+    except (ImportFileError, UnicodeDecodeError, csv.Error) as exc:
+        # Битая строка посреди файла: уже созданные пачки остаются, в отчете - где остановились
+        report['errors'].append({'row': None, 'email': None, 'errors': {'file': str(exc)}})
+    return report
+
+
+def import_batch(coach, batch, context, seen_emails, report):
+    valid = []
+    for number, values in batch:
+        serializer = ClientImportRowSerializer(data=values, context=context)
+        if not serializer.is_valid():
+            report['errors'].append({'row': number, 'email': values.get('email'), 'errors': serializer.errors})
+            continue
+        row = serializer.validated_data
+        if row['email'] in seen_emails:
+            report['errors'].append({'row': number, 'email': row['email'], 'errors': {'email': "Повторяется в файле."}})
+            continue
+        seen_emails.add(row['email'])
+        valid.append((number, row))
+
+    # Занятые email - одним запросом на пачку (логин клиента = email). Email строк уже в нижнем
+    # регистре, а существующие аккаунты могут быть записаны как угодно - сравниваем без учета регистра
+    emails = [row['email'] for _, row in valid]
+    taken = set()
+    existing = User.objects.annotate(email_l=Lower('email'), username_l=Lower('username'))
+    for email, username in existing.filter(Q(email_l__in=emails) | Q(username_l__in=emails)).values_list('email_l', 'username_l'):
+        taken.update({email, username})
+    rows = []
+    for number, row in valid:
+        if row['email'] in taken:
+            report['errors'].append({'row': number, 'email': row['email'], 'errors': {'email': "Пользователь с таким email уже существует."}})
+        else:
+            rows.append((number, row))
+    if not rows:
+        return
+
+    try:
+        with transaction.atomic():
+            clients = create_clients(coach, [row for _, row in rows], context['attributes'])
+    except IntegrityError:
+        # Кто-то успел зарегистрировать один из email между проверкой и вставкой
+        for number, row in rows:
+            report['errors'].append({'row': number, 'email': row['email'], 'errors': {'email': "Конфликт при сохранении, повторите импорт строки."}})
+        return
+    report['created'] += len(clients)
+
+
+def create_clients(coach, rows, attributes):
+    """bulk_create всего, что для клиента делает ClientCreateSerializer, плюс параметры и первые замеры."""
+    # Пароль задаст задача приглашения: хеширование (PBKDF2) - дорогая часть, не для запроса
+    users = User.objects.bulk_create([
+        User(username=row['email'], email=row['email'], password=make_password(None)) for row in rows
+    ])
+    clients = Client.objects.bulk_create([
+        Client(
+            user=user, coach=coach, name=row['name'], gender=row['gender'], birth_date=row.get('birth_date'),
+        )
+        for user, row in zip(users, rows)
+    ])
+
+    Client.categories.through.objects.bulk_create([
+        Client.categories.through(client_id=client.pk, category_id=slug)
+        for client, row in zip(clients, rows) for slug in dict.fromkeys(row['categories'])
+    ])
+    Client.tags.through.objects.bulk_create([
+        Client.tags.through(client_id=client.pk, tag_id=slug)
+        for client, row in zip(clients, rows) for slug in dict.fromkeys(row['tags'])
+    ])
+
+    values = []
+    for client, row in zip(clients, rows):
+        for slug, value in row['attributes'].items():
+            attribute = ClientAttribute(client=client, attribute_id=slug, value=value)
+            # bulk_create не вызывает save() - типизированные колонки заполняем сами
+            attribute.fill_typed_value(attributes[slug].attr_type)
+            values.append(attribute)
+    ClientAttribute.objects.bulk_create(values)
+    bulk_history(Client, clients, user=coach)
+    bulk_history(ClientAttribute, values, user=coach)
+    # Как ClientAttributeViewSet: числовое значение - первая точка в истории замеров
+    now = timezone.now()
+    AttributeMeasurement.objects.bulk_create([
+        AttributeMeasurement(client_id=v.client_id, attribute_id=v.attribute_id, value=v.value_num, measured_at=now)
+        for v in values if v.value_num is not None
+    ])
+
+    transaction.on_commit(partial(send_client_invites.delay, [user.pk for user in users]))
+    return clients
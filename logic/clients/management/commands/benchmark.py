@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from clients.benchmarks import SCENARIOS
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Замеры производительности API на синтетических данных (все данные откатываются после прогона)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('scenario', choices=sorted(SCENARIOS))
+        parser.add_argument('--sizes', nargs='+', type=int, help='Размеры датасета (по умолчанию - свои для сценария)')
+        parser.add_argument('--repeat', type=int, default=5, help='Сколько раз повторять замер')
+
+    def handle(self, *args, **options):
+        bench, default_sizes = SCENARIOS[options['scenario']]
+        sizes = options['sizes'] or default_sizes
+
+        # Как в тест-раннере: разрешает хост testserver для APIClient и глушит отправку почты
+        setup_test_environment()
+        try:
+            self.run_scenario(options['scenario'], bench, sizes, options['repeat'])
+        finally:
+            teardown_test_environment()
+
+    def run_scenario(self, name, bench, sizes, repeat):
+        self.stdout.write(f"Сценарий: {name}")
+        for size in sizes:
+            # Каждый размер в своей транзакции, которую откатываем - база остается чистой
+            try:
+                with transaction.atomic():
+                    result = bench(size, repeat)
+                    raise Rollback
+            except Rollback:
+                pass
+
+            metrics = ', '.join(
+                f'{key}={value:.2f}' if isinstance(value, float) else f'{key}={value}'
+                for key, value in result.items()
+            )
+            self.stdout.write(self.style.SUCCESS(f'  N={size}: {metrics}'))
@@ -0,0 +1,33 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from clients.export import FORMATS, SECTIONS, export_chunks
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Выгружает клиентов тренера, параметры, сессии и сообщения в ndjson/csv/zip (clients/export.py)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='Файл, куда писать')
+        parser.add_argument('--coach', required=True, help='username тренера')
+        parser.add_argument('--format', choices=list(FORMATS), default='zip')
+        parser.add_argument('--section', choices=list(SECTIONS), help='Раздел (для csv)')
+        parser.add_argument('--attachments', action='store_true', help='Положить файлы вложений в zip')
+
+    def handle(self, *args, **options):
+        coach = User.objects.filter(username=options['coach']).first()
+        if coach is None:
+            raise CommandError(f"Тренер {options['coach']} не найден")
+        if options['format'] == 'csv' and not options['section']:
+            raise CommandError('Для csv укажите --section')
+        if options['attachments'] and options['format'] != 'zip':
+            raise CommandError('Вложения выгружаются только в zip')
+
+        written = 0
+        with open(options['output'], 'wb') as f:
+            for chunk in export_chunks(coach, options['format'], options['section'], options['attachments']):
+                f.write(chunk)
+                written += len(chunk)
+        self.stdout.write(self.style.SUCCESS(f"Записано {written} байт в {options['output']}"))
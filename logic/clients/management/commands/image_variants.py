@@ -0,0 +1,21 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from clients.images import IMAGE_FIELDS, needs_variants
+from clients.tasks import generate_image_variants
+
+
+class Command(BaseCommand):
+    help = 'Ставит в очередь нарезку вариантов для картинок, у которых их еще нет (загруженных до пайплайна)'
+
+    def handle(self, *args, **options):
+        for label, fields in IMAGE_FIELDS.items():
+            model = apps.get_model(label)
+            for field_name in fields:
+                queued = 0
+                rows = model.objects.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True})
+                for instance in rows.only('pk', field_name, f'{field_name}_variants').iterator():
+                    if needs_variants(instance, field_name):
+                        generate_image_variants.delay(label, instance.pk, field_name)
+                        queued += 1
+                self.stdout.write(f'{label}.{field_name}: {queued}')
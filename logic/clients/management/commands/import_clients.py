@@ -0,0 +1,31 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from clients.importing import ImportFileError, import_clients
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Импортирует клиентов тренера из CSV/XLSX (колонки name, email, ... - см. clients/importing.py)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл .csv или .xlsx')
+        parser.add_argument('--coach', required=True, help='username тренера')
+
+    def handle(self, *args, **options):
+        coach = User.objects.filter(username=options['coach']).first()
+        if coach is None:
+            raise CommandError(f"Тренер {options['coach']} не найден")
+
+        with open(options['path'], 'rb') as f:
+            try:
+                report = import_clients(coach, options['path'], f)
+            except ImportFileError as exc:
+                raise CommandError(str(exc))
+
+        for error in report['errors']:
+            self.stderr.write(f"Строка {error['row']} ({error['email']}): {error['errors']}")
+        if report['ignored_columns']:
+            self.stdout.write(f"Пропущены колонки: {', '.join(report['ignored_columns'])}")
+        self.stdout.write(self.style.SUCCESS(f"Создано клиентов: {report['created']}, ошибок: {len(report['errors'])}"))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from clients.history import PRUNE_CHUNK, prune_history
+
+
+class Command(BaseCommand):
+    help = 'Удаляет историю изменений старше --days дней (последняя версия каждого объекта остается)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=365, help='Сколько дней истории хранить')
+        parser.add_argument('--chunk', type=int, default=PRUNE_CHUNK, help='Строк на один DELETE')
+
+    def handle(self, *args, **options):
+        deleted = prune_history(options['days'], options['chunk'])
+        for label, count in deleted.items():
+            self.stdout.write(f"{label}: {count}")
+        self.stdout.write(self.style.SUCCESS(f"Удалено записей истории: {sum(deleted.values())}"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from clients import analytics
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает недельную сводку сессий (ClientWeeklyStats) из WorkSession'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--client', type=int, nargs='+', help='Только для этих клиентов (id)')
+
+    def handle(self, *args, **options):
+        rows = analytics.rebuild(options['client'])
+        self.stdout.write(self.style.SUCCESS(f'Недельных строк: {rows}'))
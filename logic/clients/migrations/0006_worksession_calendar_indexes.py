@@ -0,0 +1,21 @@
+# Generated by Django 6.0 on 2026-10-18 14:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0005_client_birth_date_client_gender_alter_client_name_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='worksession',
+            index=models.Index(fields=['client', 'date'], name='session_client_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='worksession',
+            index=models.Index(fields=['client', 'status', 'date'], name='session_client_status_date_idx'),
+        ),
+    ]
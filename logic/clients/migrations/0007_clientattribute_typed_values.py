@@ -0,0 +1,84 @@
+# Generated by Django 6.0 on 2026-10-18 14:38
+
+from datetime import datetime
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+from django.db import migrations, models
+from django.utils.dateparse import parse_date
+
+# Копия ClientAttribute.parse_typed на момент миграции: изменения модели не должны ее ломать
+TYPED_COLUMNS = {'number': 'value_num', 'date': 'value_date', 'boolean': 'value_bool'}
+TRUE_VALUES = {'true', '1', 'yes', 'да', 'on'}
+FALSE_VALUES = {'false', '0', 'no', 'нет', 'off'}
+MAX_NUMBER = Decimal(10) ** 9
+
+
+def parse_typed(attr_type, raw):
+    raw = (raw or '').strip()
+    if attr_type == 'number':
+        try:
+            number = Decimal(raw.replace(',', '.')).quantize(Decimal('0.001'), rounding=ROUND_HALF_UP)
+        except InvalidOperation:
+            return None
+        return number if number.is_finite() and abs(number) < MAX_NUMBER else None
+    if attr_type == 'date':
+        try:
+            return parse_date(raw) or datetime.strptime(raw, '%d.%m.%Y').date()
+        except ValueError:
+            return None
+    if attr_type == 'boolean':
+        lowered = raw.lower()
+        if lowered in TRUE_VALUES:
+            return True
+        if lowered in FALSE_VALUES:
+            return False
+    return None
+
+
+def fill_typed_values(apps, schema_editor):
+    ClientAttribute = apps.get_model('clients', 'ClientAttribute')
+    changed = []
+    for item in ClientAttribute.objects.select_related('attribute').iterator(chunk_size=2000):
+        column = TYPED_COLUMNS.get(item.attribute.attr_type)
+        if column:
+            setattr(item, column, parse_typed(item.attribute.attr_type, item.value))
+            changed.append(item)
+    ClientAttribute.objects.bulk_update(changed, ['value_num', 'value_date', 'value_bool'], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0006_worksession_calendar_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='clientattribute',
+            name='value_bool',
+            field=models.BooleanField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='clientattribute',
+            name='value_date',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='clientattribute',
+            name='value_num',
+            field=models.DecimalField(blank=True, decimal_places=3, editable=False, max_digits=12, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='clientattribute',
+            index=models.Index(fields=['attribute', 'value_num'], name='clientattr_attr_num_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='clientattribute',
+            index=models.Index(fields=['attribute', 'value_date'], name='clientattr_attr_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='clientattribute',
+            index=models.Index(fields=['attribute', 'value_bool'], name='clientattr_attr_bool_idx'),
+        ),
+        migrations.RunPython(fill_typed_values, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 6.0 on 2026-10-18 14:40
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0007_clientattribute_typed_values'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttributeMeasurement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.DecimalField(decimal_places=3, max_digits=12, verbose_name='Значение')),
+                ('measured_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Дата замера')),
+                ('attribute', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='clients.attribute', verbose_name='Атрибут')),
+                ('client', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='measurements', to='clients.client', verbose_name='Клиент')),
+            ],
+            options={
+                'verbose_name': 'Замер',
+                'verbose_name_plural': 'История замеров',
+                'ordering': ['-measured_at'],
+                'indexes': [models.Index(fields=['client', 'attribute', 'measured_at'], include=('value',), name='measurement_series_idx')],
+            },
+        ),
+    ]
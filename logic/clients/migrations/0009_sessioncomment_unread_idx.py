@@ -0,0 +1,19 @@
+# Generated by Django 6.0 on 2026-10-18 14:45
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0008_attributemeasurement'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sessioncomment',
+            index=models.Index(condition=models.Q(('is_read', False)), fields=['session'], name='comment_unread_idx'),
+        ),
+    ]
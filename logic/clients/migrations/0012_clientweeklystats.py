@@ -0,0 +1,58 @@
+# Generated by Django 6.0 on 2026-10-18 15:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q
+from django.db.models.functions import TruncWeek
+from django.utils import timezone
+
+STATUSES = ('planned', 'completed', 'review', 'missed', 'cancelled')
+
+
+def fill_weekly_stats(apps, schema_editor):
+    # Та же агрегация, что clients.analytics.rebuild (в миграции - на исторических моделях)
+    WorkSession = apps.get_model('clients', 'WorkSession')
+    ClientWeeklyStats = apps.get_model('clients', 'ClientWeeklyStats')
+    rows = WorkSession.objects.annotate(week_start=TruncWeek('date')).values('client_id', 'week_start').annotate(
+        **{status: Count('pk', filter=Q(status=status)) for status in STATUSES}
+    ).order_by()
+    ClientWeeklyStats.objects.bulk_create(
+        (
+            ClientWeeklyStats(
+                client_id=row['client_id'],
+                week=timezone.localdate(row['week_start']),
+                **{status: row[status] for status in STATUSES},
+            )
+            for row in rows.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0011_chunkedupload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClientWeeklyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('week', models.DateField(verbose_name='Понедельник недели')),
+                ('planned', models.IntegerField(default=0)),
+                ('completed', models.IntegerField(default=0)),
+                ('review', models.IntegerField(default=0)),
+                ('missed', models.IntegerField(default=0)),
+                ('cancelled', models.IntegerField(default=0)),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='weekly_stats', to='clients.client')),
+            ],
+            options={
+                'verbose_name': 'Статистика клиента за неделю',
+                'verbose_name_plural': 'Статистика клиентов по неделям',
+                'constraints': [models.UniqueConstraint(fields=('client', 'week'), name='weekly_stats_client_week_uniq')],
+            },
+        ),
+        migrations.RunPython(fill_weekly_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 6.0 on 2026-10-18 15:14
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0013_fulltext_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sessioncomment',
+            index=models.Index(fields=['session', 'created_at', 'id'], name='comment_thread_idx'),
+        ),
+        # Старый индекс по session убираем, когда новый уже построен
+        migrations.AlterField(
+            model_name='sessioncomment',
+            name='session',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='comments', to='clients.worksession'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 6.0 on 2026-10-18 16:16
+
+import os
+import shutil
+
+import clients.serving
+from django.conf import settings
+from django.db import migrations, models
+
+ATTACHMENT_MODELS = ('WorkSession', 'SessionComment')
+
+
+def move_attachments(source_root, target_root):
+    def move(apps, schema_editor):
+        # Имена в БД не меняются - переезжают только файлы: из публичного MEDIA_ROOT в PROTECTED_MEDIA_ROOT
+        for model_name in ATTACHMENT_MODELS:
+            model = apps.get_model('clients', model_name)
+            names = model.objects.exclude(attachment='').exclude(attachment__isnull=True).values_list('attachment', flat=True)
+            for name in names.iterator(chunk_size=2000):
+                source, target = os.path.join(source_root, name), os.path.join(target_root, name)
+                if os.path.exists(source) and not os.path.exists(target):
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    shutil.move(source, target)
+    return move
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0015_history'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='sessioncomment',
+            name='attachment',
+            field=models.FileField(blank=True, null=True, storage=clients.serving.ProtectedStorage(), upload_to='comments/', verbose_name='Файл'),
+        ),
+        migrations.AlterField(
+            model_name='worksession',
+            name='attachment',
+            field=models.FileField(blank=True, null=True, storage=clients.serving.ProtectedStorage(), upload_to='sessions/attachments/', verbose_name='Вложение'),
+        ),
+        migrations.RunPython(
+            move_attachments(settings.MEDIA_ROOT, settings.PROTECTED_MEDIA_ROOT),
+            move_attachments(settings.PROTECTED_MEDIA_ROOT, settings.MEDIA_ROOT),
+        ),
+    ]
@@ -1,11 +1,48 @@
+import uuid
+from datetime import datetime
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from simple_history.models import HistoricalRecords
+
+from .serving import protected_storage
+
+# Конфигурация полнотекстового поиска Postgres для текстов (стемминг русского)
+SEARCH_CONFIG = 'russian'
+
+
+def search_vector_column(*weighted_fields, config=SEARCH_CONFIG):
+    """
+    tsvector-колонка, которую Postgres пересчитывает сам при каждой записи (GENERATED ... STORED):
+    работает и для bulk_create/update(), без сигналов и триггеров. weighted_fields - [(поле, вес A-D)].
+    """
+    vectors = [SearchVector(field, weight=weight, config=config) for field, weight in weighted_fields]
+    expression = vectors[0]
+    for vector in vectors[1:]:
+        expression = expression + vector
+    return models.GeneratedField(expression=expression, output_field=SearchVectorField(), db_persist=True)
+
+
+def history_records(*excluded_fields):
+    """
+    История изменений модели (django-simple-history, диффы и чистка - clients/history.py).
+    excluded_fields - производные колонки, которые в истории не нужны; history_id - bigint, как и остальные id.
+    """
+    return HistoricalRecords(excluded_fields=list(excluded_fields), history_id_field=models.BigAutoField(primary_key=True))
+
 
 class Category(models.Model):
     slug = models.SlugField(primary_key=True)
     name = models.CharField(max_length=50, verbose_name="Название категории")
     description = models.TextField(blank=True, verbose_name="Описание")
     icon = models.FileField(upload_to='categories/icons/', null=True, blank=True, verbose_name="Иконка")
+    # Уменьшенные копии (clients/images.py), заполняет фоновая задача
+    icon_variants = models.JSONField(default=dict, blank=True, editable=False)
 
     def __str__(self):
         return self.name
@@ -20,6 +57,8 @@ class Tag(models.Model):
     name = models.CharField(max_length=50, verbose_name="Название тега")
     color = models.CharField(max_length=7, default="#808080", verbose_name="Цвет (HEX)")
     icon = models.FileField(upload_to='tags/icons/', null=True, blank=True, verbose_name="Иконка")
+    # Уменьшенные копии (clients/images.py), заполняет фоновая задача
+    icon_variants = models.JSONField(default=dict, blank=True, editable=False)
 
     def __str__(self):
         return self.name
@@ -41,6 +80,8 @@ class Attribute(models.Model):
     ]
     attr_type = models.CharField(max_length=10, choices=TYPE_CHOICES, default='text')
     icon = models.FileField(upload_to='attributes/icons/', null=True, blank=True, verbose_name="Иконка")
+    # Уменьшенные копии (clients/images.py), заполняет фоновая задача
+    icon_variants = models.JSONField(default=dict, blank=True, editable=False)
 
     def __str__(self):
         return self.name
@@ -76,6 +117,8 @@ class Client(models.Model):
 
     name = models.CharField(max_length=100, verbose_name="Имя клиента")
     photo = models.ImageField(upload_to='clients/avatars/', null=True, blank=True, verbose_name="Фото")
+    # Миниатюры фото для списков (clients/images.py), заполняет фоновая задача
+    photo_variants = models.JSONField(default=dict, blank=True, editable=False)
     gender = models.CharField(max_length=1, choices=GENDER_CHOICES, default='M', verbose_name="Пол")
     birth_date = models.DateField(null=True, blank=True, verbose_name="Дата рождения")
     categories = models.ManyToManyField(Category, blank=True, related_name='clients', verbose_name="Программы")
@@ -84,6 +127,12 @@ class Client(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     is_active = models.BooleanField(default=True, verbose_name="Активен")
 
+    # Имена не стеммим ('simple'): "Иванова" не должна находиться по "Иван" через основу слова,
+    # для опечаток и частичного ввода - триграммный индекс по name
+    search_vector = search_vector_column(('name', 'A'), config='simple')
+
+    history = history_records('search_vector', 'photo_variants')
+
     def __str__(self):
         return self.name
 
@@ -91,6 +140,10 @@ class Client(models.Model):
         verbose_name = "Клиент"
         verbose_name_plural = "Клиенты"
         ordering = ['-created_at']
+        indexes = [
+            GinIndex(fields=['search_vector'], name='client_search_idx'),
+            GinIndex(fields=['name'], opclasses=['gin_trgm_ops'], name='client_name_trgm_idx'),
+        ]
 
 
 class ClientAttribute(models.Model):
@@ -98,10 +151,113 @@ class ClientAttribute(models.Model):
     attribute = models.ForeignKey(Attribute, on_delete=models.CASCADE)
     value = models.CharField(max_length=255, verbose_name="Значение")
 
+    # Типизированные копии value (заполняются в save() по attribute.attr_type).
+    # По ним идут фильтры "вес < 80" и сортировки прямо в SQL.
+    value_num = models.DecimalField(max_digits=12, decimal_places=3, null=True, blank=True, editable=False)
+    value_date = models.DateField(null=True, blank=True, editable=False)
+    value_bool = models.BooleanField(null=True, blank=True, editable=False)
+
+    # Типизированные колонки выводятся из value - в истории достаточно его
+    history = history_records('value_num', 'value_date', 'value_bool')
+
+    TYPED_COLUMNS = {'number': 'value_num', 'date': 'value_date', 'boolean': 'value_bool'}
+    TRUE_VALUES = {'true', '1', 'yes', 'да', 'on'}
+    FALSE_VALUES = {'false', '0', 'no', 'нет', 'off'}
+    MAX_NUMBER = Decimal(10) ** 9
+    NUMBER_STEP = Decimal('0.001')
+
     class Meta:
         unique_together = ('client', 'attribute')
         verbose_name = "Параметр клиента"
         verbose_name_plural = "Параметры клиента"
+        indexes = [
+            models.Index(fields=['attribute', 'value_num'], name='clientattr_attr_num_idx'),
+            models.Index(fields=['attribute', 'value_date'], name='clientattr_attr_date_idx'),
+            models.Index(fields=['attribute', 'value_bool'], name='clientattr_attr_bool_idx'),
+        ]
+
+    @classmethod
+    def parse_typed(cls, attr_type, raw):
+        """
+        Строка -> значение для типизированной колонки ('80,5' -> Decimal, '31.12.2024' -> date, 'да' -> True).
+        Для text или нераспознанного значения - None.
+        """
+        raw = (raw or '').strip()
+        if attr_type == 'number':
+            # Округляем, как округлит колонка (decimal_places=3), и только потом проверяем, что влезает
+            # в max_digits=12: 999999999.9996 -> 1000000000.000 уже не влезает
+            try:
+                number = Decimal(raw.replace(',', '.')).quantize(cls.NUMBER_STEP, rounding=ROUND_HALF_UP)
+            except InvalidOperation:
+                return None
+            return number if number.is_finite() and abs(number) < cls.MAX_NUMBER else None
+        if attr_type == 'date':
+            try:
+                return parse_date(raw) or datetime.strptime(raw, '%d.%m.%Y').date()
+            except ValueError:
+                return None
+        if attr_type == 'boolean':
+            lowered = raw.lower()
+            if lowered in cls.TRUE_VALUES:
+                return True
+            if lowered in cls.FALSE_VALUES:
+                return False
+        return None
+
+    def fill_typed_value(self, attr_type=None):
+        """Раскладывает value по типизированным колонкам. attr_type можно передать, чтобы не грузить Attribute."""
+        attr_type = attr_type or self.attribute.attr_type
+        self.value_num = self.value_date = self.value_bool = None
+        column = self.TYPED_COLUMNS.get(attr_type)
+        if column:
+            setattr(self, column, self.parse_typed(attr_type, self.value))
+
+    def save(self, *args, **kwargs):
+        self.fill_typed_value()
+        # update_or_create сохраняет только поля из defaults - типизированные колонки тоже должны попасть
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'value' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'value_num', 'value_date', 'value_bool'}
+        super().save(*args, **kwargs)
+
+    def log_measurement(self, measured_at=None):
+        """Дописывает текущее числовое значение в историю замеров (для графиков прогресса)."""
+        if self.value_num is None:
+            return None
+        return AttributeMeasurement.objects.create(
+            client_id=self.client_id,
+            attribute_id=self.attribute_id,
+            value=self.value_num,
+            measured_at=measured_at or timezone.now(),
+        )
+
+
+class AttributeMeasurement(models.Model):
+    """
+    История замеров числовых атрибутов (вес, талия, жим...). Только дописывается.
+    ClientAttribute хранит последнее значение, здесь - вся серия для графиков.
+    """
+    # Отдельный индекс по client не нужен - его покрывает measurement_series_idx
+    client = models.ForeignKey(
+        Client, on_delete=models.CASCADE, related_name='measurements', db_index=False, verbose_name="Клиент"
+    )
+    attribute = models.ForeignKey(Attribute, on_delete=models.CASCADE, verbose_name="Атрибут")
+    value = models.DecimalField(max_digits=12, decimal_places=3, verbose_name="Значение")
+    measured_at = models.DateTimeField(default=timezone.now, verbose_name="Дата замера")
+
+    def __str__(self):
+        return f"{self.client_id} {self.attribute_id}={self.value} ({self.measured_at:%d.%m.%Y})"
+
+    class Meta:
+        verbose_name = "Замер"
+        verbose_name_plural = "История замеров"
+        ordering = ['-measured_at']
+        indexes = [
+            # Серия одного атрибута клиента за период; value в INCLUDE - агрегаты без чтения таблицы (Postgres)
+            models.Index(
+                fields=['client', 'attribute', 'measured_at'], include=['value'], name='measurement_series_idx'
+            ),
+        ]
 
 
 class WorkSession(models.Model):
@@ -118,7 +274,7 @@ class WorkSession(models.Model):
     title = models.CharField(max_length=200, verbose_name="Название")
     description = models.TextField(blank=True, verbose_name="Задание / План")
     client_feedback = models.TextField(blank=True, verbose_name="Отчет клиента")
-    attachment = models.FileField(upload_to='sessions/attachments/', null=True, blank=True, verbose_name="Вложение")
+    attachment = models.FileField(upload_to='sessions/attachments/', storage=protected_storage, null=True, blank=True, verbose_name="Вложение")
 
     date = models.DateTimeField(verbose_name="Дата и время")
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='planned', verbose_name="Статус")
@@ -126,6 +282,10 @@ class WorkSession(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    search_vector = search_vector_column(('title', 'A'), ('description', 'B'), ('client_feedback', 'C'))
+
+    history = history_records('search_vector', 'updated_at')
+
     def __str__(self):
         return f"{self.title} ({self.client.name})"
 
@@ -133,20 +293,98 @@ class WorkSession(models.Model):
         verbose_name = "Сессия / Тренировка"
         verbose_name_plural = "Сессии"
         ordering = ['-date']
+        indexes = [
+            # Календарь: сессии клиентов за период (date_from/date_to)
+            models.Index(fields=['client', 'date'], name='session_client_date_idx'),
+            # Календарь с фильтром по статусу (?status=planned)
+            models.Index(fields=['client', 'status', 'date'], name='session_client_status_date_idx'),
+            # Поиск по названию, плану и отчету (clients/search.py)
+            GinIndex(fields=['search_vector'], name='session_search_idx'),
+        ]
+
+
+
+class ClientWeeklyStats(models.Model):
+    """
+    Материализованная сводка: сколько сессий клиента в каждом статусе за неделю.
+    Обновляется инкрементально при сохранении/удалении сессии (clients/analytics.py),
+    поэтому аналитика не пересчитывает всю историю. Полная пересборка - manage.py rebuild_adherence.
+    """
+    client = models.ForeignKey(Client, on_delete=models.CASCADE, related_name='weekly_stats')
+    week = models.DateField(verbose_name="Понедельник недели")
+
+    # По колонке на каждый код из WorkSession.STATUS_CHOICES
+    planned = models.IntegerField(default=0)
+    completed = models.IntegerField(default=0)
+    review = models.IntegerField(default=0)
+    missed = models.IntegerField(default=0)
+    cancelled = models.IntegerField(default=0)
 
+    class Meta:
+        verbose_name = "Статистика клиента за неделю"
+        verbose_name_plural = "Статистика клиентов по неделям"
+        constraints = [
+            models.UniqueConstraint(fields=['client', 'week'], name='weekly_stats_client_week_uniq'),
+        ]
 
 class SessionComment(models.Model):
-    session = models.ForeignKey(WorkSession, on_delete=models.CASCADE, related_name='comments')
+    # Отдельный индекс по session не нужен: его покрывает comment_thread_idx
+    session = models.ForeignKey(WorkSession, on_delete=models.CASCADE, related_name='comments', db_index=False)
     author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, verbose_name="Автор")
     text = models.TextField(verbose_name="Сообщение")
-    attachment = models.FileField(upload_to='comments/', null=True, blank=True, verbose_name="Файл")
+    attachment = models.FileField(upload_to='comments/', storage=protected_storage, null=True, blank=True, verbose_name="Файл")
     created_at = models.DateTimeField(auto_now_add=True)
     is_read = models.BooleanField(default=False)
 
+    search_vector = search_vector_column(('text', 'A'))
+
     def __str__(self):
         return f"Comment by {self.author} on {self.session}"
 
     class Meta:
         ordering = ['created_at']
         verbose_name = "Комментарий к сессии"
-        verbose_name_plural = "Комментарии к сессиям"
\ No newline at end of file
+        verbose_name_plural = "Комментарии к сессиям"
+        indexes = [
+            # Лента треда и синхронизация по курсору (created_at, id) - clients/pagination.py
+            models.Index(fields=['session', 'created_at', 'id'], name='comment_thread_idx'),
+            # Непрочитанные сообщения (пересчет бейджа чата, если счетчика нет в кеше)
+            models.Index(fields=['session'], condition=models.Q(is_read=False), name='comment_unread_idx'),
+            GinIndex(fields=['search_vector'], name='comment_search_idx'),
+        ]
+
+class ChunkedUpload(models.Model):
+    """
+    Загрузка вложения частями (clients/uploads.py): большие видео с телефона идут кусками
+    по chunk_size байт в любом порядке, оборванный кусок просто отправляется заново.
+    После сборки и проверки sha256 файл прикрепляется к сессии или комментарию.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='chunked_uploads')
+    # Куда прикрепить готовый файл (ровно одно из двух)
+    session = models.ForeignKey(WorkSession, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    comment = models.ForeignKey(SessionComment, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField(verbose_name="Размер, байт")
+    chunk_size = models.PositiveIntegerField()
+    checksum = models.CharField(max_length=64, verbose_name="SHA-256")
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Загрузка по частям"
+        verbose_name_plural = "Загрузки по частям"
+
+    @property
+    def chunk_count(self):
+        return max(-(-self.size // self.chunk_size), 1)
+
+    def chunk_length(self, index):
+        """Сколько байт должно быть в куске index (последний - короче)."""
+        return min(self.chunk_size, self.size - index * self.chunk_size)
+
+    @property
+    def target(self):
+        return self.session or self.comment
@@ -0,0 +1,73 @@
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination
+
+# Сообщений на страницу треда (clients.views.SessionCommentViewSet.thread)
+THREAD_PAGE_SIZE = 50
+THREAD_MAX_PAGE_SIZE = 200
+
+
+class SessionCursorPagination(CursorPagination):
+    """
+    Курсорная пагинация по дате сессии (новые сверху).
+    Курсор не "плывет" при добавлении сессий и не требует COUNT(*) по всей истории.
+    """
+    ordering = ('-date', '-id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+
+class MeasurementCursorPagination(CursorPagination):
+    """Сырые замеры - новые сверху. Для графиков есть /measurements/series/."""
+    ordering = ('-measured_at', '-id')
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+def comments_after(comments, anchor):
+    """Сообщения строго после anchor в порядке треда (created_at, id)."""
+    return comments.filter(
+        Q(created_at__gt=anchor.created_at) | Q(created_at=anchor.created_at, pk__gt=anchor.pk)
+    )
+
+
+def comments_before(comments, anchor):
+    """Сообщения строго до anchor."""
+    return comments.filter(
+        Q(created_at__lt=anchor.created_at) | Q(created_at=anchor.created_at, pk__lt=anchor.pk)
+    )
+
+
+def comments_until(comments, anchor):
+    """Сообщения до anchor включительно."""
+    return comments.filter(
+        Q(created_at__lt=anchor.created_at) | Q(created_at=anchor.created_at, pk__lte=anchor.pk)
+    )
+
+
+def thread_anchor(comments, comment_id, param):
+    anchor = comments.select_related(None).filter(pk=comment_id).only('pk', 'created_at').first()
+    if anchor is None:
+        # Сообщение удалено или из другого треда - клиенту проще загрузить тред заново
+        raise ValidationError({param: 'Сообщение не найдено в этом треде.'})
+    return anchor
+
+
+def thread_page(comments, after=None, before=None, limit=THREAD_PAGE_SIZE):
+    """
+    Keyset-страница треда по индексу (session, created_at, id), без OFFSET и COUNT(*).
+    after - новые сообщения после известного (has_more: есть еще новее),
+    before - история выше (has_more: есть еще старше), без обоих - последние limit сообщений.
+    Возвращает (сообщения по возрастанию, has_more).
+    """
+    if after is not None:
+        newer = comments_after(comments, thread_anchor(comments, after, 'after'))
+        page = list(newer.order_by('created_at', 'pk')[:limit + 1])
+        return page[:limit], len(page) > limit
+
+    if before is not None:
+        comments = comments_before(comments, thread_anchor(comments, before, 'before'))
+    page = list(comments.order_by('-created_at', '-pk')[:limit + 1])
+    return page[:limit][::-1], len(page) > limit
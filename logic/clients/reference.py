@@ -0,0 +1,83 @@
+"""
+Кеш справочников (категории, теги, атрибуты) с версионированием и ETag.
+Любое сохранение/удаление справочника меняет версию после коммита (clients/signals.py) -
+старые ключи просто перестают читаться и истекают сами.
+"""
+import hashlib
+import json
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import Category, Tag, Attribute
+from .serializers import CategorySerializer, TagSerializer, AttributeSerializer
+
+VERSION_KEY = 'reference:version'
+CACHE_TTL = 60 * 60 * 24
+
+REFERENCE_SETS = {
+    'categories': (Category, CategorySerializer),
+    'tags': (Tag, TagSerializer),
+    'attributes': (Attribute, AttributeSerializer),
+}
+
+
+def reference_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, uuid4().hex, None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def new_reference_version():
+    cache.set(VERSION_KEY, uuid4().hex, None)
+
+
+def bump_reference_version(**kwargs):
+    """
+    Обработчик post_save/post_delete справочников. Версия меняется после коммита: иначе параллельный
+    запрос успеет собрать кеш из старых данных уже под новой версией, и его никто не исправит.
+    """
+    transaction.on_commit(new_reference_version)
+
+
+def get_reference_data(names, request):
+    """
+    Сериализованные справочники и их ETag (хеш содержимого).
+    Ключ включает хост: в данных абсолютные URL иконок.
+    """
+    key = f"reference:{reference_version()}:{request.build_absolute_uri('/')}:{','.join(names)}"
+    cached = cache.get(key)
+    if cached is None:
+        data = {
+            name: model_serializer(
+                model.objects.all(), many=True, context={'request': request}
+            ).data
+            for name, (model, model_serializer) in ((name, REFERENCE_SETS[name]) for name in names)
+        }
+        content = json.dumps(data, ensure_ascii=False, sort_keys=True)
+        cached = (json.loads(content), f'"{hashlib.sha1(content.encode()).hexdigest()}"')
+        cache.set(key, cached, CACHE_TTL)
+    return cached
+
+
+def conditional_response(request, data, etag, **cache_control):
+    """
+    200 с ETag или 304, если у клиента уже эта версия (If-None-Match).
+    По умолчанию no-cache: хранить можно, но перед использованием - дешевый условный запрос.
+    cache_control переопределяет это (например, max_age=60).
+    """
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match and (etag in parse_etags(if_none_match) or if_none_match.strip() == '*'):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = Response(data)
+    response['ETag'] = etag
+    patch_cache_control(response, public=True, **(cache_control or {'no_cache': True}))
+    return response
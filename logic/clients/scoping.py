@@ -0,0 +1,46 @@
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+from .models import Client
+
+
+class ClientScope:
+    """
+    Какие карточки клиентов доступны пользователю: где он тренер или где он сам клиент.
+    Список id вычисляется одним запросом на весь HTTP-запрос, дальше данные
+    (сессии, комментарии, атрибуты) фильтруются по client_id IN (...) без OR по JOIN-ам и DISTINCT.
+    """
+
+    def __init__(self, user):
+        self.user = user
+
+    @cached_property
+    def client_ids(self):
+        if not self.user.is_authenticated:
+            return frozenset()
+        # Роль (is_coach) тут намеренно не сужает выборку: создать клиента может
+        # любой пользователь (ClientViewSet.perform_create), и видимость должна остаться прежней.
+        # По той же причине scope не берется из claims токена (users/authentication.py): список
+        # клиентов пользователя меняется при каждом создании клиента, а токен живет неделями.
+        return frozenset(
+            Client.objects.filter(Q(coach=self.user) | Q(user=self.user)).values_list('pk', flat=True)
+        )
+
+    def filter(self, queryset, field='client'):
+        """Оставляет в queryset только строки доступных клиентов. field - путь до FK на Client."""
+        if not self.client_ids:
+            return queryset.none()
+        return queryset.filter(**{f'{field}__in': self.client_ids})
+
+    def has_client(self, client_id):
+        return client_id in self.client_ids
+
+
+def get_client_scope(request):
+    """Scope, закешированный на время запроса (на исходном HttpRequest, общий для всех вьюх)."""
+    http_request = getattr(request, '_request', request)
+    scope = getattr(http_request, '_client_scope', None)
+    if scope is None or scope.user != request.user:
+        scope = ClientScope(request.user)
+        http_request._client_scope = scope
+    return scope
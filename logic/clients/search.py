@@ -0,0 +1,63 @@
+"""
+Единый поиск тренера: клиенты, сессии, сообщения чатов.
+Полнотекстовый поиск Postgres по сгенерированным колонкам search_vector (GIN-индексы)
+с ранжированием SearchRank; клиенты дополнительно ищутся по триграммам имени (опечатки, часть слова).
+Всё ограничено клиентами из ClientScope - чужие данные в выдачу не попадают.
+"""
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank, TrigramWordSimilarity
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
+
+from .models import SEARCH_CONFIG, Client, SessionComment, WorkSession
+
+SEARCH_TYPES = ('clients', 'sessions', 'comments')
+# Порог для pg_trgm word_similarity (оператор %> использует индекс client_name_trgm_idx)
+TRIGRAM_THRESHOLD = 0.3
+HEADLINE_OPTIONS = {'start_sel': '<b>', 'stop_sel': '</b>', 'max_words': 20, 'min_words': 8}
+
+
+def search_clients(scope, text, limit):
+    query = SearchQuery(text, search_type='websearch', config='simple')
+    similarity = TrigramWordSimilarity(text, 'name')
+    clients = scope.filter(Client.objects.all(), 'pk').filter(
+        Q(search_vector=query) | Q(name__trigram_word_similar=text)
+    ).annotate(
+        rank=Greatest(SearchRank(F('search_vector'), query), similarity),
+    ).order_by('-rank', 'pk').values('id', 'name', 'rank')[:limit]
+    return list(clients)
+
+
+def search_sessions(scope, text, limit):
+    query = SearchQuery(text, search_type='websearch', config=SEARCH_CONFIG)
+    sessions = scope.filter(WorkSession.objects.all()).filter(search_vector=query).annotate(
+        rank=SearchRank(F('search_vector'), query),
+        # Сниппет считается только для строк после LIMIT
+        snippet=SearchHeadline('description', query, config=SEARCH_CONFIG, **HEADLINE_OPTIONS),
+    ).order_by('-rank', '-date').values('id', 'client_id', 'title', 'date', 'status', 'rank', 'snippet')[:limit]
+    return list(sessions)
+
+
+def search_comments(scope, text, limit):
+    query = SearchQuery(text, search_type='websearch', config=SEARCH_CONFIG)
+    comments = scope.filter(SessionComment.objects.all(), 'session__client').filter(search_vector=query).annotate(
+        rank=SearchRank(F('search_vector'), query),
+        client_id=F('session__client_id'),
+        snippet=SearchHeadline('text', query, config=SEARCH_CONFIG, **HEADLINE_OPTIONS),
+    ).order_by('-rank', '-created_at').values(
+        'id', 'session_id', 'client_id', 'author_id', 'created_at', 'rank', 'snippet'
+    )[:limit]
+    return list(comments)
+
+
+SEARCHERS = {
+    'clients': search_clients,
+    'sessions': search_sessions,
+    'comments': search_comments,
+}
+
+
+def search(scope, text, types=SEARCH_TYPES, limit=20):
+    """{тип: [найденное по убыванию релевантности]} - по одному запросу на тип."""
+    if not scope.client_ids:
+        return {name: [] for name in types}
+    return {name: SEARCHERS[name](scope, text, limit) for name in types}
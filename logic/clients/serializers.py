@@ -1,31 +1,59 @@
+from datetime import datetime, timedelta
+
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from django.db import transaction
-from django.core.mail import send_mail
+from django.utils import timezone
+from django.utils.crypto import get_random_string
 from django.conf import settings
 from .models import (
-    Client, Category, Tag, Attribute, ClientAttribute, 
-    WorkSession, SessionComment
+    Client, Category, Tag, Attribute, ClientAttribute, AttributeMeasurement,
+    WorkSession, SessionComment, ChunkedUpload
 )
+from . import analytics, history, uploads
+from .scoping import get_client_scope
+from .images import variant_urls
+from .pagination import THREAD_PAGE_SIZE, THREAD_MAX_PAGE_SIZE
+from .search import SEARCH_TYPES
+from .export import FORMATS as EXPORT_FORMATS, SECTIONS as EXPORT_SECTIONS
+from .serving import signed_attachment_url
 
 User = get_user_model()
 
 # === Справочники ===
 
+class VariantUrlsField(serializers.Field):
+    """URL уменьшенных копий картинки: {"thumb": {"webp": ..., "jpeg": ...}} или null, пока не нарезаны."""
+
+    def __init__(self, image_field, **kwargs):
+        self.image_field = image_field
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, instance):
+        return variant_urls(instance, self.image_field, self.context.get('request'))
+
 class CategorySerializer(serializers.ModelSerializer):
+    icon_variants = VariantUrlsField('icon')
+
     class Meta:
         model = Category
-        fields = ['slug', 'name', 'description', 'icon']
+        fields = ['slug', 'name', 'description', 'icon', 'icon_variants']
 
 class TagSerializer(serializers.ModelSerializer):
+    icon_variants = VariantUrlsField('icon')
+
     class Meta:
         model = Tag
-        fields = ['slug', 'name', 'color', 'icon']
+        fields = ['slug', 'name', 'color', 'icon', 'icon_variants']
 
 class AttributeSerializer(serializers.ModelSerializer):
+    icon_variants = VariantUrlsField('icon')
+
     class Meta:
         model = Attribute
-        fields = ['slug', 'name', 'attr_type', 'icon']
+        fields = ['slug', 'name', 'attr_type', 'icon', 'icon_variants']
 
 # === Атрибуты Клиента (EAV) ===
 
@@ -39,9 +67,114 @@ class ClientAttributeSerializer(serializers.ModelSerializer):
         fields = ['id', 'attribute', 'attribute_slug', 'attribute_name', 'attribute_type', 'value']
         extra_kwargs = {'attribute': {'write_only': True}}
 
+    def validate(self, attrs):
+        attribute = attrs.get('attribute') or getattr(self.instance, 'attribute', None)
+        value = attrs.get('value', getattr(self.instance, 'value', None))
+        # Для number/date/boolean значение должно разбираться, иначе фильтры по нему не сработают
+        if attribute and attribute.attr_type in ClientAttribute.TYPED_COLUMNS:
+            if ClientAttribute.parse_typed(attribute.attr_type, value) is None:
+                raise serializers.ValidationError(
+                    {'value': f"Некорректное значение для типа '{attribute.get_attr_type_display()}'."}
+                )
+        return attrs
+
+# === История замеров ===
+
+class AttributeMeasurementSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = AttributeMeasurement
+        fields = ['id', 'client', 'attribute', 'value', 'measured_at']
+
+    def validate(self, attrs):
+        if not get_client_scope(self.context['request']).has_client(attrs['client'].pk):
+            raise serializers.ValidationError({'client': "Нет доступа к клиенту."})
+        if attrs['attribute'].attr_type != 'number':
+            raise serializers.ValidationError({'attribute': "История ведется только для числовых атрибутов."})
+        return attrs
+
+    def create(self, validated_data):
+        with transaction.atomic():
+            measurement = super().create(validated_data)
+            newer = AttributeMeasurement.objects.filter(
+                client=measurement.client, attribute=measurement.attribute, measured_at__gt=measurement.measured_at
+            )
+            # Самый свежий замер становится текущим значением в карточке клиента
+            if not newer.exists():
+                ClientAttribute.objects.update_or_create(
+                    client=measurement.client, attribute=measurement.attribute,
+                    defaults={'value': f'{measurement.value.normalize():f}'},
+                )
+        return measurement
+
+class MeasurementSeriesQuerySerializer(serializers.Serializer):
+    """Параметры GET /measurements/series/."""
+    BUCKETS = ['auto', 'day', 'week', 'month']
+
+    client = serializers.IntegerField()
+    attribute = serializers.CharField()
+    bucket = serializers.ChoiceField(choices=BUCKETS, default='auto')
+    date_from = serializers.DateTimeField(required=False)
+    date_to = serializers.DateTimeField(required=False)
+
+class MeasurementBucketSerializer(serializers.Serializer):
+    bucket = serializers.DateTimeField()
+    min = serializers.DecimalField(max_digits=12, decimal_places=3, coerce_to_string=False)
+    max = serializers.DecimalField(max_digits=12, decimal_places=3, coerce_to_string=False)
+    avg = serializers.DecimalField(max_digits=12, decimal_places=3, coerce_to_string=False)
+    count = serializers.IntegerField()
+
+# === Поиск ===
+
+class SearchQuerySerializer(serializers.Serializer):
+    """Параметры GET /search/: q, types=clients,sessions,comments, limit."""
+    q = serializers.CharField(min_length=2, max_length=200)
+    types = serializers.CharField(required=False, default=','.join(SEARCH_TYPES))
+    limit = serializers.IntegerField(min_value=1, max_value=50, default=20)
+
+    def validate_types(self, value):
+        types = [name.strip() for name in value.split(',') if name.strip()]
+        unknown = set(types) - set(SEARCH_TYPES)
+        if not types or unknown:
+            raise serializers.ValidationError(f"Допустимые типы: {', '.join(SEARCH_TYPES)}.")
+        return types
+
+# === Выгрузка ===
+
+class ExportQuerySerializer(serializers.Serializer):
+    """Параметры GET /export/: output=ndjson|csv|zip, section (для csv), attachments (для zip)."""
+    output = serializers.ChoiceField(choices=list(EXPORT_FORMATS), default='ndjson')
+    section = serializers.ChoiceField(choices=list(EXPORT_SECTIONS), required=False)
+    attachments = serializers.BooleanField(default=False)
+
+    def validate(self, attrs):
+        if attrs['output'] == 'csv' and 'section' not in attrs:
+            raise serializers.ValidationError({'section': "Для csv укажите раздел."})
+        if attrs['attachments'] and attrs['output'] != 'zip':
+            raise serializers.ValidationError({'attachments': "Вложения выгружаются только в zip."})
+        return attrs
+
 # === Чат и Сессии ===
 
+class AttachmentField(serializers.FileField):
+    """
+    Вложение сессии/сообщения: на запись - обычный файл, на чтение - подписанная ссылка
+    на /api/clients/attachments/ (с проверкой прав), а не публичный путь в /media/.
+    """
+
+    def __init__(self, kind, **kwargs):
+        self.kind = kind
+        kwargs.setdefault('required', False)
+        kwargs.setdefault('allow_null', True)
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        request = self.context.get('request')
+        if not value or request is None or not request.user.is_authenticated:
+            return None
+        return signed_attachment_url(request, self.kind, value.instance.pk)
+
 class SessionCommentSerializer(serializers.ModelSerializer):
+    attachment = AttachmentField('comments')
     author_name = serializers.ReadOnlyField(source='author.username')
     is_me = serializers.SerializerMethodField()
 
@@ -53,11 +186,37 @@ class SessionCommentSerializer(serializers.ModelSerializer):
     def get_is_me(self, obj):
         request = self.context.get('request')
         if request and request.user:
-            return obj.author == request.user
+            # Сравниваем id, чтобы не грузить автора отдельным запросом
+            return obj.author_id == request.user.id
         return False
 
+class CommentThreadQuerySerializer(serializers.Serializer):
+    """Параметры GET /comments/thread/: session, after или before (id сообщения), limit."""
+    session = serializers.IntegerField()
+    after = serializers.IntegerField(required=False)
+    before = serializers.IntegerField(required=False)
+    limit = serializers.IntegerField(min_value=1, max_value=THREAD_MAX_PAGE_SIZE, default=THREAD_PAGE_SIZE)
+
+    def validate(self, attrs):
+        if 'after' in attrs and 'before' in attrs:
+            raise serializers.ValidationError("Укажите либо after, либо before.")
+        return attrs
+
+class CommentThreadReadSerializer(serializers.Serializer):
+    """Тело POST /comments/read_thread/: session и (необязательно) up_to - последнее показанное сообщение."""
+    session = serializers.IntegerField()
+    up_to = serializers.IntegerField(required=False)
+
+class HistoryQuerySerializer(serializers.Serializer):
+    """Параметры GET .../<id>/history/: limit и before (history_id последней показанной записи)."""
+    before = serializers.IntegerField(required=False)
+    limit = serializers.IntegerField(
+        min_value=1, max_value=history.HISTORY_MAX_PAGE_SIZE, default=history.HISTORY_PAGE_SIZE
+    )
+
 class WorkSessionSerializer(serializers.ModelSerializer):
     comments = SessionCommentSerializer(many=True, read_only=True)
+    attachment = AttachmentField('sessions')
     client_name = serializers.ReadOnlyField(source='client.name')
 
     class Meta:
@@ -69,6 +228,165 @@ class WorkSessionSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['created_at', 'updated_at']
 
+class WorkSessionListSerializer(serializers.ModelSerializer):
+    """
+    Облегченная сессия для списка/календаря: без ленты комментариев.
+    comments_count и last_comment_* приходят аннотациями из WorkSessionViewSet.
+    """
+    client_name = serializers.ReadOnlyField(source='client.name')
+    attachment = AttachmentField('sessions', read_only=True)
+    comments_count = serializers.IntegerField(read_only=True)
+    last_comment = serializers.SerializerMethodField()
+
+    class Meta:
+        model = WorkSession
+        fields = [
+            'id', 'client', 'client_name', 'title', 'date', 'status',
+            'attachment', 'updated_at', 'comments_count', 'last_comment'
+        ]
+
+    def get_last_comment(self, obj):
+        if not obj.last_comment_at:
+            return None
+        request = self.context.get('request')
+        return {
+            'text': obj.last_comment_text,
+            'author': obj.last_comment_author,
+            'created_at': serializers.DateTimeField().to_representation(obj.last_comment_at),
+            'is_me': bool(request and obj.last_comment_author == request.user.id),
+        }
+
+class WorkSessionBulkItemSerializer(serializers.Serializer):
+    # Клиент - просто id: доступ проверяется разом по scope, без запроса на каждую строку
+    client = serializers.IntegerField()
+    title = serializers.CharField(max_length=200)
+    description = serializers.CharField(required=False, allow_blank=True, default='')
+    date = serializers.DateTimeField()
+    status = serializers.ChoiceField(choices=WorkSession.STATUS_CHOICES, default='planned')
+
+class WorkSessionBulkSerializer(serializers.Serializer):
+    """
+    Массовое создание сессий одним запросом. Два формата (можно совместить):
+    - sessions: явный список [{client, title, date, ...}];
+    - план с повтором: clients + title + weekdays + time + start_date + weeks
+      ("Пн/Ср/Пт в 18:00 на 12 недель"), weekdays: 0 - понедельник.
+    """
+    MAX_SESSIONS = 1000
+    RECURRING_FIELDS = ('clients', 'title', 'weekdays', 'time', 'start_date', 'weeks')
+
+    sessions = WorkSessionBulkItemSerializer(many=True, required=False)
+
+    clients = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+    title = serializers.CharField(max_length=200, required=False)
+    description = serializers.CharField(required=False, allow_blank=True, default='')
+    weekdays = serializers.ListField(
+        child=serializers.IntegerField(min_value=0, max_value=6), required=False, allow_empty=False
+    )
+    time = serializers.TimeField(required=False)
+    start_date = serializers.DateField(required=False)
+    weeks = serializers.IntegerField(min_value=1, max_value=52, required=False)
+
+    def validate(self, attrs):
+        rows = [dict(item) for item in attrs.get('sessions', [])]
+
+        if any(field in attrs for field in self.RECURRING_FIELDS):
+            missing = [field for field in self.RECURRING_FIELDS if field not in attrs]
+            if missing:
+                raise serializers.ValidationError({field: "Обязательное поле для плана с повтором." for field in missing})
+            rows += self.expand_recurring(attrs)
+
+        if not rows:
+            raise serializers.ValidationError("Передайте sessions или план с повтором.")
+        if len(rows) > self.MAX_SESSIONS:
+            raise serializers.ValidationError(f"Не больше {self.MAX_SESSIONS} сессий за запрос.")
+
+        scope = get_client_scope(self.context['request'])
+        foreign = {row['client'] for row in rows} - scope.client_ids
+        if foreign:
+            raise serializers.ValidationError({'client': f"Нет доступа к клиентам: {sorted(foreign)}"})
+
+        attrs['rows'] = rows
+        return attrs
+
+    @staticmethod
+    def expand_recurring(attrs):
+        weekdays = set(attrs['weekdays'])
+        days = [attrs['start_date'] + timedelta(days=i) for i in range(attrs['weeks'] * 7)]
+        dates = [
+            timezone.make_aware(datetime.combine(day, attrs['time']))
+            for day in days if day.weekday() in weekdays
+        ]
+        return [
+            {'client': client_id, 'title': attrs['title'], 'description': attrs['description'], 'date': date, 'status': 'planned'}
+            for client_id in attrs['clients'] for date in dates
+        ]
+
+    def create(self, validated_data):
+        # Импорт здесь: notifications зависит от clients, а не наоборот
+        from notifications.dispatch import queue_notifications
+
+        with transaction.atomic():
+            sessions = WorkSession.objects.bulk_create(
+                [
+                    WorkSession(
+                        client_id=row['client'], title=row['title'], description=row['description'],
+                        date=row['date'], status=row['status'],
+                    )
+                    for row in validated_data['rows']
+                ],
+                batch_size=500,
+            )
+            # bulk_create не шлет post_save: вместо уведомления на каждую сессию - одно на клиента,
+            # история - одним INSERT
+            history.bulk_history(WorkSession, sessions, user=self.context['request'].user)
+            queue_notifications(plan_session_ids=[session.pk for session in sessions])
+            analytics.sessions_created(sessions)
+        return sessions
+
+# === Загрузка вложений по частям ===
+
+class ChunkedUploadSerializer(serializers.ModelSerializer):
+    """
+    POST /api/clients/uploads/ - начать загрузку: имя, размер, sha256 всего файла и куда прикрепить
+    (session или comment). В ответе - id, размер куска и уже полученные куски (для докачки).
+    """
+    chunk_size = serializers.IntegerField(
+        min_value=uploads.MIN_CHUNK_SIZE, max_value=uploads.MAX_CHUNK_SIZE, default=uploads.DEFAULT_CHUNK_SIZE
+    )
+    checksum = serializers.RegexField(r'^[0-9a-fA-F]{64}$', help_text="SHA-256 всего файла (hex)")
+    chunk_count = serializers.ReadOnlyField()
+    received = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ChunkedUpload
+        fields = [
+            'id', 'session', 'comment', 'filename', 'size', 'chunk_size', 'checksum',
+            'chunk_count', 'received', 'created_at', 'completed_at'
+        ]
+        read_only_fields = ['created_at', 'completed_at']
+
+    def get_received(self, obj):
+        return uploads.received_chunks(obj)
+
+    def validate_size(self, value):
+        if value > settings.CHUNKED_UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(f"Файл больше {settings.CHUNKED_UPLOAD_MAX_SIZE} байт.")
+        return value
+
+    def validate(self, attrs):
+        session, comment = attrs.get('session'), attrs.get('comment')
+        if bool(session) == bool(comment):
+            raise serializers.ValidationError("Укажите ровно одно: session или comment.")
+
+        request = self.context['request']
+        client_id = session.client_id if session else comment.session.client_id
+        if not get_client_scope(request).has_client(client_id):
+            raise serializers.ValidationError("Нет доступа к клиенту.")
+        # Файл к сообщению прикрепляет только его автор
+        if comment and comment.author_id != request.user.id:
+            raise serializers.ValidationError({'comment': "Можно прикреплять файлы только к своим сообщениям."})
+        return attrs
+
 # === Клиенты ===
 
 class ClientSerializer(serializers.ModelSerializer):
@@ -77,6 +395,8 @@ class ClientSerializer(serializers.ModelSerializer):
     """
     email = serializers.EmailField(source='user.email', read_only=True)
     attributes = ClientAttributeSerializer(many=True, read_only=True)
+    # В списках показывайте photo_variants.thumb/small, оригинал (photo) - только в карточке
+    photo_variants = VariantUrlsField('photo')
     
     categories_details = CategorySerializer(source='categories', many=True, read_only=True)
     tags_details = TagSerializer(source='tags', many=True, read_only=True)
@@ -84,7 +404,7 @@ class ClientSerializer(serializers.ModelSerializer):
     class Meta:
         model = Client
         fields = [
-            'id', 'coach', 'name', 'photo', 'email', 
+            'id', 'coach', 'name', 'photo', 'photo_variants', 'email', 
             'gender', 'birth_date',  # <--- Добавлено
             'categories', 'categories_details',
             'tags', 'tags_details',
@@ -93,6 +413,48 @@ class ClientSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['coach', 'created_at']
 
+class ClientImportRowSerializer(serializers.Serializer):
+    """
+    Строка файла импорта (clients/importing.py). Справочники - из context (множества слагов,
+    загруженные один раз на файл), колонки со слагами атрибутов - значения параметров клиента.
+    """
+    name = serializers.CharField(max_length=100)
+    email = serializers.EmailField()
+    gender = serializers.ChoiceField(choices=Client.GENDER_CHOICES, default='M')
+    birth_date = serializers.DateField(input_formats=['iso-8601', '%d.%m.%Y'], required=False)
+    categories = serializers.CharField(required=False, default='')
+    tags = serializers.CharField(required=False, default='')
+
+    def validate_email(self, value):
+        return value.lower()
+
+    def slugs(self, value, known):
+        slugs = [slug.strip() for slug in value.replace(';', ',').split(',') if slug.strip()]
+        unknown = [slug for slug in slugs if slug not in known]
+        if unknown:
+            raise serializers.ValidationError(f"Не найдены: {', '.join(unknown)}.")
+        return slugs
+
+    def validate_categories(self, value):
+        return self.slugs(value, self.context['categories'])
+
+    def validate_tags(self, value):
+        return self.slugs(value, self.context['tags'])
+
+    def validate(self, attrs):
+        values, errors = {}, {}
+        for slug, attribute in self.context['attributes'].items():
+            value = self.initial_data.get(slug)
+            if not value:
+                continue
+            if attribute.attr_type in ClientAttribute.TYPED_COLUMNS and ClientAttribute.parse_typed(attribute.attr_type, value) is None:
+                errors[slug] = f"Некорректное значение для типа '{attribute.get_attr_type_display()}'."
+            values[slug] = value[:255]
+        if errors:
+            raise serializers.ValidationError(errors)
+        attrs['attributes'] = values
+        return attrs
+
 class ClientCreateSerializer(serializers.ModelSerializer):
     """
     Сериализатор создания: Email -> User + Client + Password Email.
@@ -109,6 +471,10 @@ class ClientCreateSerializer(serializers.ModelSerializer):
         ]
 
     def create(self, validated_data):
+        # Импорт здесь: notifications зависит от clients, а не наоборот; tasks -> reference -> serializers
+        from notifications import outbox
+        from .tasks import invite_email
+
         email = validated_data.pop('email')
         categories = validated_data.pop('categories', [])
         tags = validated_data.pop('tags', [])
@@ -116,30 +482,21 @@ class ClientCreateSerializer(serializers.ModelSerializer):
         if User.objects.filter(email=email).exists():
             raise serializers.ValidationError({"email": "Пользователь с таким email уже существует."})
 
-        password = User.objects.make_random_password(length=10)
+        # make_random_password убран из Django 5.1 - то же самое через get_random_string
+        password = get_random_string(10)
 
         with transaction.atomic():
             user = User.objects.create_user(username=email, email=email, password=password)
             
-            client = Client.objects.create(
-                user=user,
-                coach=self.context['request'].user, 
-                **validated_data
-            )
+            # coach приходит из ClientViewSet.perform_create (serializer.save(coach=...))
+            validated_data.setdefault('coach', self.context['request'].user)
+            client = Client.objects.create(user=user, **validated_data)
             
             client.categories.set(categories)
             client.tags.set(tags)
 
-            try:
-                send_mail(
-                    subject='Доступ к платформе FitCare',
-                    message=f'Ваш тренер создал для вас аккаунт.\nЛогин: {email}\nПароль: {password}',
-                    from_email=settings.DEFAULT_FROM_EMAIL or 'noreply@fitcare.com',
-                    recipient_list=[email],
-                    fail_silently=False,
-                )
-            except Exception as e:
-                print(f"Ошибка отправки письма: {e}")
+            # Письмо - в outbox в этой же транзакции, отправит воркер после коммита (notifications/outbox.py)
+            outbox.enqueue(*invite_email(email, password))
 
             client.generated_password = password
             return client
\ No newline at end of file
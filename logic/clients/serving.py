@@ -0,0 +1,185 @@
+"""
+Раздача вложений сессий и комментариев с проверкой доступа.
+Вложения лежат в PROTECTED_MEDIA_ROOT (protected_storage), вне MEDIA_ROOT: по /media/ их не достать.
+Файл отдается потоком (не читается в память; под ASGI - асинхронным итератором, см. streaming_content),
+поддерживаются Range (перемотка видео), ETag/Last-Modified и 304. В проде отдачу можно делегировать nginx (X-Accel-Redirect)
+или Apache (X-Sendfile) - Django тогда только проверяет права.
+"""
+import mimetypes
+import re
+from urllib.parse import quote
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.core.files.storage import FileSystemStorage
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.deconstruct import deconstructible
+from django.utils.functional import cached_property
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+BLOCK_SIZE = 64 * 1024
+SIGNATURE_SALT = 'clients.attachments'
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+@deconstructible(path='clients.serving.ProtectedStorage')
+class ProtectedStorage(FileSystemStorage):
+    """Файлы в PROTECTED_MEDIA_ROOT без публичного URL - только через /api/clients/attachments/."""
+
+    @cached_property
+    def base_location(self):
+        return settings.PROTECTED_MEDIA_ROOT
+
+    def _clear_cached_properties(self, setting, **kwargs):
+        super()._clear_cached_properties(setting, **kwargs)
+        if setting == 'PROTECTED_MEDIA_ROOT':
+            self.__dict__.pop('base_location', None)
+            self.__dict__.pop('location', None)
+
+    def url(self, name):
+        raise ValueError("Вложения раздаются только через signed_attachment_url.")
+
+
+protected_storage = ProtectedStorage()
+
+
+def signed_attachment_url(request, kind, pk):
+    """
+    Ссылка на вложение для <video src> и <img src>, где нельзя передать заголовок Authorization:
+    подпись содержит id пользователя и действует MEDIA_URL_MAX_AGE секунд.
+    """
+    path = reverse('attachment', kwargs={'kind': kind, 'pk': pk})
+    signature = signing.TimestampSigner(salt=SIGNATURE_SALT).sign(f'{kind}:{pk}:{request.user.pk}')
+    return request.build_absolute_uri(f'{path}?sig={quote(signature)}')
+
+
+def signed_user_id(signature, kind, pk):
+    """id пользователя из подписи ссылки или None, если подпись чужая или протухла."""
+    try:
+        value = signing.TimestampSigner(salt=SIGNATURE_SALT).unsign(signature, max_age=settings.MEDIA_URL_MAX_AGE)
+    except signing.BadSignature:
+        return None
+    signed_kind, signed_pk, user_id = value.split(':')
+    if (signed_kind, signed_pk) != (kind, str(pk)):
+        return None
+    return int(user_id)
+
+
+def parse_range(header, size):
+    """
+    'bytes=START-END' -> (start, end) включительно. Несколько диапазонов не поддерживаем (отдаем файл целиком).
+    None - заголовка нет или он не разобран; ValueError - диапазон вне файла (416).
+    """
+    match = RANGE_RE.match(header or '')
+    if not match or match.groups() == ('', ''):
+        return None
+    start, end = match.groups()
+    if start == '':
+        # bytes=-500 - последние 500 байт
+        start, end = max(size - int(end), 0), size - 1
+    else:
+        start, end = int(start), min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+def if_range_matches(request, etag, last_modified):
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+def read_range(file, start, length):
+    try:
+        file.seek(start)
+        while length > 0:
+            block = file.read(min(BLOCK_SIZE, length))
+            if not block:
+                break
+            length -= len(block)
+            yield block
+    finally:
+        file.close()
+
+
+async def iterate_in_thread(chunks):
+    """
+    Синхронный генератор (ORM, чтение файла) -> асинхронный. Под ASGI Django иначе сначала собирает
+    синхронный streaming_content в список - вся выгрузка оказалась бы в памяти.
+    """
+    next_chunk = sync_to_async(next, thread_sensitive=True)
+    while (chunk := await next_chunk(chunks, None)) is not None:
+        yield chunk
+
+
+def streaming_content(request, chunks):
+    """Тело StreamingHttpResponse под тот сервер, которым обслуживается запрос (ASGI или WSGI)."""
+    request = getattr(request, '_request', request)
+    return iterate_in_thread(chunks) if isinstance(request, ASGIRequest) else chunks
+
+
+def serve_file(request, field_file):
+    """HTTP-ответ с содержимым field_file (права уже проверены вызывающим)."""
+    storage, name = field_file.storage, field_file.name
+    size = storage.size(name)
+    last_modified = int(storage.get_modified_time(name).timestamp())
+    etag = quote_etag(f'{last_modified:x}-{size:x}')
+    content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = build_response(request, field_file, size, content_type, etag, last_modified)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Accept-Ranges'] = 'bytes'
+    patch_cache_control(response, private=True, max_age=settings.MEDIA_URL_MAX_AGE)
+    return response
+
+
+def build_response(request, field_file, size, content_type, etag, last_modified):
+    filename = field_file.name.rsplit('/', 1)[-1]
+
+    internal_url = settings.PROTECTED_MEDIA_INTERNAL_URL
+    if settings.PROTECTED_MEDIA_SERVER == 'nginx':
+        # Range, sendfile и кеширование сделает nginx по location internal
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = quote(f'{internal_url}{field_file.name}')
+        response['Content-Disposition'] = f"inline; filename*=UTF-8''{quote(filename)}"
+        return response
+    if settings.PROTECTED_MEDIA_SERVER == 'apache':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = field_file.path
+        response['Content-Disposition'] = f"inline; filename*=UTF-8''{quote(filename)}"
+        return response
+
+    try:
+        byte_range = parse_range(request.headers.get('Range'), size)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    whole = byte_range is None or not if_range_matches(request, etag, last_modified)
+    if whole and not isinstance(getattr(request, '_request', request), ASGIRequest):
+        # Целиком под WSGI - FileResponse отдает блоками (или через wsgi.file_wrapper/sendfile)
+        return FileResponse(field_file.open('rb'), content_type=content_type, filename=filename)
+
+    start, end = (0, size - 1) if whole else byte_range
+    length = end - start + 1
+    response = StreamingHttpResponse(
+        streaming_content(request, read_range(field_file.open('rb'), start, length)),
+        status=200 if whole else 206, content_type=content_type,
+    )
+    response['Content-Length'] = str(length)
+    if not whole:
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Content-Disposition'] = f"inline; filename*=UTF-8''{quote(filename)}"
+    return response
@@ -1,6 +1,14 @@
-from django.db.models.signals import post_delete
+from functools import partial
+
+from django.apps import apps
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
-from .models import Client
+from . import analytics
+from .models import Client, Category, Tag, Attribute, WorkSession
+from .images import IMAGE_FIELDS, variants_attr, needs_variants, delete_variants
+from .reference import bump_reference_version
+from .tasks import generate_image_variants
 
 @receiver(post_delete, sender=Client)
 def delete_related_user(sender, instance, **kwargs):
@@ -13,4 +21,62 @@ def delete_related_user(sender, instance, **kwargs):
         # Удаление User автоматически вызовет каскадное удаление всего, 
         # что привязано к User (например, токены авторизации)
         instance.user.delete()
-        print(f"User {instance.user.email} was deleted via Client deletion.")
\ No newline at end of file
+        print(f"User {instance.user.email} was deleted via Client deletion.")
+
+
+# Любое изменение справочника - новая версия кеша /categories/, /tags/, /attributes/ и /reference/
+for reference_model in (Category, Tag, Attribute):
+    post_save.connect(bump_reference_version, sender=reference_model, dispatch_uid=f'reference_save_{reference_model.__name__}')
+    post_delete.connect(bump_reference_version, sender=reference_model, dispatch_uid=f'reference_delete_{reference_model.__name__}')
+
+
+def queue_image_variants(sender, instance, **kwargs):
+    """Новый файл картинки - нарезка вариантов в Celery после коммита (сохранение не ждет Pillow)."""
+    label = sender._meta.concrete_model._meta.label_lower
+    for field_name in IMAGE_FIELDS[label]:
+        if needs_variants(instance, field_name):
+            transaction.on_commit(partial(generate_image_variants.delay, label, instance.pk, field_name))
+
+
+def delete_image_variants(sender, instance, **kwargs):
+    for field_name in IMAGE_FIELDS[sender._meta.concrete_model._meta.label_lower]:
+        field_file = getattr(instance, field_name)
+        variants = getattr(instance, variants_attr(field_name))
+        transaction.on_commit(partial(delete_variants, field_file.storage, variants))
+
+
+for label in IMAGE_FIELDS:
+    image_model = apps.get_model(label)
+    # Сигналы приходят с sender=классом экземпляра: прокси (users.TokenUser - request.user в API)
+    # подключаем отдельно, иначе их save() прошел бы мимо
+    for sender in [model for model in apps.get_models() if model._meta.concrete_model is image_model]:
+        sender_label = sender._meta.label_lower
+        post_save.connect(queue_image_variants, sender=sender, dispatch_uid=f'image_variants_save_{sender_label}')
+        post_delete.connect(delete_image_variants, sender=sender, dispatch_uid=f'image_variants_delete_{sender_label}')
+
+
+# === Недельная сводка для аналитики (clients/analytics.py) ===
+
+@receiver(pre_save, sender=WorkSession)
+def remember_session_state(sender, instance, raw=False, **kwargs):
+    """Запоминаем клиента/неделю/статус до сохранения, чтобы применить дельту, а не пересчитывать."""
+    instance._analytics_state = None
+    if instance.pk and not raw:
+        old = WorkSession.objects.filter(pk=instance.pk).values_list('client_id', 'date', 'status').first()
+        if old:
+            instance._analytics_state = (old[0], analytics.week_of(old[1]), old[2])
+
+
+@receiver(post_save, sender=WorkSession)
+def update_weekly_stats(sender, instance, raw=False, **kwargs):
+    if not raw:
+        analytics.session_changed(getattr(instance, '_analytics_state', None), analytics.session_state(instance))
+
+
+@receiver(post_delete, sender=WorkSession)
+def remove_from_weekly_stats(sender, instance, origin=None, **kwargs):
+    # Каскад от удаления клиента (или его аккаунта): сводка клиента удаляется вместе с ним,
+    # а дельта вставила бы строку удаленного клиента и уронила коммит на FK
+    if origin is not None and not isinstance(origin, WorkSession) and getattr(origin, 'model', None) is not WorkSession:
+        return
+    analytics.session_changed(analytics.session_state(instance), None)
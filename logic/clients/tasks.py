@@ -0,0 +1,88 @@
+from datetime import timedelta
+
+from celery import shared_task
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+
+from . import uploads
+from .images import IMAGE_FIELDS, variants_attr, needs_variants, render_variants, delete_variants
+from .models import ChunkedUpload
+from .reference import bump_reference_version
+
+User = get_user_model()
+
+# Справочники отдаются из кеша (clients/reference.py) - после нарезки иконок его надо сбросить
+REFERENCE_MODELS = {'clients.category', 'clients.tag', 'clients.attribute'}
+
+
+@shared_task
+def generate_image_variants(model_label, pk, field_name):
+    """Нарезает варианты картинки из поля `field_name` и записывает их пути в <поле>_variants."""
+    model = apps.get_model(model_label)
+    instance = model.objects.filter(pk=pk).first()
+    if instance is None or not needs_variants(instance, field_name):
+        return
+
+    field_file = getattr(instance, field_name)
+    old_variants = getattr(instance, variants_attr(field_name))
+    variants = {'source': field_file.name or ''}
+    if field_file:
+        variants.update(render_variants(field_file, IMAGE_FIELDS[model_label][field_name]))
+
+    # Пишем, только если файл не успели заменить, пока мы резали (update() не дергает сигналы)
+    same_file = Q(**{field_name: field_file.name}) if field_file else Q(**{field_name: ''}) | Q(**{f'{field_name}__isnull': True})
+    updated = model.objects.filter(same_file, pk=pk).update(**{variants_attr(field_name): variants})
+
+    # Проигравший гонку результат не нужен; у победителя - убираем варианты прошлого файла
+    delete_variants(field_file.storage, old_variants if updated else variants)
+    if updated and model_label in REFERENCE_MODELS:
+        bump_reference_version()
+
+
+@shared_task
+def purge_stale_uploads(max_age_hours=48):
+    """Удаляет брошенные загрузки по частям вместе с кусками на диске (для celery beat / cron)."""
+    stale = ChunkedUpload.objects.filter(
+        completed_at__isnull=True, created_at__lt=timezone.now() - timedelta(hours=max_age_hours)
+    )
+    for upload in stale:
+        uploads.discard(upload)
+    return stale.delete()[0]
+
+
+def invite_email(email, password):
+    """(кому, тема, текст) письма с доступом для клиента, которого создал тренер."""
+    return (
+        email,
+        'Доступ к платформе FitCare',
+        f'Ваш тренер создал для вас аккаунт.\nЛогин: {email}\nПароль: {password}',
+    )
+
+
+@shared_task
+def send_client_invites(user_ids):
+    """
+    Пароли и письма-приглашения клиентам из импорта (clients/importing.py).
+    Хеширование паролей - здесь, а не в запросе; письма - в outbox одним INSERT.
+    Повторный запуск безопасен: пароль задается только тем, у кого его еще нет.
+    """
+    # Импорт здесь: notifications зависит от clients, а не наоборот
+    from notifications import outbox
+
+    users = [
+        user for user in User.objects.filter(pk__in=user_ids, last_login__isnull=True)
+        if not user.has_usable_password()
+    ]
+    messages = []
+    for user in users:
+        password = get_random_string(10)
+        user.set_password(password)
+        messages.append(invite_email(user.email, password))
+    with transaction.atomic():
+        User.objects.bulk_update(users, ['password'], batch_size=500)
+        outbox.enqueue_many(messages)
+    return len(messages)
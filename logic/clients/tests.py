@@ -1,3 +1,1138 @@
-from django.test import TestCase
+import csv
+import hashlib
+import json
+import os
+import zipfile
+import tempfile
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from io import BytesIO
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from PIL import Image
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.models import Q
+from django.test import AsyncClient, TestCase, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .benchmarks import make_coach, seed_reference_data, seed_clients, seed_sessions, seed_measurements, api_client_for
+from . import analytics, uploads
+from .dashboard import week_bounds
+from .reference import reference_version
+from .history import prune_history
+from .models import Client, Attribute, Tag, AttributeMeasurement, WorkSession, SessionComment, ClientAttribute, ChunkedUpload, ClientWeeklyStats
+from .serializers import ClientAttributeSerializer
+from .scoping import get_client_scope
+from notifications.models import Notification
+from users.models import TokenUser
+
+User = get_user_model()
+
+
+class TemporaryMediaMixin:
+    """Каталоги из temp_dir_settings (MEDIA_ROOT и т.п.) - временные, удаляются после тестов класса."""
+
+    temp_dir_settings = ('MEDIA_ROOT', 'PROTECTED_MEDIA_ROOT')
+
+    @classmethod
+    def setUpClass(cls):
+        directories = {}
+        for name in cls.temp_dir_settings:
+            directory = tempfile.TemporaryDirectory()
+            cls.addClassCleanup(directory.cleanup)
+            directories[name] = directory.name
+        overridden = override_settings(**directories)
+        overridden.enable()
+        cls.addClassCleanup(overridden.disable)
+        super().setUpClass()
+
+
+class ClientListQueryCountTests(TestCase):
+    """Список и карточка клиента - фиксированное число запросов независимо от N."""
+
+    def setUp(self):
+        self.coach = make_coach()
+        self.api = api_client_for(self.coach)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.api.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response
+
+    def test_list_query_count_does_not_grow_with_clients(self):
+        seed_clients(self.coach, 5)
+        small, _ = self.count_queries('/api/clients/clients/')
+
+        seed_clients(self.coach, 45)
+        large, response = self.count_queries('/api/clients/clients/')
+
+        self.assertEqual(small, large)
+        self.assertEqual(len(response.data), 50)
+
+    def test_list_payload_contains_nested_data(self):
+        seed_clients(self.coach, 3)
+        _, response = self.count_queries('/api/clients/clients/')
+
+        item = response.data[0]
+        self.assertTrue(item['email'])
+        self.assertEqual(len(item['attributes']), 3)
+        self.assertEqual(len(item['tags_details']), 2)
+        self.assertEqual(len(item['categories_details']), 1)
+
+    def test_retrieve_query_count(self):
+        client = seed_clients(self.coach, 1)[0]
+        with self.assertNumQueries(5):
+            # id доступных клиентов (ClientScope), клиент+user, категории, теги, атрибуты+справочник
+            response = self.api.get(f'/api/clients/clients/{client.pk}/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_client_sees_only_own_profile(self):
+        clients = seed_clients(self.coach, 3)
+        response = api_client_for(clients[0].user).get('/api/clients/clients/')
+        self.assertEqual([c['id'] for c in response.data], [clients[0].pk])
+
+
+class WorkSessionListTests(TestCase):
+    """Список сессий: курсорная пагинация и сводка по комментариям вместо ленты."""
+
+    def setUp(self):
+        self.coach = make_coach()
+        self.clients = seed_clients(self.coach, 2)
+        self.api = api_client_for(self.coach)
+
+    def test_list_is_cursor_paginated(self):
+        seed_sessions(self.clients, 30)
+        response = self.api.get('/api/clients/sessions/', {'page_size': 25})
+
+        self.assertEqual(len(response.data['results']), 25)
+        dates = [s['date'] for s in response.data['results']]
+        self.assertEqual(dates, sorted(dates, reverse=True))
+
+        second = self.api.get(response.data['next'])
+        third = self.api.get(second.data['next'])
+        self.assertEqual(len(third.data['results']), 10)
+        self.assertIsNone(third.data['next'])
+
+    def test_list_returns_comment_summary_without_thread(self):
+        session = seed_sessions(self.clients[:1], 1, comments_per_session=3)[0]
+        last = session.comments.order_by('-created_at', '-id').first()
+
+        item = self.api.get('/api/clients/sessions/').data['results'][0]
+
+        self.assertNotIn('comments', item)
+        self.assertEqual(item['comments_count'], 3)
+        self.assertEqual(item['last_comment']['author'], self.coach.pk)
+        self.assertTrue(item['last_comment']['is_me'])
+        self.assertEqual(item['last_comment']['text'], last.text[:100])
+
+    def test_list_query_count_does_not_grow_with_comments(self):
+        seed_sessions(self.clients, 5)
+        with CaptureQueriesContext(connection) as empty:
+            self.api.get('/api/clients/sessions/')
+
+        seed_sessions(self.clients, 5, comments_per_session=10)
+        with CaptureQueriesContext(connection) as busy:
+            self.api.get('/api/clients/sessions/')
+
+        self.assertEqual(len(empty.captured_queries), len(busy.captured_queries))
+
+    def test_detail_keeps_full_thread(self):
+        session = seed_sessions(self.clients[:1], 1, comments_per_session=3)[0]
+        response = self.api.get(f'/api/clients/sessions/{session.pk}/')
+        self.assertEqual(len(response.data['comments']), 3)
+
+
+# Быстрый хешер: задача приглашений задает пароль каждому импортированному клиенту
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ClientImportTests(TestCase):
+    """Импорт клиентов из CSV/XLSX: пачками, с отчетом по строкам и приглашениями в фоне."""
+
+    url = '/api/clients/clients/import/'
+
+    def setUp(self):
+        self.coach = make_coach()
+        self.api = api_client_for(self.coach)
+        seed_reference_data()
+        make_coach('taken@example.com')
+
+    def upload(self, name, content):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.api.post(self.url, {'file': SimpleUploadedFile(name, content)}, format='multipart')
+
+    def csv_rows(self, count):
+        lines = ['name;email;categories;bench-attr-0'] + [f'Клиент {i};c{i}@example.com;bench-cat-0;7{i}' for i in range(count)]
+        return '\n'.join(lines).encode()
+
+    def test_csv_report_and_created_data(self):
+        content = '\n'.join([
+            'Name;Email;Gender;Birth_date;Categories;Tags;bench-attr-0;Notes',
+            'Анна;Anna@Example.com;F;31.12.1990;bench-cat-0, bench-cat-1;bench-tag-0;62,5;',
+            'Борис;not-an-email;M;;;;;',
+            'Вера;anna@example.com;F;;;;;',
+            'Глеб;taken@example.com;M;;;;;',
+            'Дина;dina@example.com;F;;nope;;;',
+            'Егор;egor@example.com;M;;;;много;',
+        ]).encode('utf-8-sig')
+        response = self.upload('clients.csv', content)
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(response.data['ignored_columns'], ['notes'])
+        self.assertEqual(
+            {error['row']: set(error['errors']) for error in response.data['errors']},
+            {3: {'email'}, 4: {'email'}, 5: {'email'}, 6: {'categories'}, 7: {'bench-attr-0'}},
+        )
+
+        client = Client.objects.get(coach=self.coach)
+        self.assertEqual((client.name, client.gender, client.birth_date), ('Анна', 'F', date(1990, 12, 31)))
+        self.assertEqual(client.user.email, 'anna@example.com')
+        self.assertEqual(sorted(client.categories.values_list('slug', flat=True)), ['bench-cat-0', 'bench-cat-1'])
+        self.assertEqual(client.attributes.get().value_num, Decimal('62.5'))
+        self.assertEqual(AttributeMeasurement.objects.get(client=client).value, Decimal('62.5'))
+        self.assertEqual(client.history.get().history_user_id, self.coach.pk)
+
+        # Приглашение ушло после коммита, пароль задан задачей
+        self.assertEqual([m.to for m in mail.outbox], [['anna@example.com']])
+        password = mail.outbox[0].body.rsplit('Пароль: ', 1)[1]
+        client.user.refresh_from_db()
+        self.assertTrue(client.user.check_password(password))
+
+    def test_taken_email_is_case_insensitive(self):
+        User.objects.create_user(username='Boris@Example.com', email='Boris@Example.com')
+        User.objects.create_user(username='vera', email='Vera@Example.com')
+        response = self.upload('clients.csv', 'name;email\nБорис;boris@example.com\nВера;VERA@example.com\nДина;dina@example.com'.encode())
+
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual([error['row'] for error in response.data['errors']], [2, 3])
+        self.assertFalse(User.objects.filter(username__in=['boris@example.com', 'vera@example.com']).exists())
+
+    def test_xlsx(self):
+        from openpyxl import Workbook
+
+        workbook = Workbook()
+        workbook.active.append(['name', 'email', 'birth_date', 'bench-attr-1'])
+        workbook.active.append(['Анна', 'anna@example.com', datetime(1990, 12, 31), 80.0])
+        content = BytesIO()
+        workbook.save(content)
+
+        response = self.upload('clients.xlsx', content.getvalue())
+        self.assertEqual(response.data['created'], 1, response.data)
+        client = Client.objects.get(coach=self.coach)
+        self.assertEqual(client.birth_date, date(1990, 12, 31))
+        self.assertEqual(client.attributes.get().value, '80')
+
+    def test_query_count_does_not_grow_with_rows(self):
+        with CaptureQueriesContext(connection) as small:
+            self.assertEqual(self.upload('a.csv', self.csv_rows(3)).data['created'], 3)
+        Client.objects.all().delete()
+        with CaptureQueriesContext(connection) as large:
+            self.assertEqual(self.upload('b.csv', self.csv_rows(30)).data['created'], 30)
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+    def test_bad_files(self):
+        self.assertEqual(self.upload('clients.txt', b'name,email').status_code, 400)
+        self.assertEqual(self.upload('clients.csv', b'name,phone\nx,1').status_code, 400)
+        self.assertEqual(self.upload('clients.xlsx', b'not a zip').status_code, 400)
+
+
+class CommentThreadTests(TestCase):
+    """Чат сессии: синхронизация по курсору (created_at, id) и прочтение треда одним UPDATE."""
+
+    url = '/api/clients/comments/thread/'
+
+    def setUp(self):
+        self.coach = make_coach()
+        self.client_card = seed_clients(self.coach, 1)[0]
+        self.session = seed_sessions([self.client_card], 1, comments_per_session=7)[0]
+        self.ids = list(self.session.comments.order_by('created_at', 'id').values_list('pk', flat=True))
+        self.api = api_client_for(self.coach)
+        self.client_api = api_client_for(self.client_card.user)
+
+    def page(self, **params):
+        response = self.api.get(self.url, {'session': self.session.pk, **params})
+        self.assertEqual(response.status_code, 200)
+        return [c['id'] for c in response.data['results']], response.data['has_more']
+
+    def test_latest_page_and_history(self):
+        self.assertEqual(self.page(limit=3), (self.ids[-3:], True))
+        self.assertEqual(self.page(limit=3, before=self.ids[-3]), (self.ids[1:4], True))
+        self.assertEqual(self.page(limit=3, before=self.ids[1]), (self.ids[:1], False))
+
+    def test_sync_returns_only_new_comments(self):
+        self.assertEqual(self.page(after=self.ids[-1]), ([], False))
+        new = SessionComment.objects.create(session=self.session, author=self.client_card.user, text='Готово')
+        self.assertEqual(self.page(after=self.ids[-1]), ([new.pk], False))
+        self.assertEqual(self.page(after=self.ids[2], limit=2), (self.ids[3:5], True))
+
+    def test_foreign_thread_and_bad_cursor(self):
+        stranger = api_client_for(make_coach('stranger'))
+        response = stranger.get(self.url, {'session': self.session.pk})
+        self.assertEqual(response.data['results'], [])
+        self.assertEqual(stranger.get(self.url, {'session': self.session.pk, 'after': self.ids[0]}).status_code, 400)
+        self.assertEqual(self.api.get(self.url, {'session': self.session.pk, 'after': 1, 'before': 2}).status_code, 400)
+
+    def test_read_thread_marks_foreign_comments_in_one_update(self):
+        url = '/api/clients/comments/read_thread/'
+        response = self.client_api.post(url, {'session': self.session.pk, 'up_to': self.ids[2]})
+        self.assertEqual(response.data['marked'], 3)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client_api.post(url, {'session': self.session.pk})
+        self.assertEqual(response.data['marked'], 4)
+        self.assertEqual(sum(q['sql'].startswith('UPDATE') for q in ctx.captured_queries), 1)
+        self.assertFalse(self.session.comments.filter(is_read=False).exists())
+
+        # Свои сообщения автор "прочитать" не может
+        SessionComment.objects.create(session=self.session, author=self.coach, text='Еще')
+        self.assertEqual(self.api.post(url, {'session': self.session.pk}).data['marked'], 0)
+
+
+class WorkSessionCalendarTests(TestCase):
+    """Диапазон дат для календаря и видимость сессий."""
+
+    def setUp(self):
+        self.coach = make_coach()
+        self.clients = seed_clients(self.coach, 2)
+        self.api = api_client_for(self.coach)
+        # 14 ежедневных сессий на клиента, начиная с понедельника 6 января
+        self.start = timezone.make_aware(datetime(2025, 1, 6, 18, 0))
+        seed_sessions(self.clients, 14, start=self.start)
+
+    def get_results(self, api=None, **params):
+        response = (api or self.api).get('/api/clients/sessions/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data['results']
+
+    def test_week_range_is_inclusive(self):
+        results = self.get_results(date_from='2025-01-06', date_to='2025-01-12')
+        self.assertEqual(len(results), 14)
+
+    def test_range_for_single_client(self):
+        results = self.get_results(date_from='2025-01-13', date_to='2025-01-31', client=self.clients[0].pk)
+        self.assertEqual(len(results), 7)
+        self.assertEqual({r['client'] for r in results}, {self.clients[0].pk})
+
+    def test_range_with_status(self):
+        results = self.get_results(date_from='2025-01-06', date_to='2025-01-19', status='planned')
+        self.assertTrue(results)
+        self.assertEqual({r['status'] for r in results}, {'planned'})
+
+    def test_client_user_sees_only_own_sessions(self):
+        other_coach = make_coach('other_coach')
+        seed_sessions(seed_clients(other_coach, 1), 5, start=self.start)
+
+        results = self.get_results(api_client_for(self.clients[1].user), date_from='2025-01-01', date_to='2025-02-01')
+        self.assertEqual(len(results), 14)
+        self.assertEqual({r['client'] for r in results}, {self.clients[1].pk})
+
+
+class ClientScopeTests(TestCase):
+    """Scope по id клиентов видит ровно то же, что старые OR-фильтры по JOIN-ам."""
+
+    def setUp(self):
+        self.coach = make_coach()
+        self.other_coach = make_coach('other_coach')
+        self.clients = seed_clients(self.coach, 2)
+        # Тренер сам занимается у другого тренера - видит и своих клиентов, и свой профиль
+        self.coach_as_client = seed_clients(self.other_coach, 1)[0]
+        self.coach_as_client.user = self.coach
+        self.coach_as_client.save()
+
+        seed_sessions(self.clients + [self.coach_as_client] + seed_clients(self.other_coach, 2), 3, comments_per_session=2)
+        self.stranger = make_coach('stranger')
+
+    def users(self):
+        return [self.coach, self.other_coach, self.clients[0].user, self.stranger]
+
+    def assert_same_visibility(self, url, reference):
+        for user in self.users():
+            with self.subTest(user=user.username):
+                response = api_client_for(user).get(url, {'page_size': 200})
+                data = response.data['results'] if isinstance(response.data, dict) else response.data
+                self.assertEqual(sorted(item['id'] for item in data), sorted(reference(user)))
+
+    def test_sessions_visibility(self):
+        self.assert_same_visibility('/api/clients/sessions/', lambda user: WorkSession.objects.filter(
+            Q(client__coach=user) | Q(client__user=user)
+        ).distinct().values_list('pk', flat=True))
+
+    def test_comments_visibility(self):
+        self.assert_same_visibility('/api/clients/comments/', lambda user: SessionComment.objects.filter(
+            Q(session__client__coach=user) | Q(session__client__user=user)
+        ).values_list('pk', flat=True))
+
+    def test_client_attributes_visibility(self):
+        self.assert_same_visibility('/api/clients/client-attributes/', lambda user: ClientAttribute.objects.filter(
+            Q(client__coach=user) | Q(client__user=user)
+        ).values_list('pk', flat=True))
+
+    def test_client_ids_resolved_once_per_request(self):
+        request = RequestFactory().get('/')
+        request.user = self.coach
+
+        with self.assertNumQueries(1):
+            get_client_scope(request).client_ids
+            get_client_scope(request).client_ids
+
+        self.assertEqual(
+            get_client_scope(request).client_ids,
+            {self.clients[0].pk, self.clients[1].pk, self.coach_as_client.pk},
+        )
+
+
+class WorkSessionBulkTests(TestCase):
+    """Массовое планирование: одна вставка, одно уведомление на клиента."""
+
+    url = '/api/clients/sessions/bulk/'
+
+    def setUp(self):
+        self.coach = make_coach()
+        self.clients = seed_clients(self.coach, 2)
+        self.api = api_client_for(self.coach)
+
+    def recurring_payload(self, **overrides):
+        payload = {
+            'clients': [c.pk for c in self.clients],
+            'title': 'Фулбади',
+            'weekdays': [0, 2, 4],
+            'time': '18:00',
+            'start_date': '2025-01-06',
+            'weeks': 12,
+        }
+        payload.update(overrides)
+        return payload
+
+    def test_recurring_plan_expands_weekdays(self):
+        response = self.api.post(self.url, self.recurring_payload(), format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['count'], 2 * 3 * 12)
+        dates = WorkSession.objects.filter(client=self.clients[0]).values_list('date', flat=True)
+        self.assertEqual({d.weekday() for d in dates}, {0, 2, 4})
+        self.assertEqual({(d.hour, d.minute) for d in dates}, {(18, 0)})
+
+    def test_query_count_does_not_grow_with_plan_size(self):
+        with CaptureQueriesContext(connection) as short:
+            self.api.post(self.url, self.recurring_payload(weeks=1), format='json')
+        with CaptureQueriesContext(connection) as long:
+            self.api.post(self.url, self.recurring_payload(weeks=8), format='json')
+        self.assertEqual(len(short.captured_queries), len(long.captured_queries))
+
+    def test_one_notification_per_client(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.api.post(self.url, self.recurring_payload(), format='json')
+
+        notifications = Notification.objects.filter(category='workout')
+        self.assertEqual(
+            sorted(notifications.values_list('recipient_id', flat=True)),
+            sorted(c.user_id for c in self.clients),
+        )
+        self.assertEqual(notifications[0].title, 'Новый план: 36 тренировок')
+
+    def test_session_list_payload(self):
+        response = self.api.post(self.url, {'sessions': [
+            {'client': self.clients[0].pk, 'title': 'Бег', 'date': '2025-01-06T07:00:00Z'},
+            {'client': self.clients[1].pk, 'title': 'Растяжка', 'date': '2025-01-07T07:00:00Z', 'status': 'completed'},
+        ]}, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            sorted(WorkSession.objects.values_list('title', 'status')),
+            [('Бег', 'planned'), ('Растяжка', 'completed')],
+        )
+
+    def test_foreign_clients_are_rejected(self):
+        foreign = seed_clients(make_coach('other_coach'), 1)[0]
+        response = self.api.post(self.url, self.recurring_payload(clients=[self.clients[0].pk, foreign.pk]), format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('client', response.data)
+        self.assertFalse(WorkSession.objects.exists())
+
+    def test_incomplete_recurring_plan_is_rejected(self):
+        payload = self.recurring_payload()
+        del payload['weekdays']
+        response = self.api.post(self.url, payload, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('weekdays', response.data)
+
+
+class ClientAttributeTypedValueTests(TestCase):
+    """Типизированные значения атрибутов и фильтры ClientFilter по ним."""
+
+    def setUp(self):
+        self.coach = make_coach()
+        self.api = api_client_for(self.coach)
+        self.weight = Attribute.objects.create(slug='weight', name='Вес', attr_type='number')
+        self.start = Attribute.objects.create(slug='start', name='Старт', attr_type='date')
+        self.level = Attribute.objects.create(slug='level', name='Уровень', attr_type='text')
+
+        self.light, self.medium, self.heavy = seed_clients(self.coach, 3)
+        for client, weight, start, level in [
+            (self.light, '65,5', '2024-01-10', 'новичок'),
+            (self.medium, '80', '15.03.2024', 'pro'),
+            (self.heavy, '102.3', '2023-11-01', 'pro'),
+        ]:
+            ClientAttribute.objects.create(client=client, attribute=self.weight, value=weight)
+            ClientAttribute.objects.create(client=client, attribute=self.start, value=start)
+            ClientAttribute.objects.create(client=client, attribute=self.level, value=level)
+
+    def ids(self, **params):
+        response = self.api.get('/api/clients/clients/', params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return [c['id'] for c in response.data]
+
+    def test_save_fills_typed_columns(self):
+        weight = ClientAttribute.objects.get(client=self.light, attribute=self.weight)
+        start = ClientAttribute.objects.get(client=self.medium, attribute=self.start)
+        self.assertEqual(weight.value_num, Decimal('65.5'))
+        self.assertEqual(start.value_date, date(2024, 3, 15))
+        self.assertIsNone(ClientAttribute.objects.get(client=self.light, attribute=self.level).value_num)
+
+    def test_number_comparisons(self):
+        self.assertEqual(set(self.ids(**{'attributes[weight]__lt': '80'})), {self.light.pk})
+        self.assertEqual(set(self.ids(**{'attributes[weight]__gte': '80'})), {self.medium.pk, self.heavy.pk})
+        self.assertEqual(set(self.ids(**{'attributes[weight]': '80,65.5'})), {self.light.pk, self.medium.pk})
+
+    def test_date_comparison_combined_with_text(self):
+        params = {'attributes[start]__gte': '2024-01-01', 'attributes[level]': 'pro'}
+        self.assertEqual(self.ids(**params), [self.medium.pk])
+
+    def test_order_by_attribute(self):
+        self.assertEqual(self.ids(attributes_order='-weight'), [self.heavy.pk, self.medium.pk, self.light.pk])
+
+    def test_invalid_and_unknown_attributes(self):
+        response = self.api.get('/api/clients/clients/', {'attributes[weight]__lt': 'много'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.ids(**{'attributes[height]__lt': '180'}), [])
+
+    def test_serializer_rejects_unparseable_number(self):
+        serializer = ClientAttributeSerializer(data={'attribute': 'weight', 'value': 'abc'})
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('value', serializer.errors)
+
+    def test_number_range_checked_after_rounding(self):
+        self.assertEqual(ClientAttribute.parse_typed('number', '999999999.9994'), Decimal('999999999.999'))
+        # Округляется до 1000000000.000 - не влезает в колонку
+        self.assertIsNone(ClientAttribute.parse_typed('number', '999999999.9996'))
+        self.assertIsNone(ClientAttribute.parse_typed('number', 'NaN'))
+        value = ClientAttribute.objects.create(client=self.light, attribute=Attribute.objects.create(
+            slug='big', name='Большое', attr_type='number'), value='999999999.9996')
+        self.assertIsNone(value.value_num)
+
+
+class AttributeMeasurementTests(TestCase):
+    """История замеров: дописывание и прореженные серии для графиков."""
+
+    def setUp(self):
+        self.coach = make_coach()
+        self.api = api_client_for(self.coach)
+        self.client_card = seed_clients(self.coach, 1)[0]
+        self.weight = Attribute.objects.create(slug='weight', name='Вес', attr_type='number')
+
+    def series(self, **params):
+        response = self.api.get('/api/clients/measurements/series/', {
+            'client': self.client_card.pk, 'attribute': 'weight', **params
+        })
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def test_new_measurement_updates_current_value(self):
+        for value, day in [('82.5', '2025-01-10T08:00:00Z'), ('81', '2025-01-20T08:00:00Z'), ('83', '2025-01-01T08:00:00Z')]:
+            response = self.api.post('/api/clients/measurements/', {
+                'client': self.client_card.pk, 'attribute': 'weight', 'value': value, 'measured_at': day,
+            })
+            self.assertEqual(response.status_code, 201, response.data)
+
+        self.assertEqual(AttributeMeasurement.objects.count(), 3)
+        # Текущим остается самый поздний замер, а не последний присланный
+        current = ClientAttribute.objects.get(client=self.client_card, attribute=self.weight)
+        self.assertEqual(current.value_num, Decimal('81'))
+
+    def test_editing_client_attribute_appends_history(self):
+        current = ClientAttribute.objects.create(client=self.client_card, attribute=self.weight, value='90')
+        self.api.patch(f'/api/clients/client-attributes/{current.pk}/', {'value': '89,4'})
+        self.api.patch(f'/api/clients/client-attributes/{current.pk}/', {'value': '88'})
+
+        self.assertEqual(
+            sorted(AttributeMeasurement.objects.values_list('value', flat=True)),
+            [Decimal('88'), Decimal('89.4')],
+        )
+
+    def test_foreign_client_and_text_attribute_are_rejected(self):
+        foreign = seed_clients(make_coach('other_coach'), 1)[0]
+        text = Attribute.objects.create(slug='note', name='Заметка', attr_type='text')
+
+        response = self.api.post('/api/clients/measurements/', {'client': foreign.pk, 'attribute': 'weight', 'value': 80})
+        self.assertIn('client', response.data)
+        response = self.api.post('/api/clients/measurements/', {'client': self.client_card.pk, 'attribute': text.pk, 'value': 1})
+        self.assertIn('attribute', response.data)
+
+    def test_weekly_buckets_aggregate_in_db(self):
+        start = timezone.make_aware(datetime(2025, 1, 6))  # понедельник
+        seed_measurements([self.client_card], self.weight, 14, start=start)
+
+        data = self.series(bucket='week')
+
+        self.assertEqual(data['bucket'], 'week')
+        self.assertEqual([p['count'] for p in data['points']], [7, 7])
+        first = data['points'][0]
+        self.assertEqual((first['min'], first['max']), (Decimal('80.000'), Decimal('80.600')))
+
+    def test_auto_bucket_keeps_point_count_small(self):
+        seed_measurements([self.client_card], self.weight, 5 * 365)
+
+        with self.assertNumQueries(3):
+            # scope + границы периода + агрегация
+            data = self.series()
+
+        self.assertEqual(data['bucket'], 'week')
+        self.assertLessEqual(len(data['points']), 400)
+        self.assertEqual(sum(p['count'] for p in data['points']), 5 * 365)
+
+
+class ReferenceCacheTests(TestCase):
+    """Справочники из версионированного кеша с ETag / 304."""
+
+    def setUp(self):
+        cache.clear()
+        seed_reference_data()
+        self.api = APIClient()
+
+    def test_second_request_is_served_without_db(self):
+        first = self.api.get('/api/clients/categories/')
+        self.assertEqual(first.status_code, 200)
+        self.assertTrue(first['ETag'])
+
+        with self.assertNumQueries(0):
+            again = self.api.get('/api/clients/categories/')
+        self.assertEqual(again.data, first.data)
+
+    def test_if_none_match_returns_304(self):
+        etag = self.api.get('/api/clients/tags/')['ETag']
+
+        response = self.api.get('/api/clients/tags/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertFalse(response.content)
+
+    def test_save_invalidates_cache(self):
+        etag = self.api.get('/api/clients/attributes/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Attribute.objects.create(slug='waist', name='Талия', attr_type='number')
+
+        response = self.api.get('/api/clients/attributes/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertIn('waist', [a['slug'] for a in response.data])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Attribute.objects.filter(slug='waist').first().delete()
+        response = self.api.get('/api/clients/attributes/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_version_changes_only_after_commit(self):
+        version = reference_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.create(slug='new-tag', name='Новый')
+            # До коммита версия прежняя: кеш из незакоммиченных данных под новой версией не соберется
+            self.assertEqual(reference_version(), version)
+        self.assertNotEqual(reference_version(), version)
+
+    def test_bootstrap_returns_all_sets(self):
+        response = self.api.get('/api/clients/reference/')
+
+        self.assertEqual(set(response.data), {'categories', 'tags', 'attributes'})
+        self.assertEqual(len(response.data['tags']), 3)
+        self.assertEqual(self.api.get('/api/clients/reference/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+
+class ImageVariantTests(TemporaryMediaMixin, TestCase):
+    """Фото клиента: варианты нарезаются после коммита и отдаются в ClientSerializer."""
+
+    def setUp(self):
+        self.coach = make_coach()
+        self.api = api_client_for(self.coach)
+        self.client_card = seed_clients(self.coach, 1, with_users=False)[0]
+
+    def upload(self, name='photo.jpg', size=(2000, 1500)):
+        buffer = BytesIO()
+        Image.new('RGB', size, 'red').save(buffer, format='JPEG')
+        self.client_card.photo = SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client_card.save()
+        self.client_card.refresh_from_db()
+
+    def test_variants_are_generated_and_exposed(self):
+        self.upload()
+        variants = self.client_card.photo_variants
+        self.assertEqual(variants['source'], self.client_card.photo.name)
+
+        storage = self.client_card.photo.storage
+        with storage.open(variants['thumb']['webp']) as f:
+            self.assertEqual(Image.open(f).size, (96, 96))
+        with storage.open(variants['medium']['jpeg']) as f:
+            self.assertEqual(Image.open(f).size, (1024, 768))
+
+        data = self.api.get(f'/api/clients/clients/{self.client_card.pk}/').data
+        self.assertTrue(data['photo_variants']['thumb']['webp'].endswith('_thumb.webp'))
+
+    def test_replaced_photo_drops_old_variants(self):
+        self.upload('first.jpg')
+        old_thumb = self.client_card.photo_variants['thumb']['webp']
+        self.upload('second.jpg', size=(50, 80))
+
+        self.assertFalse(self.client_card.photo.storage.exists(old_thumb))
+        with self.client_card.photo.storage.open(self.client_card.photo_variants['thumb']['jpeg']) as f:
+            # Маленький оригинал не растягивается
+            self.assertEqual(Image.open(f).size, (50, 50))
+
+    def test_token_user_avatar_gets_variants(self):
+        # request.user в API - прокси TokenUser: его save() тоже запускает нарезку
+        buffer = BytesIO()
+        Image.new('RGB', (300, 300), 'red').save(buffer, format='JPEG')
+        user = TokenUser.from_claims(self.coach.pk, self.coach.username, True)
+        user.avatar = SimpleUploadedFile('avatar.jpg', buffer.getvalue(), content_type='image/jpeg')
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+        self.assertEqual(User.objects.get(pk=self.coach.pk).avatar_variants['source'], user.avatar.name)
+
+    def test_variants_are_null_until_ready(self):
+        self.client_card.photo = SimpleUploadedFile('photo.jpg', b'not an image')
+        self.client_card.save()
+        data = self.api.get(f'/api/clients/clients/{self.client_card.pk}/').data
+        self.assertIsNone(data['photo_variants'])
+
+
+class ChunkedUploadTests(TemporaryMediaMixin, TestCase):
+    """Загрузка вложения по частям: докачка, любой порядок, проверка sha256."""
+
+    temp_dir_settings = ('MEDIA_ROOT', 'PROTECTED_MEDIA_ROOT', 'CHUNKED_UPLOAD_DIR')
+
+    CHUNK = 64 * 1024
+
+    def setUp(self):
+        self.coach = make_coach()
+        self.api = api_client_for(self.coach)
+        self.session = seed_sessions(seed_clients(self.coach, 1, with_users=False), 1)[0]
+        self.content = os.urandom(self.CHUNK * 2 + 1000)
+
+    def start(self, **extra):
+        payload = {
+            'session': self.session.pk, 'filename': 'workout.mp4', 'size': len(self.content),
+            'chunk_size': self.CHUNK, 'checksum': hashlib.sha256(self.content).hexdigest(), **extra,
+        }
+        response = self.api.post('/api/clients/uploads/', payload, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['chunk_count'], 3)
+        return response.data['id']
+
+    def put_chunk(self, upload_id, index, data=None):
+        data = self.content[index * self.CHUNK:(index + 1) * self.CHUNK] if data is None else data
+        return self.api.put(
+            f'/api/clients/uploads/{upload_id}/chunks/{index}/', data, content_type='application/octet-stream'
+        )
+
+    def test_out_of_order_chunks_are_assembled_and_attached(self):
+        upload_id = self.start()
+        for index in (2, 0, 1):
+            self.assertEqual(self.put_chunk(upload_id, index).status_code, 200)
+
+        response = self.api.post(f'/api/clients/uploads/{upload_id}/finalize/')
+        self.assertEqual(response.status_code, 200, response.data)
+
+        self.session.refresh_from_db()
+        with self.session.attachment.open('rb') as f:
+            self.assertEqual(f.read(), self.content)
+        self.assertFalse(os.path.exists(uploads.upload_dir(ChunkedUpload.objects.get(pk=upload_id))))
+
+    def test_interrupted_chunk_is_retried(self):
+        upload_id = self.start()
+        self.put_chunk(upload_id, 0)
+        # Обрыв: пришла только половина куска - он не засчитывается
+        self.assertEqual(self.put_chunk(upload_id, 1, self.content[self.CHUNK:self.CHUNK + 100]).status_code, 400)
+
+        status = self.api.get(f'/api/clients/uploads/{upload_id}/').data
+        self.assertEqual(status['received'], [0])
+        self.assertEqual(self.api.post(f'/api/clients/uploads/{upload_id}/finalize/').status_code, 400)
+
+        self.put_chunk(upload_id, 1)
+        self.put_chunk(upload_id, 2)
+        self.assertEqual(self.api.post(f'/api/clients/uploads/{upload_id}/finalize/').status_code, 200)
+
+    def test_checksum_mismatch_is_rejected(self):
+        upload_id = self.start(checksum='0' * 64)
+        for index in range(3):
+            self.put_chunk(upload_id, index)
+
+        self.assertEqual(self.api.post(f'/api/clients/uploads/{upload_id}/finalize/').status_code, 400)
+        self.session.refresh_from_db()
+        self.assertFalse(self.session.attachment)
+
+    def test_foreign_session_is_rejected(self):
+        other = seed_sessions(seed_clients(make_coach('other'), 1, with_users=False), 1)[0]
+        response = self.api.post('/api/clients/uploads/', {
+            'session': other.pk, 'filename': 'x.mp4', 'size': 10, 'checksum': '0' * 64,
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class AttachmentServingTests(TemporaryMediaMixin, TestCase):
+    """Вложения: проверка прав, Range, 304 и делегирование отдачи nginx."""
+
+    def setUp(self):
+        self.coach = make_coach()
+        self.api = api_client_for(self.coach)
+        self.session = seed_sessions(seed_clients(self.coach, 1, with_users=False), 1)[0]
+        self.content = os.urandom(300 * 1024)
+        self.session.attachment = SimpleUploadedFile('workout.mp4', self.content)
+        self.session.save()
+        self.url = f'/api/clients/attachments/sessions/{self.session.pk}/'
+
+    def body(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_full_file_is_streamed(self):
+        response = self.api.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'video/mp4')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(self.body(response), self.content)
+
+    def test_range_requests(self):
+        response = self.api.get(self.url, HTTP_RANGE='bytes=100-199')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 100-199/{len(self.content)}')
+        self.assertEqual(self.body(response), self.content[100:200])
+
+        tail = self.api.get(self.url, HTTP_RANGE='bytes=-10')
+        self.assertEqual(self.body(tail), self.content[-10:])
+
+        self.assertEqual(self.api.get(self.url, HTTP_RANGE=f'bytes={len(self.content)}-').status_code, 416)
+
+    def test_conditional_get(self):
+        etag = self.api.get(self.url)['ETag']
+        self.assertEqual(self.api.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_signed_link_and_access_control(self):
+        link = self.api.get(f'/api/clients/sessions/{self.session.pk}/').data['attachment']
+        self.assertEqual(APIClient().get(link).status_code, 200)
+        self.assertEqual(APIClient().get(self.url).status_code, 403)
+        self.assertEqual(APIClient().get(self.url + '?sig=forged').status_code, 403)
+        self.assertEqual(api_client_for(make_coach('stranger')).get(self.url).status_code, 404)
+
+    async def test_streams_chunks_over_asgi(self):
+        # Под ASGI тело - асинхронный итератор: файл не собирается в память целиком до отправки
+        link = await sync_to_async(lambda: self.api.get(f'/api/clients/sessions/{self.session.pk}/').data['attachment'])()
+        for headers, status, expected in (
+            ({}, 200, self.content),
+            ({'Range': 'bytes=100-199999'}, 206, self.content[100:200000]),
+        ):
+            response = await AsyncClient().get(link, headers=headers)
+            self.assertEqual(response.status_code, status)
+            self.assertTrue(response.is_async)
+            self.assertEqual(int(response['Content-Length']), len(expected))
+            chunks = [chunk async for chunk in response.streaming_content]
+            self.assertGreater(len(chunks), 1)
+            self.assertEqual(b''.join(chunks), expected)
+
+    def test_file_is_outside_public_media(self):
+        path = self.session.attachment.path
+        self.assertTrue(path.startswith(settings.PROTECTED_MEDIA_ROOT))
+        self.assertFalse(path.startswith(settings.MEDIA_ROOT))
+        with self.assertRaises(ValueError):
+            self.session.attachment.url
+
+    @override_settings(PROTECTED_MEDIA_SERVER='nginx')
+    def test_nginx_offload(self):
+        response = self.api.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.session.attachment.name}')
+        self.assertEqual(response.content, b'')
+
+
+class CoachDashboardTests(TestCase):
+    """Сводка тренера: числа и фиксированное число запросов."""
+
+    def setUp(self):
+        cache.clear()
+        self.coach = make_coach()
+        self.api = api_client_for(self.coach)
+
+    def test_aggregates(self):
+        busy, idle, never = seed_clients(self.coach, 3, with_users=False)
+        week_start, _ = week_bounds()
+        WorkSession.objects.bulk_create([
+            WorkSession(client=busy, title='План', date=week_start + timedelta(days=6), status='planned'),
+            WorkSession(client=busy, title='Сделано', date=timezone.now(), status='completed'),
+            WorkSession(client=busy, title='Пропуск', date=week_start, status='missed'),
+            WorkSession(client=idle, title='Давно', date=timezone.now() - timedelta(days=30), status='completed'),
+        ])
+        seed_clients(make_coach('other'), 5, with_users=False)
+
+        data = self.api.get('/api/clients/dashboard/', {'inactive_days': 14}).data
+        self.assertEqual(data['clients'], {'total': 3, 'active': 3, 'inactive': 2})
+        self.assertEqual((data['week']['planned'], data['week']['completed'], data['week']['missed']), (1, 1, 1))
+        self.assertEqual(data['awaiting_review'], 2)
+        self.assertEqual([c['id'] for c in data['inactive_clients']], [never.pk, idle.pk])
+
+    def test_query_count_is_fixed_and_cached(self):
+        clients = seed_clients(self.coach, 5, with_users=False)
+        seed_sessions(clients, 2)
+        with CaptureQueriesContext(connection) as small:
+            self.api.get('/api/clients/dashboard/')
+
+        cache.clear()
+        seed_sessions(seed_clients(self.coach, 50, with_users=False), 20)
+        with CaptureQueriesContext(connection) as large:
+            self.api.get('/api/clients/dashboard/')
+        self.assertEqual(len(small), len(large))
+
+        with self.assertNumQueries(0):
+            self.api.get('/api/clients/dashboard/')
+
+
+class AdherenceAnalyticsTests(TestCase):
+    """Недельная сводка обновляется дельтами и совпадает с полной пересборкой."""
+
+    def setUp(self):
+        self.coach = make_coach()
+        self.api = api_client_for(self.coach)
+        self.client_card = seed_clients(self.coach, 1, with_users=False)[0]
+        self.week = week_bounds()[0]
+
+    def add(self, weeks_ago, status):
+        return WorkSession.objects.create(
+            client=self.client_card, title='Тренировка', status=status,
+            date=self.week - timedelta(weeks=weeks_ago) + timedelta(hours=10),
+        )
+
+    def stats_snapshot(self):
+        return sorted(ClientWeeklyStats.objects.values_list('client_id', 'week', 'planned', 'completed', 'review', 'missed', 'cancelled'))
+
+    def test_incremental_updates_match_rebuild(self):
+        session = self.add(0, 'planned')
+        for weeks_ago in (1, 2, 3):
+            self.add(weeks_ago, 'completed')
+        self.add(5, 'missed')
+        moved = self.add(6, 'completed')
+
+        session.status = 'review'
+        session.save()
+        moved.date -= timedelta(weeks=1)
+        moved.save()
+        self.add(2, 'cancelled').delete()
+        self.api.post('/api/clients/sessions/bulk/', {
+            'sessions': [{'client': self.client_card.pk, 'title': 'План', 'date': (self.week + timedelta(weeks=1)).isoformat()}]
+        }, format='json')
+
+        incremental = self.stats_snapshot()
+        analytics.rebuild()
+        self.assertEqual(incremental, self.stats_snapshot())
+
+    def test_client_with_sessions_can_be_deleted(self):
+        for weeks_ago in (0, 1):
+            self.add(weeks_ago, 'completed')
+        other = seed_clients(self.coach, 1, with_users=False)[0]
+        WorkSession.objects.create(client=other, title='Тренировка', status='planned', date=self.week)
+
+        response = self.api.delete(f'/api/clients/clients/{self.client_card.pk}/')
+        self.assertEqual(response.status_code, 204)
+        # FK проверяются при коммите - проверяем явно, как сделала бы база
+        connection.check_constraints()
+        self.assertFalse(ClientWeeklyStats.objects.filter(client_id=self.client_card.pk).exists())
+        self.assertEqual(ClientWeeklyStats.objects.get(client=other).planned, 1)
+
+    def test_summary_streaks_and_categories(self):
+        for weeks_ago in (0, 1, 2):
+            self.add(weeks_ago, 'completed')
+        self.add(3, 'missed')
+        self.add(5, 'completed')
+        self.add(6, 'completed')
+
+        detail = self.api.get(f'/api/clients/analytics/adherence/{self.client_card.pk}/').data
+        self.assertEqual((detail['done'], detail['missed']), (5, 1))
+        self.assertEqual(detail['adherence'], round(5 / 6, 4))
+        self.assertEqual(detail['rolling_4w'], 0.75)
+        self.assertEqual((detail['current_streak'], detail['longest_streak']), (3, 3))
+
+        categories = self.api.get('/api/clients/analytics/adherence/categories/').data
+        self.assertEqual([(c['clients'], c['adherence']) for c in categories], [(1, round(5 / 6, 4))])
+
+        stranger = api_client_for(make_coach('stranger'))
+        self.assertEqual(stranger.get(f'/api/clients/analytics/adherence/{self.client_card.pk}/').status_code, 404)
+
+
+class SearchTests(TestCase):
+    """Полнотекстовый поиск: стемминг, ранжирование, опечатки в именах, только свои клиенты."""
+
+    url = '/api/clients/search/'
+
+    def setUp(self):
+        self.coach = make_coach()
+        self.api = api_client_for(self.coach)
+        self.client_card = Client.objects.create(coach=self.coach, name='Анастасия Петрова')
+        self.in_title = WorkSession.objects.create(
+            client=self.client_card, title='Приседания со штангой', date=timezone.now()
+        )
+        self.in_description = WorkSession.objects.create(
+            client=self.client_card, title='Ноги', description='Разминка, потом приседания', date=timezone.now()
+        )
+        SessionComment.objects.create(session=self.in_title, author=self.coach, text='Колено болит после приседаний')
+
+        stranger = Client.objects.create(coach=make_coach('stranger'), name='Анастасия Чужая')
+        WorkSession.objects.create(client=stranger, title='Приседания', date=timezone.now())
+
+    def test_sessions_are_stemmed_ranked_and_scoped(self):
+        data = self.api.get(self.url, {'q': 'приседание', 'types': 'sessions,comments'}).data
+        self.assertEqual([s['id'] for s in data['sessions']], [self.in_title.pk, self.in_description.pk])
+        self.assertIn('<b>', data['sessions'][1]['snippet'])
+        self.assertEqual(len(data['comments']), 1)
+        self.assertNotIn('clients', data)
+
+    def test_client_names_tolerate_typos(self):
+        data = self.api.get(self.url, {'q': 'Петрва', 'types': 'clients'}).data
+        self.assertEqual([c['id'] for c in data['clients']], [self.client_card.pk])
+
+        data = self.api.get(self.url, {'q': 'Анастасия', 'types': 'clients'}).data
+        self.assertEqual([c['id'] for c in data['clients']], [self.client_card.pk])
+
+    def test_validation(self):
+        self.assertEqual(self.api.get(self.url, {'q': 'а'}).status_code, 400)
+        self.assertEqual(self.api.get(self.url, {'q': 'ноги', 'types': 'pets'}).status_code, 400)
+
+
+class ExportTests(TemporaryMediaMixin, TestCase):
+    """Выгрузка данных тренера: потоком, только свои клиенты, вложения в zip."""
+
+    url = '/api/clients/export/'
+
+    def setUp(self):
+        self.coach = make_coach()
+        self.api = api_client_for(self.coach)
+        self.clients = seed_clients(self.coach, 2)
+        self.sessions = seed_sessions(self.clients, 3, comments_per_session=2)
+        self.sessions[0].attachment = SimpleUploadedFile('plan.pdf', b'%PDF-1.4 plan')
+        self.sessions[0].save()
+
+        stranger = make_coach('stranger')
+        seed_sessions(seed_clients(stranger, 1), 2, comments_per_session=1)
+
+    def download(self, **params):
+        response = self.api.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def test_ndjson_contains_only_own_data(self):
+        records = [json.loads(line) for line in self.download().decode().splitlines()]
+        counts = {}
+        for record in records:
+            counts[record['section']] = counts.get(record['section'], 0) + 1
+        self.assertEqual(counts, {'clients': 2, 'client_attributes': 6, 'sessions': 6, 'comments': 12})
+
+        client = next(r for r in records if r['section'] == 'clients')
+        self.assertEqual(len(client['category_slugs']), 1)
+        self.assertEqual(len(client['tag_slugs']), 2)
+
+    def test_csv_section(self):
+        rows = list(csv.DictReader(self.download(output='csv', section='sessions').decode().splitlines()))
+        self.assertEqual(len(rows), 6)
+        self.assertEqual({int(row['client_id']) for row in rows}, {c.pk for c in self.clients})
+        self.assertEqual(self.api.get(self.url, {'output': 'csv'}).status_code, 400)
+
+    def test_zip_with_attachments(self):
+        archive = zipfile.ZipFile(BytesIO(self.download(output='zip', attachments='1')))
+        attachment = f'attachments/{self.sessions[0].attachment.name}'
+        self.assertEqual(
+            set(archive.namelist()),
+            {'clients.csv', 'client_attributes.csv', 'sessions.csv', 'comments.csv', attachment},
+        )
+        self.assertEqual(archive.read(attachment), b'%PDF-1.4 plan')
+        self.assertEqual(len(archive.read('comments.csv').decode().splitlines()), 13)
+
+    def test_query_count_does_not_grow_with_data(self):
+        with CaptureQueriesContext(connection) as small:
+            self.download(output='zip')
+        seed_sessions(self.clients, 20, comments_per_session=3)
+        with CaptureQueriesContext(connection) as large:
+            self.download(output='zip')
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+
+class HistoryTests(TestCase):
+    """История изменений: диффы по объекту, пачки одним INSERT, чистка с сохранением последней версии."""
+
+    def setUp(self):
+        self.coach = make_coach()
+        self.api = api_client_for(self.coach)
+        self.client_obj = seed_clients(self.coach, 1)[0]
+        self.session = WorkSession.objects.create(client=self.client_obj, title='Фулбади', date=timezone.now())
+
+    def test_session_diff_via_api(self):
+        response = self.api.patch(f'/api/clients/sessions/{self.session.pk}/', {'title': 'Ноги', 'status': 'completed'})
+        self.assertEqual(response.status_code, 200)
+
+        response = self.api.get(f'/api/clients/sessions/{self.session.pk}/history/')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.data['has_more'])
+        changed, created = response.data['results']
+        self.assertEqual(changed['type'], 'Changed')
+        self.assertEqual((changed['user'], changed['user_name']), (self.coach.pk, self.coach.username))
+        self.assertEqual(
+            {change['field']: (change['old'], change['new']) for change in changed['changes']},
+            {'title': ('Фулбади', 'Ноги'), 'status': ('planned', 'completed')},
+        )
+        self.assertEqual(created['type'], 'Created')
+        self.assertIn({'field': 'title', 'old': None, 'new': 'Фулбади'}, created['changes'])
+
+        # Следующая страница - по history_id последней показанной записи
+        page = self.api.get(f'/api/clients/sessions/{self.session.pk}/history/', {'limit': 1}).data
+        self.assertTrue(page['has_more'])
+        older = self.api.get(
+            f'/api/clients/sessions/{self.session.pk}/history/', {'limit': 1, 'before': page['results'][0]['history_id']}
+        ).data
+        self.assertEqual([entry['type'] for entry in older['results']], ['Created'])
+
+    def test_history_is_scoped(self):
+        stranger = api_client_for(make_coach('stranger'))
+        self.assertEqual(stranger.get(f'/api/clients/sessions/{self.session.pk}/history/').status_code, 404)
+        self.assertEqual(stranger.get(f'/api/clients/clients/{self.client_obj.pk}/history/').status_code, 404)
+
+    def test_bulk_sessions_write_history_in_one_insert(self):
+        payload = {
+            'clients': [self.client_obj.pk], 'title': 'Кардио', 'weekdays': [0, 3],
+            'time': '09:00', 'start_date': '2025-01-06', 'weeks': 4,
+        }
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.api.post('/api/clients/sessions/bulk/', payload, format='json')
+        self.assertEqual(response.status_code, 201)
+        inserts = [q['sql'] for q in ctx.captured_queries if 'historicalworksession' in q['sql'].lower()]
+        self.assertEqual(len(inserts), 1)
+
+        records = WorkSession.history.filter(id__in=response.data['ids'])
+        self.assertEqual(records.count(), 8)
+        record = records.first()
+        self.assertEqual((record.history_type, record.history_user_id, record.title), ('+', self.coach.pk, 'Кардио'))
+        self.assertEqual(record.client_id, self.client_obj.pk)
+
+    def test_prune_keeps_latest_version(self):
+        for title in ('A', 'B', 'C'):
+            self.session.title = title
+            self.session.save()
+        removed = WorkSession.objects.create(client=self.client_obj, title='Удалена', date=timezone.now())
+        removed.delete()
+        WorkSession.history.update(history_date=timezone.now() - timedelta(days=400))
+
+        prune_history(days=365, chunk=2)
+
+        self.assertEqual(list(WorkSession.history.filter(id=self.session.pk).values_list('title', flat=True)), ['C'])
+        self.assertFalse(WorkSession.history.filter(id=removed.pk).exists())
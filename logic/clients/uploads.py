@@ -0,0 +1,101 @@
+"""
+Загрузка вложений по частям: init -> PUT кусков (в любом порядке, с повтором) -> finalize.
+Каждый кусок пишется потоком в свой файл <CHUNKED_UPLOAD_DIR>/<id>/<index>.part,
+поэтому ни кусок, ни весь файл не держатся в памяти, а параллельные PUT не мешают друг другу.
+Какие куски уже есть - видно по файлам на диске, в БД на каждый кусок ничего не пишем.
+"""
+import hashlib
+import os
+import shutil
+from uuid import uuid4
+
+from django.conf import settings
+
+# Сколько байт читаем/пишем за раз
+BLOCK_SIZE = 64 * 1024
+DEFAULT_CHUNK_SIZE = 5 * 1024 * 1024
+MIN_CHUNK_SIZE = 64 * 1024
+MAX_CHUNK_SIZE = 32 * 1024 * 1024
+
+
+class UploadError(Exception):
+    pass
+
+
+def upload_dir(upload):
+    return os.path.join(settings.CHUNKED_UPLOAD_DIR, str(upload.pk))
+
+
+def part_path(upload, index):
+    return os.path.join(upload_dir(upload), f'{index}.part')
+
+
+def received_chunks(upload):
+    """Индексы кусков, которые уже целиком лежат на диске."""
+    try:
+        names = os.listdir(upload_dir(upload))
+    except FileNotFoundError:
+        return []
+    return sorted(int(name[:-len('.part')]) for name in names if name.endswith('.part'))
+
+
+def write_chunk(upload, index, stream, sha256=None):
+    """
+    Пишет кусок из потока запроса. Сначала во временный файл, потом атомарный rename:
+    оборванная передача не оставляет недописанный кусок, его просто шлют заново.
+    """
+    if not 0 <= index < upload.chunk_count:
+        raise UploadError(f'Номер куска вне диапазона 0..{upload.chunk_count - 1}.')
+
+    expected = upload.chunk_length(index)
+    os.makedirs(upload_dir(upload), exist_ok=True)
+    path = part_path(upload, index)
+    tmp_path = f'{path}.{uuid4().hex}.tmp'
+    digest = hashlib.sha256()
+    written = 0
+    try:
+        with open(tmp_path, 'wb') as out:
+            # Читаем на байт больше ожидаемого, чтобы заметить лишние данные
+            while written <= expected:
+                block = stream.read(min(BLOCK_SIZE, expected + 1 - written))
+                if not block:
+                    break
+                out.write(block)
+                digest.update(block)
+                written += len(block)
+        if written != expected:
+            raise UploadError(f'Кусок {index}: ожидалось {expected} байт, получено {written}.')
+        if sha256 and digest.hexdigest() != sha256.lower():
+            raise UploadError(f'Кусок {index}: не совпала контрольная сумма.')
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def assemble(upload):
+    """
+    Склеивает куски по порядку в один файл, считая sha256 на лету.
+    Возвращает путь к собранному файлу; при несовпадении суммы куски удаляются (загрузку начинают заново).
+    """
+    missing = sorted(set(range(upload.chunk_count)) - set(received_chunks(upload)))
+    if missing:
+        raise UploadError(f'Не хватает кусков: {missing[:20]}.')
+
+    target = os.path.join(upload_dir(upload), 'assembled')
+    digest = hashlib.sha256()
+    with open(target, 'wb') as out:
+        for index in range(upload.chunk_count):
+            with open(part_path(upload, index), 'rb') as part:
+                for block in iter(lambda: part.read(BLOCK_SIZE), b''):
+                    digest.update(block)
+                    out.write(block)
+
+    if digest.hexdigest() != upload.checksum.lower():
+        discard(upload)
+        raise UploadError('Контрольная сумма файла не совпала, загрузите его заново.')
+    return target
+
+
+def discard(upload):
+    shutil.rmtree(upload_dir(upload), ignore_errors=True)
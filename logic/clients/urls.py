@@ -1,8 +1,11 @@
 # clients/urls.py
+from django.urls import path, re_path
 from rest_framework.routers import DefaultRouter
 from .views import (
     ClientViewSet, WorkSessionViewSet, SessionCommentViewSet,
-    CategoryViewSet, TagViewSet, AttributeViewSet, ClientAttributeViewSet
+    CategoryViewSet, TagViewSet, AttributeViewSet, ClientAttributeViewSet,
+    AttributeMeasurementViewSet, ReferenceBootstrapView, ChunkedUploadViewSet,
+    AttachmentView, CoachDashboardView, AdherenceViewSet, SearchView, ExportView
 )
 
 router = DefaultRouter()
@@ -13,5 +16,16 @@ router.register(r'categories', CategoryViewSet)
 router.register(r'tags', TagViewSet)
 router.register(r'attributes', AttributeViewSet)
 router.register(r'client-attributes', ClientAttributeViewSet, basename='client-attributes')
+router.register(r'measurements', AttributeMeasurementViewSet, basename='measurements')
+router.register(r'uploads', ChunkedUploadViewSet, basename='uploads')
+router.register(r'analytics/adherence', AdherenceViewSet, basename='adherence')
 
-urlpatterns = router.urls
\ No newline at end of file
+urlpatterns = [
+    # Все справочники разом (холодный старт мобильного приложения)
+    path('reference/', ReferenceBootstrapView.as_view(), name='reference-bootstrap'),
+    path('dashboard/', CoachDashboardView.as_view(), name='coach-dashboard'),
+    path('search/', SearchView.as_view(), name='search'),
+    path('export/', ExportView.as_view(), name='export'),
+    # Вложения сессий и чатов с проверкой прав (вместо прямых ссылок на /media/)
+    re_path(r'^attachments/(?P<kind>sessions|comments)/(?P<pk>\d+)/$', AttachmentView.as_view(), name='attachment'),
+] + router.urls
\ No newline at end of file
@@ -1,18 +1,53 @@
-from rest_framework import viewsets, permissions, filters, status
+import io
+from datetime import timedelta
+
+from rest_framework import viewsets, mixins, permissions, filters, status
 from rest_framework.decorators import action
+from rest_framework.generics import get_object_or_404
+from rest_framework.parsers import MultiPartParser
+from rest_framework.views import APIView
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Q
+from django.contrib.auth import get_user_model
+from django.core.files import File
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.db.models import Prefetch, Count, OuterRef, Subquery, Min, Max, Avg
+from django.db.models.functions import Coalesce, Substr, TruncDay, TruncWeek, TruncMonth
+from django.utils import timezone
 
 from .models import (
-    Client, Category, Tag, Attribute, ClientAttribute, 
-    WorkSession, SessionComment
+    Client, Category, Tag, Attribute, ClientAttribute, AttributeMeasurement,
+    WorkSession, SessionComment, ChunkedUpload
 )
 from .serializers import (
     ClientSerializer, ClientCreateSerializer, 
     CategorySerializer, TagSerializer, AttributeSerializer,
-    ClientAttributeSerializer, WorkSessionSerializer, SessionCommentSerializer
+    ClientAttributeSerializer, WorkSessionSerializer, WorkSessionListSerializer,
+    WorkSessionBulkSerializer, SessionCommentSerializer, ChunkedUploadSerializer,
+    AttributeMeasurementSerializer, MeasurementSeriesQuerySerializer, MeasurementBucketSerializer,
+    SearchQuerySerializer, CommentThreadQuerySerializer, CommentThreadReadSerializer, ExportQuerySerializer,
+    HistoryQuerySerializer
+)
+from .pagination import (
+    SessionCursorPagination, MeasurementCursorPagination, thread_anchor, thread_page, comments_until
 )
+from .filters import ClientFilter, WorkSessionFilter
+from .scoping import ClientScope, get_client_scope
+from . import uploads
+from .serving import serve_file, signed_attachment_url, signed_user_id
+from . import analytics
+from .dashboard import get_dashboard
+from .search import search
+from .importing import ImportFileError, import_clients
+from .history import object_history
+from . import export
+from .reference import REFERENCE_SETS, get_reference_data, conditional_response
+
+User = get_user_model()
+
+# Сколько символов последнего сообщения отдаем в превью списка сессий
+COMMENT_PREVIEW_LENGTH = 100
 
 class IsCoachOrClientOwner(permissions.BasePermission):
     """
@@ -31,23 +66,43 @@ class IsCoachOrClientOwner(permissions.BasePermission):
 
         return False
 
-class ClientViewSet(viewsets.ModelViewSet):
+class HistoryMixin:
+    """GET .../<id>/history/ - журнал изменений объекта (clients/history.py), видимого пользователю."""
+
+    @action(detail=True, methods=['get'])
+    def history(self, request, pk=None):
+        """
+        ?limit=N&before=HISTORY_ID - страница постарше.
+        Ответ: {"results": [{"history_id", "date", "type", "user", "changes": [{"field", "old", "new"}]}], "has_more"}.
+        """
+        params = HistoryQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        query = params.validated_data
+
+        # Только проверка доступа: select_related/prefetch карточки здесь не нужны
+        queryset = self.get_queryset().select_related(None).prefetch_related(None)
+        instance = get_object_or_404(queryset, pk=pk)
+        self.check_object_permissions(request, instance)
+        entries, has_more = object_history(instance, query['limit'], query.get('before'))
+        return Response({'results': entries, 'has_more': has_more})
+
+
+class ClientViewSet(HistoryMixin, viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
     search_fields = ['name', 'user__email', 'tags__name']
-    filterset_fields = ['categories', 'tags']
+    filterset_class = ClientFilter
 
     def get_queryset(self):
-        user = self.request.user
-        # Если юзер - коуч (у него есть поле is_coach или мы определяем это по связям)
-        # В нашей модели: Коуч видит клиентов, где он coach. Клиент видит себя.
-        
-        # 1. Записи, где я тренер
-        as_coach = Client.objects.filter(coach=user)
-        # 2. Запись, где я клиент (мой профиль)
-        as_client = Client.objects.filter(user=user)
-        
-        return (as_coach | as_client).distinct().order_by('-created_at')
+        # Коуч видит клиентов, где он coach, клиент - себя: те же id, что и у остальных вьюх (ClientScope)
+        queryset = get_client_scope(self.request).filter(Client.objects.all(), 'pk')
+
+        # План загрузки для ClientSerializer: число запросов не зависит от количества клиентов
+        return queryset.select_related('user').prefetch_related(
+            'categories',
+            'tags',
+            Prefetch('attributes', queryset=ClientAttribute.objects.select_related('attribute')),
+        ).order_by('-created_at')
 
     def get_serializer_class(self):
         if self.action == 'create':
@@ -58,20 +113,92 @@ class ClientViewSet(viewsets.ModelViewSet):
         # Принудительно ставим текущего юзера как тренера
         serializer.save(coach=self.request.user)
 
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_file(self, request):
+        """
+        POST /api/clients/clients/import/ (multipart, поле file: .csv или .xlsx)
+        Массовое создание клиентов из таблицы (clients/importing.py). Ответ - отчет с ошибками по строкам,
+        приглашения на почту уходят в фоне.
+        """
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'file': "Файл не передан."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            report = import_clients(request.user, upload.name, upload.file)
+        except ImportFileError as exc:
+            return Response({'file': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report, status=status.HTTP_201_CREATED if report['created'] else status.HTTP_200_OK)
+
+
+class WorkSessionViewSet(HistoryMixin, viewsets.ModelViewSet):
+    """
+    Список (GET /sessions/) - курсорная пагинация и облегченный формат:
+    число комментариев и превью последнего вместо всей ленты.
+    Полная лента - только в карточке сессии и в /comments/?session=ID.
 
-class WorkSessionViewSet(viewsets.ModelViewSet):
+    Календарь: ?date_from=YYYY-MM-DD&date_to=YYYY-MM-DD (+ ?client=ID для одного клиента).
+    """
     serializer_class = WorkSessionSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
     search_fields = ['title', 'description']
-    filterset_fields = ['status', 'client', 'date']
+    filterset_class = WorkSessionFilter
+    pagination_class = SessionCursorPagination
 
     def get_queryset(self):
-        user = self.request.user
         # Коуч видит сессии своих клиентов. Клиент видит свои сессии.
-        return WorkSession.objects.filter(
-            Q(client__coach=user) | Q(client__user=user)
-        ).distinct().order_by('-date')
+        # client_id IN (...) вместо OR по JOIN-у: планировщик идет по индексу
+        # (client, date) для каждого клиента, DISTINCT не нужен.
+        scope = get_client_scope(self.request)
+        queryset = scope.filter(WorkSession.objects.all()).select_related('client').order_by('-date')
+
+        if self.action == 'list':
+            return self.annotate_comments_summary(queryset)
+
+        return queryset.prefetch_related(
+            Prefetch('comments', queryset=SessionComment.objects.select_related('author'))
+        )
+
+    @staticmethod
+    def annotate_comments_summary(queryset):
+        """
+        Счетчик и последний комментарий считаются подзапросами в том же SELECT,
+        без JOIN по комментариям (он размножил бы строки сессий).
+        """
+        comments = SessionComment.objects.filter(session=OuterRef('pk'))
+        last_comment = comments.order_by('-created_at', '-id')
+        return queryset.annotate(
+            comments_count=Coalesce(
+                Subquery(comments.order_by().values('session').annotate(c=Count('id')).values('c')),
+                0,
+            ),
+            last_comment_text=Subquery(
+                last_comment.annotate(preview=Substr('text', 1, COMMENT_PREVIEW_LENGTH)).values('preview')[:1]
+            ),
+            last_comment_author=Subquery(last_comment.values('author_id')[:1]),
+            last_comment_at=Subquery(last_comment.values('created_at')[:1]),
+        )
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return WorkSessionListSerializer
+        if self.action == 'bulk':
+            return WorkSessionBulkSerializer
+        return WorkSessionSerializer
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        POST /api/clients/sessions/bulk/
+        План тренировок одним запросом: список сессий и/или повтор по дням недели.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        sessions = serializer.save()
+        return Response(
+            {'count': len(sessions), 'ids': [session.pk for session in sessions]},
+            status=status.HTTP_201_CREATED
+        )
 
     def perform_create(self, serializer):
         # Если клиент передается в теле запроса - ок, проверяем права.
@@ -83,6 +210,7 @@ class SessionCommentViewSet(viewsets.ModelViewSet):
     """
     Отдельный вьюсет для комментариев, чтобы можно было удобно
     создавать их POST-запросом.
+    Чат сессии синхронизируется через /comments/thread/ - только новые сообщения, а не весь список.
     """
     serializer_class = SessionCommentSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -90,33 +218,273 @@ class SessionCommentViewSet(viewsets.ModelViewSet):
     filterset_fields = ['session']
 
     def get_queryset(self):
-        user = self.request.user
-        return SessionComment.objects.filter(
-            Q(session__client__coach=user) | Q(session__client__user=user)
-        ).order_by('created_at')
+        scope = get_client_scope(self.request)
+        return scope.filter(SessionComment.objects.all(), 'session__client').select_related('author').order_by('created_at')
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    @action(detail=True, methods=['post'])
+    def mark_read(self, request, pk=None):
+        """POST /api/clients/comments/{id}/mark_read/ - отмечает чужое сообщение прочитанным."""
+        # Импорт здесь: notifications зависит от clients, а не наоборот
+        from notifications import counters
+
+        comment = self.get_object()
+        if comment.author_id != request.user.id:
+            if SessionComment.objects.filter(pk=comment.pk, is_read=False).update(is_read=True):
+                counters.comments_read(request.user.pk)
+        return Response({'status': 'success'})
+
+    @action(detail=False, methods=['get'])
+    def thread(self, request):
+        """
+        GET /api/clients/comments/thread/?session=ID&after=ID - сообщения новее известного (обновление чата).
+        ?before=ID - история выше, без after/before - последние limit сообщений.
+        Ответ: {"results": [...по возрастанию...], "has_more": bool}.
+        """
+        params = CommentThreadQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        query = params.validated_data
+
+        comments = self.get_queryset().filter(session_id=query['session'])
+        page, has_more = thread_page(comments, query.get('after'), query.get('before'), query['limit'])
+        return Response({'results': self.get_serializer(page, many=True).data, 'has_more': has_more})
+
+    @action(detail=False, methods=['post'])
+    def read_thread(self, request):
+        """
+        POST /api/clients/comments/read_thread/ {"session": ID, "up_to": ID}
+        Все чужие непрочитанные сообщения треда (до up_to включительно) - одним UPDATE.
+        """
+        from notifications import counters
+
+        params = CommentThreadReadSerializer(data=request.data)
+        params.is_valid(raise_exception=True)
+        query = params.validated_data
+
+        comments = self.get_queryset().filter(session_id=query['session'])
+        unread = comments.filter(is_read=False).exclude(author=request.user)
+        if 'up_to' in query:
+            unread = comments_until(unread, thread_anchor(comments, query['up_to'], 'up_to'))
+        marked = unread.update(is_read=True)
+        if marked:
+            counters.comments_read(request.user.pk, marked)
+        return Response({'status': 'success', 'marked': marked})
+
+
+class ChunkedUploadViewSet(mixins.CreateModelMixin,
+                           mixins.RetrieveModelMixin,
+                           mixins.DestroyModelMixin,
+                           viewsets.GenericViewSet):
+    """
+    Загрузка вложения сессии/комментария по частям (clients/uploads.py):
+    POST /uploads/ -> PUT /uploads/{id}/chunks/{n}/ (сырое тело, любой порядок) -> POST /uploads/{id}/finalize/.
+    GET /uploads/{id}/ показывает полученные куски - с них продолжают после обрыва.
+    """
+    serializer_class = ChunkedUploadSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return ChunkedUpload.objects.filter(owner=self.request.user)
+
+    def perform_create(self, serializer):
+        serializer.save(owner=self.request.user)
+
+    def perform_destroy(self, instance):
+        uploads.discard(instance)
+        instance.delete()
+
+    @action(detail=True, methods=['put'], url_path=r'chunks/(?P<index>\d+)')
+    def chunk(self, request, pk=None, index=None):
+        """
+        PUT /api/clients/uploads/{id}/chunks/{n}/ - тело запроса = байты куска (application/octet-stream).
+        Необязательный заголовок X-Chunk-SHA256 - контрольная сумма куска.
+        """
+        upload = self.get_object()
+        if upload.completed_at:
+            return Response({'detail': "Загрузка уже завершена."}, status=status.HTTP_409_CONFLICT)
+        # Тело читаем потоком, не через request.data: парсеры DRF держали бы кусок в памяти
+        stream = request.stream or io.BytesIO()
+        try:
+            uploads.write_chunk(upload, int(index), stream, request.headers.get('X-Chunk-SHA256'))
+        except uploads.UploadError as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'received': uploads.received_chunks(upload), 'chunk_count': upload.chunk_count})
+
+    @action(detail=True, methods=['post'])
+    def finalize(self, request, pk=None):
+        """POST /api/clients/uploads/{id}/finalize/ - собрать, сверить sha256 и прикрепить файл."""
+        upload = self.get_object()
+        if upload.completed_at:
+            return Response({'detail': "Загрузка уже завершена."}, status=status.HTTP_409_CONFLICT)
+        try:
+            assembled = uploads.assemble(upload)
+        except uploads.UploadError as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        target = upload.target
+        with transaction.atomic():
+            with open(assembled, 'rb') as f:
+                target.attachment.save(upload.filename, File(f), save=False)
+            target.save(update_fields=['attachment'])
+            upload.completed_at = timezone.now()
+            upload.save(update_fields=['completed_at'])
+        uploads.discard(upload)
+
+        kind = 'sessions' if upload.session_id else 'comments'
+        return Response({'id': upload.pk, 'attachment': signed_attachment_url(request, kind, target.pk)})
+
+
+class AttachmentView(APIView):
+    """
+    GET /api/clients/attachments/{sessions|comments}/{id}/
+    Вложение сессии или сообщения чата. Доступ - по JWT или по подписанной ссылке (?sig=...),
+    которую отдают сериализаторы в поле attachment. Range, 304, X-Accel-Redirect - в clients/serving.py.
+    """
+    permission_classes = [permissions.AllowAny]  # Права проверяем сами: ссылка может прийти без токена
+    ATTACHMENT_MODELS = {
+        'sessions': (WorkSession, 'client'),
+        'comments': (SessionComment, 'session__client'),
+    }
+
+    def get(self, request, kind, pk):
+        model, client_field = self.ATTACHMENT_MODELS[kind]
+        if request.user.is_authenticated:
+            scope = get_client_scope(request)
+        else:
+            user_id = signed_user_id(request.query_params.get('sig', ''), kind, pk)
+            user = User.objects.filter(pk=user_id, is_active=True).first() if user_id else None
+            if user is None:
+                return Response({'detail': "Нужна авторизация или действующая ссылка."}, status=status.HTTP_403_FORBIDDEN)
+            scope = ClientScope(user)
+
+        obj = scope.filter(model.objects.filter(pk=pk), client_field).only('pk', 'attachment').first()
+        if obj is None or not obj.attachment:
+            return Response({'detail': "Файл не найден."}, status=status.HTTP_404_NOT_FOUND)
+        return serve_file(request, obj.attachment)
+
+
+class CoachDashboardView(APIView):
+    """
+    GET /api/clients/dashboard/?inactive_days=14
+    Сводка тренера: клиенты, сессии недели, ждущие проверки, непрочитанные сообщения,
+    клиенты без сессий за inactive_days дней. Кешируется на минуту (clients/dashboard.py).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    DEFAULT_INACTIVE_DAYS = 14
+
+    def get(self, request):
+        try:
+            inactive_days = int(request.query_params.get('inactive_days', self.DEFAULT_INACTIVE_DAYS))
+        except ValueError:
+            inactive_days = -1
+        if not 1 <= inactive_days <= 365:
+            return Response({'inactive_days': "Целое число от 1 до 365."}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(get_dashboard(request.user, inactive_days))
+
+
+class AdherenceViewSet(viewsets.ViewSet):
+    """
+    Аналитика выполнения плана по недельной сводке (clients/analytics.py):
+    GET /api/clients/analytics/adherence/ - все доступные клиенты (?client=ID - один);
+    GET /api/clients/analytics/adherence/{client_id}/ - с понедельной динамикой и сериями;
+    GET /api/clients/analytics/adherence/categories/ - сравнение программ.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def list(self, request):
+        client_ids = sorted(get_client_scope(request).client_ids)
+        if 'client' in request.query_params:
+            client_ids = [pk for pk in client_ids if str(pk) == request.query_params['client']]
+        return Response(list(analytics.client_summaries(client_ids).values()))
+
+    def retrieve(self, request, pk=None):
+        if not pk.isdigit() or not get_client_scope(request).has_client(int(pk)):
+            return Response({'detail': "Клиент не найден."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(analytics.client_detail(int(pk)))
+
+    @action(detail=False, methods=['get'])
+    def categories(self, request):
+        return Response(analytics.category_comparison(get_client_scope(request).client_ids))
+
+
+class SearchView(APIView):
+    """
+    GET /api/clients/search/?q=текст&types=clients,sessions,comments&limit=20
+    Полнотекстовый поиск по клиентам, сессиям и чатам в пределах своих клиентов (clients/search.py).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        params = SearchQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        query = params.validated_data
+        return Response(search(get_client_scope(request), query['q'], query['types'], query['limit']))
+
+
+class ExportView(APIView):
+    """
+    GET /api/clients/export/?output=ndjson|csv|zip&section=sessions&attachments=1
+    Потоковая выгрузка клиентов тренера, их параметров, сессий и сообщений (clients/export.py).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        params = ExportQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        query = params.validated_data
+
+        output = query['output']
+        chunks = export.export_chunks(request.user, output, query.get('section'), query['attachments'])
+        content_type, extension = export.FORMATS[output]
+        name = query.get('section', 'fitcare')
+        response = StreamingHttpResponse(export.streaming_content(request, chunks), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{name}-{timezone.localdate():%Y-%m-%d}.{extension}"'
+        return response
+
 
 # === Справочники (ReadOnly или AdminOnly, но пока делаем ModelViewSet для удобства) ===
 
-class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
+class CachedReferenceListMixin:
+    """Список справочника из версионированного кеша, с ETag и ответом 304 на If-None-Match."""
+    reference_name = None
+
+    def list(self, request, *args, **kwargs):
+        data, etag = get_reference_data([self.reference_name], request)
+        return conditional_response(request, data[self.reference_name], etag)
+
+class CategoryViewSet(CachedReferenceListMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [permissions.AllowAny] # Или IsAuthenticated
+    reference_name = 'categories'
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(CachedReferenceListMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = [permissions.AllowAny]
+    reference_name = 'tags'
 
-class AttributeViewSet(viewsets.ReadOnlyModelViewSet):
+class AttributeViewSet(CachedReferenceListMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Attribute.objects.all()
     serializer_class = AttributeSerializer
     permission_classes = [permissions.AllowAny]
+    reference_name = 'attributes'
 
-class ClientAttributeViewSet(viewsets.ModelViewSet):
+class ReferenceBootstrapView(APIView):
+    """
+    GET /api/clients/reference/
+    Все справочники одним ответом для холодного старта приложения.
+    Повторный запрос с If-None-Match вернет 304 без обращения к БД.
+    """
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request):
+        data, etag = get_reference_data(list(REFERENCE_SETS), request)
+        return conditional_response(request, data, etag)
+
+class ClientAttributeViewSet(HistoryMixin, viewsets.ModelViewSet):
     """
     Управление значениями атрибутов (CRUD).
     """
@@ -124,7 +492,84 @@ class ClientAttributeViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        user = self.request.user
-        return ClientAttribute.objects.filter(
-            Q(client__coach=user) | Q(client__user=user)
-        )
\ No newline at end of file
+        scope = get_client_scope(self.request)
+        return scope.filter(ClientAttribute.objects.all()).select_related('attribute')
+
+    # Каждое изменение числового значения попадает в историю замеров
+    def perform_create(self, serializer):
+        serializer.save().log_measurement()
+
+    def perform_update(self, serializer):
+        serializer.save().log_measurement()
+
+
+class AttributeMeasurementViewSet(mixins.CreateModelMixin,
+                                  mixins.RetrieveModelMixin,
+                                  mixins.ListModelMixin,
+                                  viewsets.GenericViewSet):
+    """
+    История замеров (только добавление). Фильтры: ?client=ID&attribute=weight.
+    """
+    serializer_class = AttributeMeasurementSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['client', 'attribute']
+    pagination_class = MeasurementCursorPagination
+
+    TRUNC_FUNCTIONS = {'day': TruncDay, 'week': TruncWeek, 'month': TruncMonth}
+    # Сколько точек максимум отдаем на график при bucket=auto
+    MAX_POINTS = 400
+
+    def get_queryset(self):
+        scope = get_client_scope(self.request)
+        return scope.filter(AttributeMeasurement.objects.all())
+
+    @action(detail=False, methods=['get'])
+    def series(self, request):
+        """
+        GET /api/clients/measurements/series/?client=ID&attribute=weight&bucket=week
+        Прореженная серия для графика: min/max/avg/count по дням, неделям или месяцам.
+        Группировка считается в БД, наружу уходит не больше нескольких сотен точек.
+        """
+        params = MeasurementSeriesQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        query = params.validated_data
+
+        measurements = self.get_queryset().filter(client_id=query['client'], attribute_id=query['attribute'])
+        if 'date_from' in query:
+            measurements = measurements.filter(measured_at__gte=query['date_from'])
+        if 'date_to' in query:
+            measurements = measurements.filter(measured_at__lte=query['date_to'])
+
+        bucket = query['bucket']
+        if bucket == 'auto':
+            bucket = self.pick_bucket(measurements, query.get('date_from'), query.get('date_to'))
+
+        # Count('value'), а не Count('id'): value лежит в measurement_series_idx (INCLUDE), и запрос
+        # остается index-only; value NOT NULL - результат тот же
+        rows = measurements.annotate(
+            bucket=self.TRUNC_FUNCTIONS[bucket]('measured_at')
+        ).values('bucket').annotate(
+            min=Min('value'), max=Max('value'), avg=Avg('value'), count=Count('value')
+        ).order_by('bucket')
+
+        return Response({
+            'bucket': bucket,
+            'points': MeasurementBucketSerializer(rows, many=True).data,
+        })
+
+    def pick_bucket(self, measurements, date_from, date_to):
+        """Самый мелкий шаг, при котором точек не больше MAX_POINTS."""
+        if not (date_from and date_to):
+            bounds = measurements.aggregate(first=Min('measured_at'), last=Max('measured_at'))
+            date_from = date_from or bounds['first']
+            date_to = date_to or bounds['last']
+        if not (date_from and date_to):
+            return 'day'
+
+        span = date_to - date_from
+        if span <= timedelta(days=self.MAX_POINTS):
+            return 'day'
+        if span <= timedelta(weeks=self.MAX_POINTS):
+            return 'week'
+        return 'month'
\ No newline at end of file
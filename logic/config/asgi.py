@@ -3,6 +3,8 @@ ASGI config for config project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+HTTP обслуживает обычный Django, WebSocket (ws/notifications/) - Channels.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
 """
@@ -13,4 +15,16 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
-application = get_asgi_application()
+# Django должен инициализироваться до импорта consumers (они тянут модели)
+django_asgi_app = get_asgi_application()
+
+from channels.routing import ProtocolTypeRouter, URLRouter  # noqa: E402
+
+from notifications.auth import JWTAuthMiddleware  # noqa: E402
+from notifications.routing import websocket_urlpatterns  # noqa: E402
+
+application = ProtocolTypeRouter({
+    'http': django_asgi_app,
+    # Авторизация по токену, а не по cookie - проверка Origin не нужна (и мешала бы мобильному приложению)
+    'websocket': JWTAuthMiddleware(URLRouter(websocket_urlpatterns)),
+})
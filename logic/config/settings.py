@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/6.0/ref/settings/
 from datetime import timedelta
 from pathlib import Path
 import os
+import sys
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -32,6 +33,7 @@ ALLOWED_HOSTS = []
 # Application definition
 
 INSTALLED_APPS = [
+    'daphne',  # ASGI runserver (HTTP + WebSocket), должен стоять первым
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -43,6 +45,7 @@ INSTALLED_APPS = [
     'rest_framework',
     'corsheaders',
     'rest_framework_simplejwt',
+    'channels',
     'users',
     'clients',
     'simple_history',
@@ -80,6 +83,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'config.wsgi.application'
+ASGI_APPLICATION = 'config.asgi.application'
 
 
 # Database
@@ -141,8 +145,10 @@ CORS_ALLOW_ALL_ORIGINS = True
 
 # DRF Config
 REST_FRAMEWORK = {
+    # Пользователь - из claims токена, без запроса в БД (users/authentication.py).
+    # Проверка каждого запроса по БД - rest_framework_simplejwt.authentication.JWTAuthentication
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.ClaimsJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -155,6 +161,20 @@ MEDIA_URL = '/media/'
 # Физическая папка на компьютере, куда будут падать файлы
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Куски загрузок по частям (clients/uploads.py) до сборки - вне MEDIA_ROOT, наружу не раздаются
+CHUNKED_UPLOAD_DIR = os.path.join(BASE_DIR, 'tmp', 'uploads')
+CHUNKED_UPLOAD_MAX_SIZE = 4 * 1024 ** 3  # 4 ГБ
+
+# Вложения сессий и чатов лежат вне MEDIA_ROOT (не раздаются по /media/) и отдаются только через
+# /api/clients/attachments/ (clients/serving.py). 'nginx' - отдача через X-Accel-Redirect на internal
+# location PROTECTED_MEDIA_INTERNAL_URL (alias на PROTECTED_MEDIA_ROOT), 'apache' - через X-Sendfile,
+# пусто - потоком из Django.
+PROTECTED_MEDIA_ROOT = os.path.join(BASE_DIR, 'protected_media')
+PROTECTED_MEDIA_SERVER = os.environ.get('PROTECTED_MEDIA_SERVER') or None
+PROTECTED_MEDIA_INTERNAL_URL = '/protected-media/'
+# Сколько секунд живет подписанная ссылка на вложение
+MEDIA_URL_MAX_AGE = 6 * 60 * 60
+
 SIMPLE_JWT = {
     # Жизнь Access токена (с ним ходят за данными)
     'ACCESS_TOKEN_LIFETIME': timedelta(days=30), 
@@ -175,5 +195,56 @@ CELERY_ACCEPT_CONTENT = ['application/json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+# В тестах (и с CELERY_TASK_ALWAYS_EAGER=1) задачи выполняются сразу в процессе, без брокера
+CELERY_TASK_ALWAYS_EAGER = 'test' in sys.argv or os.environ.get('CELERY_TASK_ALWAYS_EAGER') == '1'
+CELERY_TASK_EAGER_PROPAGATES = True
+# Периодические задачи (celery -A config beat)
+CELERY_BEAT_SCHEDULE = {
+    # Повторы писем и письма упавших воркеров (notifications/outbox.py)
+    'send-outbox': {
+        'task': 'notifications.tasks.send_outbox',
+        'schedule': 60.0,
+    },
+}
+
+# === CACHE (счетчики непрочитанного и т.п.) ===
+# Общий Redis для всех воркеров; в тестах - локальная память процесса
+if 'test' in sys.argv:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/2'),
+        }
+    }
+
+# === CHANNELS (WebSocket-пуш уведомлений и чата) ===
+# В тестах - in-memory слой (один процесс), в работе - Redis, общий для всех воркеров
+if 'test' in sys.argv:
+    CHANNEL_LAYERS = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+else:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {'hosts': [os.environ.get('CHANNELS_REDIS_URL', 'redis://localhost:6379/1')]},
+        }
+    }
 
-EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
\ No newline at end of file
+# === EMAIL ===
+# Письма не отправляются из запроса: они пишутся в outbox (notifications/outbox.py),
+# Celery-воркер отправляет их пачками через одно SMTP-соединение с повторами.
+# По умолчанию - в консоль; в работе EMAIL_BACKEND=django.core.mail.backends.smtp.EmailBackend,
+# для локальной отладки - filebased (письма файлами в EMAIL_FILE_PATH). В тестах Django подменяет на locmem.
+EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'tmp', 'emails')
+EMAIL_HOST = os.environ.get('EMAIL_HOST', 'localhost')
+EMAIL_PORT = int(os.environ.get('EMAIL_PORT', 25))
+EMAIL_HOST_USER = os.environ.get('EMAIL_HOST_USER', '')
+EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD', '')
+EMAIL_USE_TLS = os.environ.get('EMAIL_USE_TLS') == '1'
+EMAIL_TIMEOUT = 10
+# Отправитель писем outbox (приглашения и т.п.); без него Django подставил бы webmaster@localhost
+DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'noreply@fitcare.com')
+EMAIL_OUTBOX_BATCH = 100  # Писем за один проход воркера (одно соединение)
+EMAIL_OUTBOX_MAX_ATTEMPTS = 6
\ No newline at end of file
@@ -1,3 +1,23 @@
 from django.contrib import admin
+from django.utils import timezone
 
-# Register your models here.
+from .models import OutgoingEmail
+
+
+@admin.register(OutgoingEmail)
+class OutgoingEmailAdmin(admin.ModelAdmin):
+    list_display = ('to', 'subject', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('to', 'subject')
+    # Текст не показываем: в приглашениях там пароль
+    exclude = ('body',)
+    readonly_fields = ('attempts', 'last_error', 'created_at', 'sent_at')
+    actions = ['retry_now']
+
+    @admin.action(description="Отправить повторно")
+    def retry_now(self, request, queryset):
+        from .tasks import send_outbox
+
+        # Стертые (отправленные или брошенные) письма повторить нечем
+        queryset.exclude(status='sent').exclude(body='').update(status='pending', attempts=0, next_attempt_at=timezone.now())
+        send_outbox.delay()
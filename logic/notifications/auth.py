@@ -0,0 +1,30 @@
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from rest_framework_simplejwt.exceptions import InvalidToken, AuthenticationFailed, TokenError
+from users.authentication import ClaimsJWTAuthentication
+
+
+@database_sync_to_async
+def get_user_from_token(raw_token):
+    authentication = ClaimsJWTAuthentication()
+    try:
+        return authentication.get_user(authentication.get_validated_token(raw_token))
+    except (InvalidToken, AuthenticationFailed, TokenError):
+        return AnonymousUser()
+
+
+class JWTAuthMiddleware:
+    """
+    Авторизация WebSocket по access-токену SimpleJWT.
+    Браузер не умеет слать заголовки при открытии сокета, поэтому токен - в ?token=.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        token = parse_qs(scope.get('query_string', b'').decode()).get('token', [None])[0]
+        user = await get_user_from_token(token) if token else AnonymousUser()
+        return await self.app({**scope, 'user': user}, receive, send)
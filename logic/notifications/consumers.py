@@ -0,0 +1,32 @@
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from .realtime import user_group
+
+
+class NotificationConsumer(AsyncJsonWebsocketConsumer):
+    """
+    ws/notifications/?token=<access JWT>
+    Пушит пользователю новые уведомления и сообщения чатов его сессий вместо поллинга
+    /notifications/unread_count/ и /comments/.
+    Формат: {"type": "notification" | "comment", "data": {...}}
+    """
+
+    async def connect(self):
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            await self.close(code=4401)
+            return
+
+        self.group_name = user_group(user.pk)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, code):
+        if hasattr(self, 'group_name'):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def notification_created(self, event):
+        await self.send_json({'type': 'notification', 'data': event['data']})
+
+    async def comment_created(self, event):
+        await self.send_json({'type': 'comment', 'data': event['data']})
@@ -0,0 +1,71 @@
+from django.core.cache import cache
+
+# Счетчики - кеш поверх COUNT(*). Живут ограниченное время, чтобы любая
+# рассинхронизация (гонка, сбой кеша) сама исправлялась пересчетом.
+COUNTER_TTL = 60 * 60
+
+NOTIFICATIONS_KEY = 'unread:notifications:{}'
+COMMENTS_KEY = 'unread:comments:{}'
+
+
+def _get(key, compute):
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        cache.add(key, value, COUNTER_TTL)
+    return value
+
+
+def _adjust(key, delta):
+    """Атомарно сдвигает счетчик. Если его нет в кеше - ничего не делаем, пересчитается при чтении."""
+    try:
+        value = cache.incr(key, delta)
+    except ValueError:
+        return
+    if value < 0:
+        cache.delete(key)
+
+
+def unread_notifications(user_id):
+    from .models import Notification
+
+    return _get(
+        NOTIFICATIONS_KEY.format(user_id),
+        # Запасной путь - по частичному индексу notification_unread_idx
+        lambda: Notification.objects.filter(recipient_id=user_id, is_read=False).count(),
+    )
+
+
+def unread_comments(user):
+    from clients.models import SessionComment
+    from clients.scoping import ClientScope
+
+    def compute():
+        comments = ClientScope(user).filter(SessionComment.objects.filter(is_read=False), 'session__client')
+        return comments.exclude(author_id=user.pk).count()
+
+    return _get(COMMENTS_KEY.format(user.pk), compute)
+
+
+def notifications_created(recipient_ids):
+    counts = {}
+    for user_id in recipient_ids:
+        counts[user_id] = counts.get(user_id, 0) + 1
+    for user_id, count in counts.items():
+        _adjust(NOTIFICATIONS_KEY.format(user_id), count)
+
+
+def notifications_read(user_id, count=1):
+    _adjust(NOTIFICATIONS_KEY.format(user_id), -count)
+
+
+def comments_created(recipient_ids):
+    counts = {}
+    for user_id in recipient_ids:
+        counts[user_id] = counts.get(user_id, 0) + 1
+    for user_id, count in counts.items():
+        _adjust(COMMENTS_KEY.format(user_id), count)
+
+
+def comments_read(user_id, count=1):
+    _adjust(COMMENTS_KEY.format(user_id), -count)
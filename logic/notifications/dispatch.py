@@ -0,0 +1,50 @@
+from django.db import transaction
+
+from .tasks import fan_out_notifications
+
+
+class NotificationBatch:
+    """Id сессий и комментариев, накопленные за одну транзакцию."""
+
+    def __init__(self):
+        self.session_ids = []
+        self.comment_ids = []
+        self.plan_session_ids = []
+        self.dispatched = False
+
+    def is_pending(self, connection):
+        # После отката транзакции Django выбрасывает её on_commit-колбэки - такой батч уже мертв
+        return not self.dispatched and any(func == self.dispatch for _, func, _ in connection.run_on_commit)
+
+    def dispatch(self):
+        self.dispatched = True
+        fan_out_notifications.delay(
+            session_ids=self.session_ids,
+            comment_ids=self.comment_ids,
+            plan_session_ids=self.plan_session_ids,
+        )
+
+    def add(self, session_ids, comment_ids, plan_session_ids):
+        self.session_ids.extend(session_ids)
+        self.comment_ids.extend(comment_ids)
+        self.plan_session_ids.extend(plan_session_ids)
+
+
+def queue_notifications(session_ids=(), comment_ids=(), plan_session_ids=()):
+    """
+    Откладывает уведомления до коммита транзакции.
+    Все id за транзакцию уходят в Celery одной задачей (и одним bulk_create),
+    вне транзакции - сразу.
+    plan_session_ids - сессии из массового планирования: по одному сводному уведомлению на клиента.
+    """
+    connection = transaction.get_connection()
+    batch = getattr(connection, 'notification_batch', None)
+
+    if batch is None or not batch.is_pending(connection):
+        batch = NotificationBatch()
+        batch.add(session_ids, comment_ids, plan_session_ids)
+        connection.notification_batch = batch
+        transaction.on_commit(batch.dispatch)
+        return
+
+    batch.add(session_ids, comment_ids, plan_session_ids)
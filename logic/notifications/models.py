@@ -2,6 +2,7 @@ from django.db import models
 from django.conf import settings
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
+from django.utils import timezone
 
 class Notification(models.Model):
     """
@@ -40,6 +41,46 @@ class Notification(models.Model):
         ordering = ['-created_at']
         verbose_name = "Уведомление"
         verbose_name_plural = "Уведомления"
+        indexes = [
+            # Только непрочитанные: маленький индекс для пересчета бейджа, если счетчика нет в кеше
+            models.Index(fields=['recipient'], condition=models.Q(is_read=False), name='notification_unread_idx'),
+        ]
 
     def __str__(self):
-        return f"{self.recipient} - {self.title}"
\ No newline at end of file
+        return f"{self.recipient} - {self.title}"
+
+
+class OutgoingEmail(models.Model):
+    """
+    Outbox исходящих писем (notifications/outbox.py). Письмо пишется в той же транзакции,
+    что и данные, а отправляет его Celery-воркер: медленный SMTP не держит запрос и блокировки.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Ожидает отправки'),
+        ('sent', 'Отправлено'),
+        ('failed', 'Не доставлено'),
+    ]
+    to = models.EmailField(verbose_name="Кому")
+    subject = models.CharField(max_length=255, verbose_name="Тема")
+    body = models.TextField(verbose_name="Текст")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending', verbose_name="Статус")
+
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name="Попыток")
+    # Когда письмо можно брать в отправку: для новых - сразу, после ошибки - с задержкой,
+    # взятое воркером - через SEND_LEASE (если воркер упал, письмо заберет следующий)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, verbose_name="Последняя ошибка")
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Исходящее письмо"
+        verbose_name_plural = "Исходящие письма"
+        indexes = [
+            # Очередь на отправку - только pending, отправленные в индекс не попадают
+            models.Index(fields=['next_attempt_at'], condition=models.Q(status='pending'), name='outgoing_email_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.to} - {self.subject} ({self.status})"
@@ -0,0 +1,101 @@
+"""
+Outbox исходящей почты. enqueue() только пишет строку OutgoingEmail (в транзакции вызывающего)
+и после коммита будит воркер notifications.tasks.send_outbox. Воркер забирает пачку писем
+(SELECT ... FOR UPDATE SKIP LOCKED - параллельные воркеры не шлют одно письмо дважды),
+отправляет их через одно соединение и записывает статус. Ошибка - повтор с экспоненциальной
+задержкой (его забирает send_outbox по расписанию celery beat), после EMAIL_OUTBOX_MAX_ATTEMPTS попыток письмо помечается failed.
+Текст письма (в приглашениях - пароль) после отправки или отказа стирается, в базе остается
+только адрес, тема и статус.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OutgoingEmail
+
+# Сколько письмо считается "в работе" у воркера; потом его может забрать другой
+SEND_LEASE = timedelta(minutes=10)
+RETRY_BASE = timedelta(minutes=1)
+RETRY_MAX = timedelta(hours=6)
+
+
+def enqueue(to, subject, body):
+    """Одно письмо в очередь. Отправка - после коммита текущей транзакции."""
+    return enqueue_many([(to, subject, body)])[0]
+
+
+def enqueue_many(messages):
+    """[(to, subject, body)] -> письма в очередь одним INSERT."""
+    # Импорт здесь: tasks импортирует этот модуль
+    from .tasks import send_outbox
+
+    emails = OutgoingEmail.objects.bulk_create(
+        [OutgoingEmail(to=to, subject=subject, body=body) for to, subject, body in messages]
+    )
+    if emails:
+        transaction.on_commit(send_outbox.delay)
+    return emails
+
+
+def retry_delay(attempts):
+    """1, 2, 4, ... минут, но не больше RETRY_MAX."""
+    return min(RETRY_BASE * 2 ** (attempts - 1), RETRY_MAX)
+
+
+def claim(limit):
+    """Забирает до limit писем, которым пора уйти: +1 попытка и аренда на SEND_LEASE."""
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            OutgoingEmail.objects.select_for_update(skip_locked=True)
+            .filter(status='pending', next_attempt_at__lte=now)
+            .order_by('next_attempt_at').values_list('pk', flat=True)[:limit]
+        )
+        OutgoingEmail.objects.filter(pk__in=ids).update(attempts=F('attempts') + 1, next_attempt_at=now + SEND_LEASE)
+    return list(OutgoingEmail.objects.filter(pk__in=ids).order_by('pk'))
+
+
+def mark_failed(email, error):
+    now = timezone.now()
+    email.last_error = str(error)[:1000] or error.__class__.__name__
+    if email.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+        email.status = 'failed'
+        email.body = ''
+    else:
+        email.next_attempt_at = now + retry_delay(email.attempts)
+    email.save(update_fields=['status', 'body', 'last_error', 'next_attempt_at'])
+
+
+def deliver(emails):
+    """
+    Отправляет письма через одно соединение. Возвращает, сколько отправлено;
+    неотправленные получают время повтора (next_attempt_at).
+    """
+    sent, failed = [], []
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as exc:
+        # Сервер недоступен - вся пачка уходит на повтор
+        failed = [(email, exc) for email in emails]
+    else:
+        try:
+            for email in emails:
+                message = EmailMessage(email.subject, email.body, settings.DEFAULT_FROM_EMAIL, [email.to], connection=connection)
+                try:
+                    message.send()
+                except Exception as exc:
+                    failed.append((email, exc))
+                else:
+                    sent.append(email.pk)
+        finally:
+            connection.close()
+
+    OutgoingEmail.objects.filter(pk__in=sent).update(status='sent', sent_at=timezone.now(), last_error='', body='')
+    for email, exc in failed:
+        mark_failed(email, exc)
+    return len(sent)
@@ -0,0 +1,49 @@
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+
+logger = logging.getLogger(__name__)
+
+
+def user_group(user_id):
+    """Группа канального слоя: все открытые сокеты одного пользователя (вкладки, телефон)."""
+    return f'user_{user_id}'
+
+
+def push_to_users(events):
+    """
+    Рассылает события подключенным клиентам. events - список (user_id, тип, данные),
+    тип совпадает с методом NotificationConsumer ('notification.created' -> notification_created).
+    Сбой канального слоя не должен ронять создание уведомлений - только логируем.
+    """
+    channel_layer = get_channel_layer()
+    if channel_layer is None or not events:
+        return
+    try:
+        for user_id, event_type, data in events:
+            async_to_sync(channel_layer.group_send)(user_group(user_id), {'type': event_type, 'data': data})
+    except Exception:
+        logger.exception("Не удалось отправить realtime-события")
+
+
+def push_notifications(notifications):
+    from .serializers import NotificationSerializer
+
+    push_to_users([
+        (notification.recipient_id, 'notification.created', NotificationSerializer(notification).data)
+        for notification in notifications
+    ])
+
+
+def push_comments(comments):
+    """Новое сообщение чата - обоим участникам сессии (автору тоже: у него могут быть другие устройства)."""
+    from clients.serializers import SessionCommentSerializer
+
+    events = []
+    for comment in comments:
+        data = SessionCommentSerializer(comment).data
+        client = comment.session.client
+        for user_id in {client.coach_id, client.user_id} - {None}:
+            events.append((user_id, 'comment.created', {**data, 'is_me': comment.author_id == user_id}))
+    push_to_users(events)
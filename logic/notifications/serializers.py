@@ -1,3 +1,4 @@
+from django.contrib.contenttypes.models import ContentType
 from rest_framework import serializers
 from .models import Notification
 
@@ -22,10 +23,11 @@ class NotificationSerializer(serializers.ModelSerializer):
         """
         Помогает фронту понять, куда переходить при клике.
         Вернет: {'type': 'worksession', 'id': 5}
+        Сам объект не грузим: тип берется из кеша ContentType, id - из object_id.
         """
-        if obj.content_object:
+        if obj.content_type_id and obj.object_id:
             return {
-                'type': obj.content_type.model, # 'worksession', 'sessioncomment'
+                'type': ContentType.objects.get_for_id(obj.content_type_id).model, # 'worksession', 'sessioncomment'
                 'id': obj.object_id
             }
         return None
\ No newline at end of file
@@ -0,0 +1,131 @@
+from celery import shared_task
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+
+from clients.models import WorkSession, SessionComment
+from . import counters, outbox
+from .models import Notification
+from .realtime import push_notifications, push_comments
+
+
+def build_session_notifications(session_ids):
+    """Новая тренировка/сессия -> уведомление Клиенту (если у него есть аккаунт)."""
+    sessions = WorkSession.objects.filter(
+        pk__in=session_ids, client__user__isnull=False
+    ).select_related('client')
+    content_type = ContentType.objects.get_for_model(WorkSession)
+
+    return [
+        Notification(
+            recipient_id=session.client.user_id,
+            category='workout',
+            title=f"Новое событие: {session.title}",
+            message=f"Тренер добавил новую задачу на {session.date.strftime('%d.%m %H:%M')}",
+            content_type=content_type,
+            object_id=session.pk,
+        )
+        for session in sessions
+    ]
+
+
+def build_plan_notifications(session_ids):
+    """Массовое планирование -> одно сводное уведомление на клиента вместо уведомления на каждую сессию."""
+    sessions = WorkSession.objects.filter(
+        pk__in=session_ids, client__user__isnull=False
+    ).select_related('client').order_by('date')
+    content_type = ContentType.objects.get_for_model(WorkSession)
+
+    by_client = {}
+    for session in sessions:
+        by_client.setdefault(session.client.user_id, []).append(session)
+
+    return [
+        Notification(
+            recipient_id=user_id,
+            category='workout',
+            title=f"Новый план: {len(planned)} тренировок",
+            message=(
+                f"Тренер запланировал тренировки с {planned[0].date.strftime('%d.%m')} "
+                f"по {planned[-1].date.strftime('%d.%m')}"
+            ),
+            content_type=content_type,
+            object_id=planned[0].pk,  # Ссылка ведет на ближайшую сессию плана
+        )
+        for user_id, planned in by_client.items()
+    ]
+
+
+def build_comment_notifications(comments):
+    """Сообщение в чате сессии -> уведомление второй стороне (тренер <-> клиент)."""
+    content_type = ContentType.objects.get_for_model(WorkSession)
+    notifications = []
+
+    for comment in comments:
+        session = comment.session
+        client_user_id = session.client.user_id
+        coach_id = session.client.coach_id
+        message = f"К тренировке '{session.title}': {comment.text[:50]}..."
+
+        # 1. Если написал Тренер -> шлем Клиенту
+        if comment.author_id == coach_id and client_user_id:
+            recipient_id, title = client_user_id, "Сообщение от тренера"
+        # 2. Если написал Клиент -> шлем Тренеру
+        elif comment.author_id == client_user_id and coach_id:
+            recipient_id, title = coach_id, f"Сообщение от {session.client.name}"
+        else:
+            continue
+
+        notifications.append(Notification(
+            recipient_id=recipient_id,
+            category='message',
+            title=title,
+            message=message,
+            content_type=content_type,
+            object_id=session.pk,  # Ссылка ведет на саму сессию
+        ))
+    return notifications
+
+
+@shared_task
+def fan_out_notifications(session_ids=(), comment_ids=(), plan_session_ids=()):
+    """
+    Создает уведомления пачкой: один bulk_create на все сессии и комментарии,
+    накопленные за транзакцию. id удаленных/откаченных объектов просто пропускаются.
+    """
+    comments = list(
+        SessionComment.objects.filter(pk__in=comment_ids).select_related('session__client', 'author')
+    )
+    notifications = (
+        build_session_notifications(session_ids)
+        + build_plan_notifications(plan_session_ids)
+        + build_comment_notifications(comments)
+    )
+    Notification.objects.bulk_create(notifications, batch_size=500)
+
+    counters.notifications_created(n.recipient_id for n in notifications)
+    # Получатель уведомления о сообщении - это и есть тот, у кого сообщение непрочитано
+    counters.comments_created(n.recipient_id for n in notifications if n.category == 'message')
+
+    # Подключенные по WebSocket получают новое сразу, без поллинга
+    push_notifications(notifications)
+    push_comments(comments)
+    return len(notifications)
+
+
+@shared_task
+def send_outbox(batch_size=None):
+    """
+    Отправляет очередь писем (notifications/outbox.py) пачками по EMAIL_OUTBOX_BATCH.
+    Повторы после ошибок и письма, застрявшие у упавшего воркера (аренда SEND_LEASE истекла),
+    забирает запуск по расписанию celery beat (CELERY_BEAT_SCHEDULE) - отложенных на часы
+    задач в брокере нет, они пережили бы visibility timeout Redis и ушли бы повторно.
+    """
+    batch_size = batch_size or settings.EMAIL_OUTBOX_BATCH
+    emails = outbox.claim(batch_size)
+    if not emails:
+        return 0
+    sent = outbox.deliver(emails)
+    if len(emails) == batch_size:
+        # Пачка полная - в очереди, скорее всего, есть еще
+        send_outbox.delay(batch_size)
+    return sent
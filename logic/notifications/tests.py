@@ -1,3 +1,288 @@
-from django.test import TestCase
+from channels.db import database_sync_to_async
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail.backends.base import BaseEmailBackend
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
 
-# Create your tests here.
+from clients.benchmarks import make_coach, seed_clients, api_client_for
+from clients.models import WorkSession, SessionComment
+from config.asgi import application
+from users.serializers import CustomTokenObtainPairSerializer
+from . import counters, outbox
+from .models import Notification, OutgoingEmail
+from .tasks import fan_out_notifications, send_outbox
+
+
+class NotificationFanOutTests(TestCase):
+    """Уведомления создаются задачей после коммита (Celery в eager-режиме)."""
+
+    def setUp(self):
+        self.coach = make_coach()
+        self.client_card = seed_clients(self.coach, 1)[0]
+        self.client_user = self.client_card.user
+
+    def create_session(self, **kwargs):
+        return WorkSession.objects.create(client=self.client_card, title='Ноги', date=timezone.now(), **kwargs)
+
+    def test_nothing_is_created_before_commit(self):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.create_session()
+        self.assertFalse(Notification.objects.exists())
+        self.assertTrue(callbacks)
+
+    def test_session_notifies_client(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            session = self.create_session()
+
+        notification = Notification.objects.get()
+        self.assertEqual(notification.recipient, self.client_user)
+        self.assertEqual(notification.category, 'workout')
+        self.assertEqual(notification.content_object, session)
+
+    def test_many_sessions_in_one_transaction_make_one_bulk_insert(self):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            for _ in range(20):
+                self.create_session()
+
+        ContentType.objects.clear_cache()
+        with self.assertNumQueries(3):
+            # сессии + ContentType + один INSERT уведомлений
+            for callback in callbacks:
+                callback()
+        self.assertEqual(Notification.objects.filter(recipient=self.client_user).count(), 20)
+
+    def test_comment_notifies_other_side(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            session = self.create_session()
+        Notification.objects.all().delete()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            SessionComment.objects.create(session=session, author=self.coach, text='Как прошло?')
+            SessionComment.objects.create(session=session, author=self.client_user, text='Отлично')
+
+        self.assertEqual(
+            sorted(Notification.objects.values_list('recipient_id', 'title')),
+            sorted([
+                (self.client_user.pk, 'Сообщение от тренера'),
+                (self.coach.pk, f'Сообщение от {self.client_card.name}'),
+            ]),
+        )
+
+    def test_rolled_back_batch_is_not_reused(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    self.create_session()
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+            session = self.create_session()
+
+        self.assertEqual(list(Notification.objects.values_list('object_id', flat=True)), [session.pk])
+
+    def test_deleted_objects_are_skipped(self):
+        session = self.create_session()
+        session_id = session.pk
+        session.delete()
+        self.assertEqual(fan_out_notifications(session_ids=[session_id]), 0)
+
+
+class RealtimePushTests(TransactionTestCase):
+    """
+    WebSocket ws/notifications/: авторизация по токену и пуш новых уведомлений/сообщений.
+    TransactionTestCase: database_sync_to_async (middleware, consumer) закрывает старые соединения,
+    а в TestCase это соединение держит транзакцию теста. Здесь данные коммитятся по-настоящему.
+    """
+
+    def setUp(self):
+        self.coach = make_coach()
+        self.client_card = seed_clients(self.coach, 1)[0]
+        self.client_user = self.client_card.user
+        self.claims_token = CustomTokenObtainPairSerializer.get_token(self.client_user).access_token
+
+    async def connect(self, token=None):
+        query = f'?token={token}' if token else ''
+        communicator = WebsocketCommunicator(application, f'/ws/notifications/{query}')
+        connected, code = await communicator.connect()
+        return communicator, connected, code
+
+    async def test_anonymous_is_rejected(self):
+        communicator, connected, code = await self.connect()
+        self.assertFalse(connected)
+        self.assertEqual(code, 4401)
+
+    async def test_new_session_and_comment_are_pushed(self):
+        # Токен без claims - пользователь читается из БД в middleware
+        communicator, connected, _ = await self.connect(AccessToken.for_user(self.client_user))
+        self.assertTrue(connected)
+
+        session = await database_sync_to_async(self.create_session_and_comment)()
+
+        notification = await communicator.receive_json_from()
+        self.assertEqual(notification['type'], 'notification')
+        self.assertEqual(notification['data']['linked_object'], {'type': 'worksession', 'id': session.pk})
+
+        # Сообщение тренера приходит клиенту и как уведомление, и как сообщение чата
+        received = [await communicator.receive_json_from() for _ in range(2)]
+        comment = next(event['data'] for event in received if event['type'] == 'comment')
+        self.assertEqual(comment['text'], 'Как прошло?')
+        self.assertFalse(comment['is_me'])
+
+        await communicator.disconnect()
+
+    async def test_claims_token_connects(self):
+        communicator, connected, _ = await self.connect(self.claims_token)
+        self.assertTrue(connected)
+        await communicator.disconnect()
+
+    def create_session_and_comment(self):
+        # Без транзакции теста on_commit-колбэки выполняются сразу
+        session = WorkSession.objects.create(client=self.client_card, title='Ноги', date=timezone.now())
+        SessionComment.objects.create(session=session, author=self.coach, text='Как прошло?')
+        return session
+
+
+class UnreadCounterTests(TestCase):
+    """Бейджи непрочитанного из кеша: без COUNT(*) на каждый опрос."""
+
+    url = '/api/notifications/unread_count/'
+
+    def setUp(self):
+        cache.clear()
+        self.coach = make_coach()
+        self.client_card = seed_clients(self.coach, 1)[0]
+        self.client_user = self.client_card.user
+        self.client_api = api_client_for(self.client_user)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.session = WorkSession.objects.create(client=self.client_card, title='Ноги', date=timezone.now())
+            self.comment = SessionComment.objects.create(session=self.session, author=self.coach, text='Как прошло?')
+
+    def badge(self):
+        return self.client_api.get(self.url).data
+
+    def test_counts_are_served_from_cache(self):
+        self.assertEqual(self.badge(), {'count': 2, 'comments': 1})
+        with self.assertNumQueries(0):
+            self.client_api.get(self.url)
+
+    def test_counters_follow_new_notifications(self):
+        self.badge()
+        with self.captureOnCommitCallbacks(execute=True):
+            SessionComment.objects.create(session=self.session, author=self.coach, text='Жду отчет')
+        self.assertEqual(self.badge(), {'count': 3, 'comments': 2})
+
+    def test_mark_read_and_mark_all_read(self):
+        self.badge()
+        notification = Notification.objects.filter(recipient=self.client_user).first()
+
+        self.client_api.post(f'/api/notifications/{notification.pk}/mark_read/')
+        self.client_api.post(f'/api/notifications/{notification.pk}/mark_read/')
+        self.assertEqual(self.badge()['count'], 1)
+
+        self.client_api.post('/api/notifications/mark_all_read/')
+        self.assertEqual(self.badge()['count'], 0)
+
+    def test_mark_all_read_keeps_concurrent_notification(self):
+        self.badge()
+        # Уведомление, которое учтено в счетчике, но появилось уже после UPDATE в mark_all_read
+        counters.notifications_created([self.client_user.pk])
+        self.client_api.post('/api/notifications/mark_all_read/')
+        self.assertEqual(self.badge()['count'], 1)
+
+    def test_comment_read_by_recipient_only(self):
+        self.badge()
+        api_client_for(self.coach).post(f'/api/clients/comments/{self.comment.pk}/mark_read/')
+        self.assertEqual(self.badge()['comments'], 1)
+
+        self.client_api.post(f'/api/clients/comments/{self.comment.pk}/mark_read/')
+        self.assertEqual(self.badge()['comments'], 0)
+
+    def test_fallback_recount_matches_counters(self):
+        cached = self.badge()
+        cache.clear()
+        self.assertEqual(self.badge(), cached)
+
+
+class FlakyEmailBackend(BaseEmailBackend):
+    """Тестовый backend: письма на адреса из `failing` падают, остальные - в mail.outbox."""
+    failing = set()
+
+    def send_messages(self, messages):
+        for message in messages:
+            if set(message.to) & self.failing:
+                raise OSError('SMTP 451: try again later')
+            mail.outbox.append(message)
+        return len(messages)
+
+
+@override_settings(EMAIL_BACKEND='notifications.tests.FlakyEmailBackend', EMAIL_OUTBOX_MAX_ATTEMPTS=2)
+class EmailOutboxTests(TestCase):
+    """Письма: в outbox в транзакции, отправка воркером после коммита, повторы с задержкой."""
+
+    def tearDown(self):
+        FlakyEmailBackend.failing = set()
+
+    def test_client_creation_enqueues_invite(self):
+        coach = make_coach()
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            response = api_client_for(coach).post(
+                '/api/clients/clients/', {'name': 'Анна', 'email': 'anna@example.com'}, format='json'
+            )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(OutgoingEmail.objects.get().status, 'pending')
+
+        for callback in callbacks:
+            callback()
+        email = OutgoingEmail.objects.get()
+        self.assertEqual((email.status, email.attempts), ('sent', 1))
+        self.assertEqual(mail.outbox[0].to, ['anna@example.com'])
+        self.assertEqual(mail.outbox[0].from_email, 'noreply@fitcare.com')
+        self.assertIn(response.data['generated_password'], mail.outbox[0].body)
+        # Пароль не остается в базе
+        self.assertEqual(email.body, '')
+
+    def test_failed_delivery_is_retried_then_given_up(self):
+        FlakyEmailBackend.failing = {'bad@example.com'}
+        with self.captureOnCommitCallbacks(execute=True):
+            outbox.enqueue_many([('ok@example.com', 'Тема', 'Текст'), ('bad@example.com', 'Тема', 'Текст')])
+
+        bad = OutgoingEmail.objects.get(to='bad@example.com')
+        self.assertEqual((bad.status, bad.attempts), ('pending', 1))
+        self.assertIn('451', bad.last_error)
+        self.assertGreater(bad.next_attempt_at, timezone.now())
+        self.assertEqual(OutgoingEmail.objects.get(to='ok@example.com').status, 'sent')
+        # Повтор еще не наступил
+        self.assertEqual(send_outbox(), 0)
+
+        OutgoingEmail.objects.filter(pk=bad.pk).update(next_attempt_at=timezone.now())
+        send_outbox()
+        bad.refresh_from_db()
+        self.assertEqual((bad.status, bad.attempts, bad.body), ('failed', 2, ''))
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_mail_of_crashed_worker_is_sent_after_lease(self):
+        with self.captureOnCommitCallbacks(execute=False):
+            outbox.enqueue('anna@example.com', 'Тема', 'Текст')
+        # Воркер забрал письмо и упал, не отправив
+        self.assertEqual(len(outbox.claim(10)), 1)
+        self.assertEqual(send_outbox(), 0)
+
+        OutgoingEmail.objects.update(next_attempt_at=timezone.now())
+        # Запуск по расписанию (CELERY_BEAT_SCHEDULE)
+        self.assertEqual(send_outbox(), 1)
+        self.assertEqual(OutgoingEmail.objects.get().attempts, 2)
+        self.assertIn('notifications.tasks.send_outbox', [entry['task'] for entry in settings.CELERY_BEAT_SCHEDULE.values()])
+
+    def test_worker_sends_in_batches(self):
+        with self.captureOnCommitCallbacks(execute=False):
+            outbox.enqueue_many([(f'c{i}@example.com', 'Тема', 'Текст') for i in range(5)])
+        self.assertEqual(send_outbox(batch_size=2), 2)
+        self.assertEqual(OutgoingEmail.objects.filter(status='sent').count(), 5)
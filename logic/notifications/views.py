@@ -1,6 +1,7 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from . import counters
 from .models import Notification
 from .serializers import NotificationSerializer
 
@@ -18,21 +19,29 @@ class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
 
     @action(detail=False, methods=['get'])
     def unread_count(self, request):
-        """GET /api/notifications/unread_count/"""
-        count = self.get_queryset().filter(is_read=False).count()
-        return Response({'count': count})
+        """
+        GET /api/notifications/unread_count/
+        Бейджи из кешированных счетчиков: count - уведомления, comments - сообщения в чатах.
+        """
+        return Response({
+            'count': counters.unread_notifications(request.user.pk),
+            'comments': counters.unread_comments(request.user),
+        })
 
     @action(detail=True, methods=['post'])
     def mark_read(self, request, pk=None):
         """POST /api/notifications/{id}/mark_read/"""
         notification = self.get_object()
-        if not notification.is_read:
-            notification.is_read = True
-            notification.save()
+        # Условный UPDATE: при двойном клике счетчик уменьшится только один раз
+        if Notification.objects.filter(pk=notification.pk, is_read=False).update(is_read=True):
+            counters.notifications_read(request.user.pk)
         return Response({'status': 'success'})
 
     @action(detail=False, methods=['post'])
     def mark_all_read(self, request):
         """POST /api/notifications/mark_all_read/"""
-        self.get_queryset().filter(is_read=False).update(is_read=True)
+        # Минус ровно прочитанные: уведомление, созданное между UPDATE и сдвигом счетчика, не теряется
+        marked = self.get_queryset().filter(is_read=False).update(is_read=True)
+        if marked:
+            counters.notifications_read(request.user.pk, marked)
         return Response({'status': 'success'})
\ No newline at end of file
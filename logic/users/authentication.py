@@ -0,0 +1,53 @@
+"""
+Авторизация API по access-токену без чтения пользователя из БД на каждый запрос.
+В токен записываются username и роль (add_claims) - при входе и при каждом обновлении
+(/api/token/refresh/ берет их из БД заново), на запросе из них собирается TokenUser.
+Остальные поля пользователя (без пароля) - из короткого кеша cached_user.
+
+По тому же кешу каждый запрос проверяет, что пользователь есть и активен: кеш сбрасывается
+сигналом при сохранении пользователя, так что блокировка действует со следующего запроса
+(изменения в обход сигналов, QuerySet.update, - не позже USER_CACHE_TTL). Смена роли видна
+после обновления токена или нового входа. Токены, выданные до появления claims, проверяются
+по-старому - запросом в БД. Доступных клиентов в токене нет - их считает ClientScope (clients/scoping.py).
+"""
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import TokenUser, User, cached_user
+
+CLAIMS = ('username', 'is_coach')
+
+
+def add_claims(token, user):
+    """Username и роль - в токен."""
+    token['username'] = user.username
+    token['is_coach'] = user.is_coach
+    return token
+
+
+class ClaimsRefreshToken(RefreshToken):
+    """Refresh, который пишет в новый access claims из БД, а не копирует свои (роль могла смениться)."""
+
+    @property
+    def access_token(self):
+        access = super().access_token
+        user = User.objects.filter(**{api_settings.USER_ID_FIELD: self[api_settings.USER_ID_CLAIM]}).first()
+        return add_claims(access, user) if user else access
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication, у которой request.user - TokenUser из claims, без SELECT из users_user."""
+
+    def get_user(self, validated_token):
+        if any(claim not in validated_token for claim in (api_settings.USER_ID_CLAIM, *CLAIMS)):
+            return super().get_user(validated_token)
+        user_id = validated_token[api_settings.USER_ID_CLAIM]
+        state = cached_user(user_id)
+        if state is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        if not state['is_active']:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return TokenUser.from_claims(user_id, validated_token['username'], validated_token['is_coach'])
@@ -1,6 +1,31 @@
-from django.db import models
+from django.core.cache import cache
+from django.db import models, router
+from django.db.models import DEFERRED
 from django.contrib.auth.models import AbstractUser
 
+# Поля пользователя для TokenUser: короткий кеш, чтобы не ходить в БД на каждый запрос.
+# Хеш пароля в кеш не кладем
+USER_CACHE_KEY = 'users:user:{}'
+USER_CACHE_TTL = 60
+USER_CACHE_EXCLUDE = {'password'}
+
+
+def cached_user(user_id):
+    """Поля пользователя (dict, без USER_CACHE_EXCLUDE) из кеша или одним запросом; None - пользователя нет."""
+    key = USER_CACHE_KEY.format(user_id)
+    fields = cache.get(key)
+    if fields is None:
+        names = [field.attname for field in User._meta.concrete_fields if field.attname not in USER_CACHE_EXCLUDE]
+        # Удаленного тоже кешируем (пустой dict) - его токен не стоит запроса на каждый вызов
+        fields = User.objects.filter(pk=user_id).values(*names).first() or {}
+        cache.set(key, fields, USER_CACHE_TTL)
+    return fields or None
+
+
+def forget_user(user_id):
+    cache.delete(USER_CACHE_KEY.format(user_id))
+
+
 class User(AbstractUser):
     """
     Единая модель пользователя (Коуч или Клиент).
@@ -20,6 +45,8 @@ class User(AbstractUser):
     # Общие данные
     phone = models.CharField(max_length=20, blank=True, null=True, verbose_name="Телефон")
     avatar = models.ImageField(upload_to='users_avatars/', null=True, blank=True, verbose_name="Аватар")
+    # Миниатюры аватара (clients/images.py), заполняет фоновая задача
+    avatar_variants = models.JSONField(default=dict, blank=True, editable=False)
     
     # Для Коуча
     studio_name = models.CharField(
@@ -32,4 +59,32 @@ class User(AbstractUser):
     
     def __str__(self):
         role = "COACH" if self.is_coach else "ATHLETE"
-        return f"{self.username} | {role}"
\ No newline at end of file
+        return f"{self.username} | {role}"
+
+
+class TokenUser(User):
+    """
+    Пользователь из claims access-токена (users/authentication.py): id, username и is_coach -
+    без запроса в БД. Это настоящий User (годится для FK, фильтров и сравнения), остальные поля
+    отложены: первое обращение к любому из них заполняет все сразу из кеша (cached_user).
+    Пароля в кеше нет - он читается из БД отдельным запросом, если понадобится.
+    """
+    class Meta:
+        proxy = True
+
+    @classmethod
+    def from_claims(cls, user_id, username, is_coach):
+        loaded = {'id': user_id, 'username': username, 'is_coach': is_coach}
+        values = [loaded.get(field.attname, DEFERRED) for field in cls._meta.concrete_fields]
+        return cls.from_db(router.db_for_read(cls), [field.attname for field in cls._meta.concrete_fields], values)
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        deferred = self.get_deferred_fields()
+        if fields is None or not set(fields) <= deferred:
+            return super().refresh_from_db(using, fields, from_queryset)
+        # Ленивая подгрузка отложенного поля: заполняем сразу все, что есть в кеше
+        cached = cached_user(self.pk) or {}
+        if not set(fields) <= cached.keys():
+            return super().refresh_from_db(using, fields, from_queryset)
+        for attname in deferred & cached.keys():
+            setattr(self, attname, cached[attname])
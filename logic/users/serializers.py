@@ -1,7 +1,14 @@
 # logic/users/serializers.py
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+
+from .authentication import ClaimsRefreshToken, add_claims
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        # Роль - в самом токене: API не читает пользователя из БД (users/authentication.py)
+        return add_claims(super().get_token(user), user)
+
     def validate(self, attrs):
         # Получаем стандартные токены (access, refresh)
         data = super().validate(attrs)
@@ -13,4 +20,9 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         # Можно добавить имя студии, если нужно сразу
         data['studio_name'] = self.user.studio_name 
 
-        return data
\ No newline at end of file
+        return data
+
+
+class CustomTokenRefreshSerializer(TokenRefreshSerializer):
+    # Новый access получает claims из БД, а не копию из refresh
+    token_class = ClaimsRefreshToken
@@ -0,0 +1,14 @@
+from django.db.models.signals import post_delete, post_save
+
+from .models import TokenUser, User, forget_user
+
+
+def drop_cached_user(sender, instance, **kwargs):
+    # Поля пользователя закешированы (cached_user) - после изменения читаем заново:
+    # блокировка и удаление действуют со следующего запроса
+    forget_user(instance.pk)
+
+
+for user_model in (User, TokenUser):
+    post_save.connect(drop_cached_user, sender=user_model, dispatch_uid=f'user_cache_save_{user_model.__name__}')
+    post_delete.connect(drop_cached_user, sender=user_model, dispatch_uid=f'user_cache_delete_{user_model.__name__}')
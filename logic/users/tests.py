@@ -1,3 +1,103 @@
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
 
-# Create your tests here.
+from clients.benchmarks import make_coach, seed_clients
+from clients.models import Client
+from .models import USER_CACHE_KEY, TokenUser, User
+
+
+class ClaimsAuthenticationTests(TestCase):
+    """Пользователь API - из claims access-токена, без запроса users_user на каждый вызов."""
+
+    def setUp(self):
+        cache.clear()
+        self.coach = make_coach()
+        self.client_card = seed_clients(self.coach, 1)[0]
+        self.client_user = self.client_card.user
+        self.client_user.set_password('secret')
+        self.client_user.save()
+
+    def api_for(self, token):
+        api = APIClient()
+        api.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        return api
+
+    def login(self, username, password, field='access'):
+        response = APIClient().post('/api/token/', {'username': username, 'password': password})
+        self.assertEqual(response.status_code, 200)
+        return response.data[field]
+
+    def user_queries(self, ctx):
+        return [q['sql'] for q in ctx.captured_queries if '"users_user"' in q['sql']]
+
+    def test_login_embeds_role(self):
+        token = AccessToken(self.login(self.client_user.username, 'secret'))
+        self.assertEqual(token['username'], self.client_user.username)
+        self.assertFalse(token['is_coach'])
+        self.assertTrue(AccessToken(self.login(self.coach.username, 'bench'))['is_coach'])
+
+    def test_refresh_takes_role_from_database(self):
+        refresh = self.login(self.client_user.username, 'secret', field='refresh')
+        User.objects.filter(pk=self.client_user.pk).update(is_coach=True)
+
+        response = APIClient().post('/api/token/refresh/', {'refresh': refresh})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(AccessToken(response.data['access'])['is_coach'])
+
+    def test_deactivated_user_loses_access_at_once(self):
+        api = self.api_for(self.login(self.client_user.username, 'secret'))
+        self.assertEqual(api.get('/api/notifications/unread_count/').status_code, 200)
+
+        self.client_user.is_active = False
+        self.client_user.save()
+        self.assertEqual(api.get('/api/notifications/unread_count/').status_code, 401)
+
+        plain = User.objects.create_user('plain', password='secret')
+        api = self.api_for(self.login('plain', 'secret'))
+        self.assertEqual(api.get('/api/notifications/unread_count/').status_code, 200)
+        plain.delete()
+        self.assertEqual(api.get('/api/notifications/unread_count/').status_code, 401)
+
+    def test_requests_do_not_load_user(self):
+        api = self.api_for(self.login(self.coach.username, 'bench'))
+        api.get('/api/notifications/unread_count/')
+        with CaptureQueriesContext(connection) as ctx:
+            response = api.get('/api/notifications/unread_count/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.user_queries(ctx), [])
+
+        # TokenUser годится для FK: тренер нового клиента - текущий пользователь
+        response = api.post('/api/clients/clients/', {'name': 'Новый', 'email': 'new@example.com'}, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(Client.objects.get(name='Новый').coach_id, self.coach.pk)
+
+    def test_tokens_without_claims_use_database(self):
+        api = self.api_for(str(AccessToken.for_user(self.coach)))
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(api.get('/api/notifications/unread_count/').status_code, 200)
+        self.assertEqual(len(self.user_queries(ctx)), 1)
+
+    def test_full_user_is_loaded_once_and_cached(self):
+        token_user = TokenUser.from_claims(self.coach.pk, self.coach.username, True)
+        self.assertEqual(token_user, self.coach)
+        with self.assertNumQueries(1):
+            self.assertEqual(token_user.email, self.coach.email)
+            self.assertTrue(token_user.is_active)
+
+        again = TokenUser.from_claims(self.coach.pk, self.coach.username, True)
+        with self.assertNumQueries(0):
+            self.assertEqual(again.email, self.coach.email)
+
+        # Изменение пользователя сбрасывает кеш
+        User.objects.get(pk=self.coach.pk).save()
+        with self.assertNumQueries(1):
+            TokenUser.from_claims(self.coach.pk, self.coach.username, True).email
+
+        # Хеша пароля в кеше нет - он читается из БД, только когда нужен
+        self.assertNotIn('password', cache.get(USER_CACHE_KEY.format(self.coach.pk)))
+        with self.assertNumQueries(1):
+            self.assertTrue(again.check_password('bench'))
@@ -0,0 +1,64 @@
+"""
+Кеш публичной карусели: два уровня.
+1. Память процесса - несколько секунд без единого сетевого обращения (пики трафика на лендинг).
+2. Общий кеш (Redis) - версия + готовый ответ, общие для всех воркеров.
+В Postgres идем, только если в общем кеше пусто.
+"""
+import hashlib
+import json
+import time
+from uuid import uuid4
+
+from django.core.cache import cache
+
+from .models import CarouselSlide
+from .serializers import CarouselSlideSerializer
+
+VERSION_KEY = 'carousel:version'
+SHARED_TTL = 60 * 60 * 24
+# Сколько секунд процесс верит своей копии, не сверяя версию с общим кешем
+LOCAL_TTL = 10
+
+_local = {}
+
+
+def carousel_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, uuid4().hex, None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def invalidate_carousel():
+    """Новая версия карусели (после коммита изменений слайда). Другие процессы увидят ее максимум через LOCAL_TTL."""
+    cache.set(VERSION_KEY, uuid4().hex, None)
+    _local.clear()
+
+
+def get_carousel(request):
+    """(данные, ETag) списка слайдов. Ключ включает хост: в данных абсолютные URL медиа."""
+    base_url = request.build_absolute_uri('/')
+    local = _local.get(base_url)
+    if local and time.monotonic() - local['checked_at'] < LOCAL_TTL:
+        return local['data'], local['etag']
+
+    version = carousel_version()
+    if local and local['version'] == version:
+        local['checked_at'] = time.monotonic()
+        return local['data'], local['etag']
+
+    key = f'carousel:{version}:{base_url}'
+    cached = cache.get(key)
+    if cached is None:
+        slides = CarouselSlide.objects.all().order_by('slot_id')
+        content = json.dumps(
+            CarouselSlideSerializer(slides, many=True, context={'request': request}).data,
+            ensure_ascii=False, sort_keys=True,
+        )
+        cached = (json.loads(content), f'"{hashlib.sha1(content.encode()).hexdigest()}"')
+        cache.set(key, cached, SHARED_TTL)
+
+    data, etag = cached
+    _local[base_url] = {'version': version, 'data': data, 'etag': etag, 'checked_at': time.monotonic()}
+    return data, etag
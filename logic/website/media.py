@@ -0,0 +1,103 @@
+"""
+Обработка медиа слайдов карусели (офлайн, в Celery).
+Видео: ffprobe (длительность, размеры) + ffmpeg - облегченный H.264 MP4 для фона и постер-кадр JPEG.
+Картинки: только размеры через Pillow.
+"""
+import json
+import os
+import shutil
+import subprocess
+
+from django.conf import settings
+from PIL import Image, UnidentifiedImageError
+
+FFMPEG = getattr(settings, 'FFMPEG_BINARY', 'ffmpeg')
+FFPROBE = getattr(settings, 'FFPROBE_BINARY', 'ffprobe')
+
+# Фон героя: без звука, не шире Full HD, moov-атом в начале файла (играет до полной загрузки)
+MAX_WIDTH = 1920
+VIDEO_CRF = 26
+TIMEOUT = 15 * 60
+
+
+class MediaProcessingError(Exception):
+    pass
+
+
+def run(command):
+    try:
+        result = subprocess.run(command, capture_output=True, text=True, timeout=TIMEOUT)
+    except (OSError, subprocess.TimeoutExpired) as exc:
+        raise MediaProcessingError(f'{command[0]}: {exc}') from exc
+    if result.returncode != 0:
+        raise MediaProcessingError(f'{command[0]}: {result.stderr.strip()[-500:]}')
+    return result.stdout
+
+
+def probe_video(path):
+    """{'duration', 'width', 'height'} первого видеопотока."""
+    info = json.loads(run([
+        FFPROBE, '-v', 'error', '-print_format', 'json', '-show_format', '-show_streams', path,
+    ]))
+    stream = next((s for s in info.get('streams', []) if s.get('codec_type') == 'video'), None)
+    if stream is None:
+        raise MediaProcessingError('в файле нет видеопотока')
+    duration = info.get('format', {}).get('duration') or stream.get('duration')
+    return {
+        'duration': float(duration) if duration else None,
+        'width': stream.get('width'),
+        'height': stream.get('height'),
+    }
+
+
+def transcode_video(source, target):
+    run([
+        FFMPEG, '-y', '-v', 'error', '-i', source,
+        '-map', '0:v:0', '-an',
+        '-c:v', 'libx264', '-preset', 'slow', '-crf', str(VIDEO_CRF),
+        '-profile:v', 'high', '-pix_fmt', 'yuv420p',
+        '-vf', f"scale='min({MAX_WIDTH},iw)':-2",
+        '-movflags', '+faststart',
+        target,
+    ])
+
+
+def extract_poster(source, target, at=1.0):
+    run([
+        FFMPEG, '-y', '-v', 'error', '-ss', f'{at:.2f}', '-i', source,
+        '-frames:v', '1', '-vf', f"scale='min({MAX_WIDTH},iw)':-2", '-q:v', '3',
+        target,
+    ])
+
+
+def process_video(field_file, workdir):
+    """
+    Копирует оригинал во временную папку (хранилище может быть не локальным) и готовит
+    rendition.mp4 и poster.jpg там же. Возвращает метаданные и пути к файлам.
+    """
+    source = os.path.join(workdir, 'source' + os.path.splitext(field_file.name)[1])
+    field_file.open('rb')
+    try:
+        with open(source, 'wb') as out:
+            shutil.copyfileobj(field_file, out)
+    finally:
+        field_file.close()
+
+    meta = probe_video(source)
+    meta['web_video_path'] = os.path.join(workdir, 'rendition.mp4')
+    meta['poster_path'] = os.path.join(workdir, 'poster.jpg')
+    transcode_video(source, meta['web_video_path'])
+    # Первая секунда обычно уже не черная "шторка"; короткие ролики - из середины
+    extract_poster(source, meta['poster_path'], at=min(1.0, (meta['duration'] or 0) / 2))
+    return meta
+
+
+def probe_image(field_file):
+    try:
+        field_file.open('rb')
+        with Image.open(field_file) as image:
+            return {'width': image.width, 'height': image.height}
+    except (UnidentifiedImageError, OSError):
+        return {'width': None, 'height': None}
+    finally:
+        field_file.close()
@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-18 14:50
+
+from django.db import migrations
+
+
+def seed_slots(apps, schema_editor):
+    """Ровно 5 слотов карусели (раньше создавались на лету при каждом GET)."""
+    CarouselSlide = apps.get_model('website', 'CarouselSlide')
+    existing = set(CarouselSlide.objects.values_list('slot_id', flat=True))
+    CarouselSlide.objects.bulk_create(
+        [CarouselSlide(slot_id=i) for i in range(1, 6) if i not in existing]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_slots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 6.0 on 2026-10-18 14:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0002_seed_carousel_slots'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='carouselslide',
+            name='duration',
+            field=models.FloatField(blank=True, editable=False, null=True, verbose_name='Длительность, с'),
+        ),
+        migrations.AddField(
+            model_name='carouselslide',
+            name='file_size',
+            field=models.PositiveBigIntegerField(blank=True, editable=False, null=True, verbose_name='Размер оригинала, байт'),
+        ),
+        migrations.AddField(
+            model_name='carouselslide',
+            name='height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='carouselslide',
+            name='poster',
+            field=models.FileField(blank=True, editable=False, upload_to='website/carousel/posters/', verbose_name='Постер'),
+        ),
+        migrations.AddField(
+            model_name='carouselslide',
+            name='processed_media',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='carouselslide',
+            name='web_video',
+            field=models.FileField(blank=True, editable=False, upload_to='website/carousel/web/', verbose_name='Видео для сайта'),
+        ),
+        migrations.AddField(
+            model_name='carouselslide',
+            name='width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+    ]
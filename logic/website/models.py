@@ -16,6 +16,16 @@ class CarouselSlide(models.Model):
     
     MEDIA_TYPE_CHOICES = [('image', 'Картинка'), ('video', 'Видео')]
     media_type = models.CharField(max_length=10, choices=MEDIA_TYPE_CHOICES, default='image', editable=False)
+
+    # Результат офлайн-обработки (website/tasks.py). Пока не готово - сайт показывает оригинал
+    web_video = models.FileField(upload_to='website/carousel/web/', blank=True, editable=False, verbose_name="Видео для сайта")
+    poster = models.FileField(upload_to='website/carousel/posters/', blank=True, editable=False, verbose_name="Постер")
+    duration = models.FloatField(null=True, blank=True, editable=False, verbose_name="Длительность, с")
+    width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    file_size = models.PositiveBigIntegerField(null=True, blank=True, editable=False, verbose_name="Размер оригинала, байт")
+    # Для какого файла посчитаны поля выше
+    processed_media = models.CharField(max_length=255, blank=True, editable=False)
     
     # Тексты
     headline = models.CharField(max_length=100, blank=True, verbose_name="Заголовок (H1)")
@@ -52,4 +62,8 @@ class CarouselSlide(models.Model):
                 self.media_type = 'video'
             else:
                 self.media_type = 'image'
-        super().save(*args, **kwargs)
\ No newline at end of file
+        super().save(*args, **kwargs)
+
+    def needs_processing(self):
+        """Файл заменили или удалили после последней обработки."""
+        return (self.media.name or '') != self.processed_media
\ No newline at end of file
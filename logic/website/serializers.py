@@ -4,4 +4,5 @@ from .models import CarouselSlide
 class CarouselSlideSerializer(serializers.ModelSerializer):
     class Meta:
         model = CarouselSlide
-        fields = '__all__'
\ No newline at end of file
+        exclude = ['processed_media']
+        # web_video, poster, duration, width, height, file_size - только чтение (editable=False)
\ No newline at end of file
@@ -0,0 +1,27 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .cache import invalidate_carousel
+from .models import CarouselSlide
+from .tasks import process_carousel_media
+
+
+def reset_carousel_cache(sender, **kwargs):
+    """
+    Слайд изменен (DevMode или админка) - публичная карусель пересоберется. Версия меняется после
+    коммита: иначе параллельный запрос закеширует старые слайды уже под новой версией.
+    """
+    transaction.on_commit(invalidate_carousel)
+
+
+post_save.connect(reset_carousel_cache, sender=CarouselSlide, dispatch_uid='carousel_cache_save')
+post_delete.connect(reset_carousel_cache, sender=CarouselSlide, dispatch_uid='carousel_cache_delete')
+
+
+@receiver(post_save, sender=CarouselSlide)
+def queue_media_processing(sender, instance, **kwargs):
+    """Новый файл - перекодирование и постер в Celery после коммита, сохранение слайда не ждет ffmpeg."""
+    if instance.needs_processing():
+        transaction.on_commit(partial(process_carousel_media.delay, instance.pk))
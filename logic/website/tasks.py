@@ -0,0 +1,61 @@
+import logging
+import tempfile
+
+from celery import shared_task
+from django.core.files import File
+from django.db.models import Q
+
+from .cache import invalidate_carousel
+from .media import MediaProcessingError, process_video, probe_image
+from .models import CarouselSlide
+
+logger = logging.getLogger(__name__)
+
+# Поля, которые заполняет обработка (сбрасываются при смене файла)
+PROCESSED_FIELDS = ('web_video', 'poster', 'duration', 'width', 'height', 'file_size', 'processed_media')
+
+
+@shared_task
+def process_carousel_media(slide_id):
+    """Готовит облегченное видео, постер и метаданные для текущего файла слайда."""
+    slide = CarouselSlide.objects.filter(pk=slide_id).first()
+    if slide is None or not slide.needs_processing():
+        return
+
+    source = slide.media.name or ''
+    old_files = [f.name for f in (slide.web_video, slide.poster) if f]
+    values = {name: None for name in PROCESSED_FIELDS}
+    values.update(processed_media=source, web_video='', poster='')
+
+    if slide.media:
+        values['file_size'] = slide.media.size
+        if slide.media_type == 'video':
+            try:
+                with tempfile.TemporaryDirectory(prefix='carousel-') as workdir:
+                    values.update(save_video_renditions(slide, workdir))
+            except MediaProcessingError:
+                # Сайт продолжит играть оригинал; повторная загрузка файла запустит обработку заново
+                logger.exception('Не удалось обработать видео слайда %s', slide.slot_id)
+        else:
+            values.update(probe_image(slide.media))
+
+    # Только если файл не заменили, пока шла обработка (update() не дергает сигналы)
+    same_file = Q(media=source) if source else Q(media='') | Q(media__isnull=True)
+    updated = CarouselSlide.objects.filter(same_file, pk=slide_id).update(**values)
+    storage = slide.media.storage
+    stale = old_files if updated else [values['web_video'], values['poster']]
+    for name in filter(None, stale):
+        storage.delete(name)
+    if updated:
+        invalidate_carousel()
+
+
+def save_video_renditions(slide, workdir):
+    meta = process_video(slide.media, workdir)
+    stem = slide.media.name.rsplit('/', 1)[-1].rsplit('.', 1)[0]
+    storage = slide.media.storage
+    with open(meta.pop('web_video_path'), 'rb') as video:
+        meta['web_video'] = storage.save(f'website/carousel/web/{stem}.mp4', File(video))
+    with open(meta.pop('poster_path'), 'rb') as poster:
+        meta['poster'] = storage.save(f'website/carousel/posters/{stem}.jpg', File(poster))
+    return meta
@@ -1,3 +1,120 @@
+import os
+import shutil
+import subprocess
+import tempfile
+from io import BytesIO
+from unittest import mock, skipUnless
+
+from PIL import Image
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from clients.tests import TemporaryMediaMixin
+
+from .cache import _local, carousel_version
+from .models import CarouselSlide
+
+
+class CarouselCacheTests(TestCase):
+    """Публичная карусель: без записи на чтение, из кеша, с ETag."""
+
+    url = '/api/website/carousel/'
+
+    def setUp(self):
+        cache.clear()
+        _local.clear()
+        self.api = APIClient()
+
+    def test_slots_are_seeded_by_migration(self):
+        self.assertEqual(list(CarouselSlide.objects.values_list('slot_id', flat=True)), [1, 2, 3, 4, 5])
+
+    def test_get_does_not_write_and_is_cached(self):
+        with self.assertNumQueries(1):
+            first = self.api.get(self.url)
+        self.assertEqual(len(first.data), 5)
+        self.assertIn('max-age=60', first['Cache-Control'])
+
+        _local.clear()  # другой процесс: локальной копии нет, но общий кеш есть
+        with self.assertNumQueries(0):
+            self.assertEqual(self.api.get(self.url).data, first.data)
+
+    def test_if_none_match_returns_304(self):
+        etag = self.api.get(self.url)['ETag']
+        self.assertEqual(self.api.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_update_invalidates_cache(self):
+        etag = self.api.get(self.url)['ETag']
+
+        owner = get_user_model().objects.create_user(username='owner', password='x')
+        editor = APIClient()
+        editor.force_authenticate(owner)
+        with self.captureOnCommitCallbacks(execute=True):
+            editor.patch(f'{self.url}2/', {'headline': 'Новый сезон', 'is_active': True})
+
+        response = self.api.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[1]['headline'], 'Новый сезон')
+
+    def test_version_changes_only_after_commit(self):
+        version = carousel_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            CarouselSlide.objects.get(slot_id=2).save()
+            # До коммита версия прежняя: чтение не закеширует старые слайды под новой версией
+            self.assertEqual(carousel_version(), version)
+        self.assertNotEqual(carousel_version(), version)
+
+
+class CarouselMediaProcessingTests(TemporaryMediaMixin, TestCase):
+    """Офлайн-обработка медиа слайда после загрузки."""
+
+    def setUp(self):
+        cache.clear()
+        _local.clear()
+        self.slide = CarouselSlide.objects.get(slot_id=1)
+
+    def upload(self, name, content):
+        self.slide.media = SimpleUploadedFile(name, content)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.slide.save()
+        self.slide.refresh_from_db()
+
+    def test_image_gets_dimensions_and_size(self):
+        buffer = BytesIO()
+        Image.new('RGB', (1600, 900), 'blue').save(buffer, format='JPEG')
+        self.upload('hero.jpg', buffer.getvalue())
+
+        self.assertEqual((self.slide.width, self.slide.height), (1600, 900))
+        self.assertEqual(self.slide.file_size, len(buffer.getvalue()))
+        self.assertFalse(self.slide.needs_processing())
+
+        data = APIClient().get('/api/website/carousel/').data[0]
+        self.assertEqual(data['width'], 1600)
+        self.assertNotIn('processed_media', data)
+
+    def test_failed_transcoding_keeps_original(self):
+        with mock.patch('website.media.FFPROBE', '/nonexistent/ffprobe'), self.assertLogs('website.tasks', 'ERROR'):
+            self.upload('hero.mp4', b'not a video')
+
+        self.assertEqual(self.slide.media_type, 'video')
+        self.assertFalse(self.slide.web_video)
+        self.assertFalse(self.slide.needs_processing())
+
+    @skipUnless(shutil.which('ffmpeg') and shutil.which('ffprobe'), 'нужен ffmpeg')
+    def test_video_gets_rendition_and_poster(self):
+        workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(workdir.cleanup)
+        source = os.path.join(workdir.name, 'source.mov')
+        subprocess.run(
+            ['ffmpeg', '-v', 'error', '-f', 'lavfi', '-i', 'testsrc=duration=2:size=640x360:rate=25', source],
+            check=True,
+        )
+        with open(source, 'rb') as f:
+            self.upload('hero.mov', f.read())
 
-# Create your tests here.
+        self.assertEqual((self.slide.width, self.slide.height), (640, 360))
+        self.assertAlmostEqual(self.slide.duration, 2, places=0)
+        self.assertTrue(self.slide.web_video.name.endswith('.mp4'))
+        self.assertTrue(self.slide.poster.name.endswith('.jpg'))
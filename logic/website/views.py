@@ -1,22 +1,27 @@
 from rest_framework import generics, permissions
+from clients.reference import conditional_response
+from .cache import get_carousel
 from .models import CarouselSlide
 from .serializers import CarouselSlideSerializer
 
+# Браузеры и CDN могут держать ответ минуту, дальше - условный запрос по ETag
+CAROUSEL_MAX_AGE = 60
+
 class CarouselListView(generics.ListCreateAPIView):
     """
-    Отдает список всех 5 слотов.
-    Если слотов нет в БД, создает их автоматически (Seed Data).
+    Отдает список всех 5 слотов (создаются миграцией website/0002).
+    Чтение идет из кеша (website/cache.py), в базу - только после изменения слайдов.
     """
     serializer_class = CarouselSlideSerializer
     permission_classes = [permissions.AllowAny] # Публично (для сайта)
 
     def get_queryset(self):
-        # Если слотов нет, создаем 5 штук
-        if CarouselSlide.objects.count() < 5:
-            for i in range(1, 6):
-                CarouselSlide.objects.get_or_create(slot_id=i)
         return CarouselSlide.objects.all().order_by('slot_id')
 
+    def list(self, request, *args, **kwargs):
+        data, etag = get_carousel(request)
+        return conditional_response(request, data, etag, max_age=CAROUSEL_MAX_AGE)
+
 class CarouselUpdateView(generics.RetrieveUpdateAPIView):
     """
     [DevMode] Обновление конкретного слота по ID.
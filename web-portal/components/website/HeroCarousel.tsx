@@ -120,7 +120,9 @@ export default function HeroCarousel() {
                   playsInline
                   // ВАЖНО: Убрали loop, добавили onEnded
                   onEnded={handleNextSlide} 
-                  src={slide.media}
+                  // Пока бэкенд не перекодировал ролик - оригинал
+                  src={slide.web_video || slide.media}
+                  poster={slide.poster || undefined}
               />
           ) : (
               <img 
@@ -70,4 +70,26 @@ export interface Client {
     return new Promise((resolve) => {
       setTimeout(() => resolve(mockClients), 500);
     });
-  };
\ No newline at end of file
+  };
+
+// === Сводка тренера (одна ручка вместо сборки из списков) ===
+
+const API_BASE = process.env.NEXT_PUBLIC_API_URL || 'http://127.0.0.1:8000';
+
+export interface CoachDashboard {
+  clients: { total: number; active: number; inactive: number };
+  week: { start: string; end: string; planned: number; completed: number; missed: number };
+  awaiting_review: number;
+  unread_comments: number;
+  inactive_days: number;
+  inactive_clients: { id: number; name: string; last_session: string | null }[];
+}
+
+export const fetchDashboard = async (token: string, inactiveDays = 14): Promise<CoachDashboard> => {
+  const res = await fetch(`${API_BASE}/api/clients/dashboard/?inactive_days=${inactiveDays}`, {
+    headers: { 'Authorization': `Bearer ${token}` },
+    cache: 'no-store',
+  });
+  if (!res.ok) throw new Error('Failed to fetch dashboard');
+  return res.json();
+};
@@ -9,6 +9,12 @@ export interface CarouselSlide {
   is_active: boolean;
   media: string | null;     // Ссылка на файл
   media_type: 'image' | 'video';
+  web_video: string | null; // Облегченное видео (готовится на бэкенде после загрузки)
+  poster: string | null;    // Первый кадр для мгновенного показа
+  duration: number | null;
+  width: number | null;
+  height: number | null;
+  file_size: number | null;
   headline: string;
   subheadline: string;
   button_count: 0 | 1 | 2;